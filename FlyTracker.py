@@ -1,58 +1,211 @@
 from ultralytics import YOLO
 from deep_sort_realtime.deepsort_tracker import DeepSort
+from motion_tracker import MotionTracker
+from background_detector import BackgroundDetector
+import model_export
+from functools import lru_cache
+from contextlib import nullcontext
+import numpy as np
 import torch
+import math
+import pickle
 
 
 class FlyTracker:
     """
-    A class for detecting and tracking flies using YOLOv8 and DeepSort.
+    A class for detecting and tracking flies using YOLOv8 and DeepSort (or a motion-only tracker).
 
     Args:
         model_path (str): The path to the YOLO model weights and configuration.
         track_max_age (int, optional): Maximum age of a track before it is considered invalid. Defaults to 10.
         confidence_threshold (float, optional): Confidence threshold for YOLO detections. Defaults to 0.
+        iou_threshold (float, optional): IoU threshold used by the YOLO non-maximum suppression. Defaults to 0.7.
+        max_detections (int, optional): Maximum number of YOLO detections per frame. Defaults to 300.
+        tracker_backend (str, optional): The tracker to use, either 'deepsort' or 'motion'. Defaults to 'deepsort'.
+        inference_engine (str, optional): The detector engine, one of 'torch', 'onnx', 'openvino' or 'onnx-int8'. Defaults to 'torch'.
+        imgsz (int, optional): The YOLO inference size (longest side). Defaults to 640.
+        rect_inference (bool, optional): Use a rectangular inference size matching the frames aspect ratio. Defaults to False.
+        detector_backend (str, optional): The detector to use, one of 'yolo', 'background' or 'hybrid'. Defaults to 'yolo'.
+        background_args (dict, optional): Arguments of the `BackgroundDetector`. Defaults to None.
 
     Attributes:
-        detector: YOLO object detector.
-        tracker: DeepSort tracker.
+        detector: YOLO object detector, None when created for tracking only or with the 'background' detector.
+        background_detector (BackgroundDetector): Background subtraction detector, None with the 'yolo' detector.
+        tracker: DeepSort or MotionTracker tracker.
         confidence_threshold (float): Confidence threshold for YOLO detections.
+        recorder (DetectionCache): When set, every frame's raw detections are recorded into it. Defaults to None.
+        timer (StageTimer): When set, the detection and tracking stages are measured into it. Defaults to None.
     """
 
-    def __init__(self, model_path, track_max_age=10, confidence_threshold=0) -> None:
+    TRACKER_BACKENDS = ('deepsort', 'motion')
+    DETECTOR_BACKENDS = ('yolo', 'background', 'hybrid')
+    # the confidence threshold the yolo predictor applies by default
+    PREDICTOR_CONFIDENCE = 0.25
+
+    def __init__(self, model_path, track_max_age=10, confidence_threshold=0, iou_threshold=0.7, max_detections=300,
+                 tracker_backend='deepsort', inference_engine='torch', imgsz=640, rect_inference=False,
+                 detector_backend='yolo', background_args=None) -> None:
         """
         Initializes the FlyTracker.
 
         Args:
             model_path (str): The path to the YOLO model weights and configuration.
+                If None, no detector is loaded and the tracker can only be driven by `replay`.
             track_max_age (int, optional): Maximum age of a track before it is considered invalid. Defaults to 10.
             confidence_threshold (float, optional): Confidence threshold for YOLO detections. Defaults to 0.
+                Thresholds up to the predictor's default of 0.25 have no effect. The background subtraction blobs are not filtered by it, their score is the share of foreground pixels.
+            iou_threshold (float, optional): IoU threshold used by the YOLO non-maximum suppression. Defaults to 0.7.
+            max_detections (int, optional): Maximum number of YOLO detections per frame. Defaults to 300.
+            tracker_backend (str, optional): The tracker to use, either 'deepsort' or 'motion'. Defaults to 'deepsort'.
+                The 'motion' backend skips the appearance embedder and associates detections by motion alone.
+            inference_engine (str, optional): The detector engine, one of 'torch', 'onnx', 'openvino' or 'onnx-int8'. Defaults to 'torch'.
+                Exported models are loaded from next to the weights (see `model_export`), falling back to torch when missing.
+            imgsz (int, optional): The YOLO inference size (longest side). Defaults to 640.
+            rect_inference (bool, optional): Use a rectangular inference size matching the frames aspect ratio,
+                instead of letterboxing every frame to a square. Requires `set_frame_geometry`. Defaults to False.
+            detector_backend (str, optional): The detector to use, one of 'yolo', 'background' or 'hybrid'. Defaults to 'yolo'.
+                The 'background' detector finds flies by background subtraction, for static camera videos. The 'hybrid'
+                detector uses background subtraction, and runs YOLO only on frames where the blobs are ambiguous.
+            background_args (dict, optional): Arguments of the `BackgroundDetector`. Defaults to None.
         """
+        if detector_backend not in FlyTracker.DETECTOR_BACKENDS:
+            raise ValueError(f'Unknown detector backend "{detector_backend}", expected one of {FlyTracker.DETECTOR_BACKENDS}.')
         self.__device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.detector = YOLO(model_path).to(self.__device)
-        self.tracker = DeepSort(max_age=track_max_age, embedder_gpu=(self.__device.type == 'cuda'), half=False)
+        self.model_path = model_path
+        self.detector_backend = detector_backend
+        self.detector = None
+        if model_path is not None and detector_backend != 'background':
+            self.detector = self.__load_detector(model_path, inference_engine)
+        self.background_detector = None
+        if detector_backend != 'yolo':
+            self.background_detector = BackgroundDetector(**(background_args or {}))
+        if tracker_backend == 'deepsort':
+            self.tracker = DeepSort(max_age=track_max_age, embedder_gpu=(self.__device.type == 'cuda'), half=False)
+        elif tracker_backend == 'motion':
+            self.tracker = MotionTracker(max_age=track_max_age)
+        else:
+            raise ValueError(f'Unknown tracker backend "{tracker_backend}", expected one of {FlyTracker.TRACKER_BACKENDS}.')
         self.confidence_threshold = max(min(confidence_threshold, 1), 0)
 
+        # filtering arguments passed to the yolo predictor, so unwanted boxes never leave the model
+        # lower thresholds keep the predictor's default, which always applied before the threshold did
+        self.__predict_args = {'verbose': False, 'iou': iou_threshold, 'max_det': int(max_detections), 'imgsz': imgsz}
+        if self.confidence_threshold > FlyTracker.PREDICTOR_CONFIDENCE:
+            self.__predict_args['conf'] = self.confidence_threshold
+
+        self.imgsz = imgsz
+        self.rect_inference = rect_inference
+        self.recorder = None
+        self.timer = None
+
+    def detector_config(self) -> dict:
+        """
+        Get the settings that affect the raw detections, used to validate cached detections.
+
+        Returns:
+            dict: The detector settings.
+        """
+        return {
+            'inference_engine': getattr(self, 'inference_engine', None),
+            'conf': self.__predict_args.get('conf'),
+            'iou': self.__predict_args['iou'],
+            'max_det': self.__predict_args['max_det'],
+            'imgsz': self.__predict_args['imgsz'],
+            'embeds': isinstance(self.tracker, DeepSort),
+            'backend': self.detector_backend,
+            'background': None if self.background_detector is None else self.background_detector.config(),
+        }
+
+    def __load_detector(self, model_path: str, inference_engine: str) -> YOLO:
+        """
+        Load the YOLO detector for the requested inference engine.
+
+        Args:
+            model_path (str): The path to the YOLO `.pt` weights.
+            inference_engine (str): The detector engine, one of 'torch', 'onnx', 'openvino' or 'onnx-int8'.
+
+        Returns:
+            YOLO: The loaded detector.
+        """
+        if inference_engine not in model_export.ENGINES:
+            raise ValueError(f'Unknown inference engine "{inference_engine}", expected one of {model_export.ENGINES}.')
+
+        if inference_engine != 'torch':
+            exported_path = model_export.find_exported_model(model_path, inference_engine)
+            if exported_path is not None:
+                self.inference_engine = inference_engine
+                return YOLO(exported_path, task='detect')
+            print(f'No exported {inference_engine} model found for "{model_path}", falling back to torch.')
+
+        self.inference_engine = 'torch'
+        return YOLO(model_path).to(self.__device)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def rect_inference_size(width: int, height: int, imgsz: int = 640, stride: int = 32) -> tuple:
+        """
+        Calculate a stride-aligned rectangular inference size matching the aspect ratio of a frame.
+
+        The longest side is scaled to `imgsz`, and the shorter side is scaled accordingly and rounded up
+        to a multiple of the model stride, so tall narrow frames are not padded to a square.
+
+        Args:
+            width (int): The frame width.
+            height (int): The frame height.
+            imgsz (int, optional): The inference size of the longest side. Defaults to 640.
+            stride (int, optional): The model stride. Defaults to 32.
+
+        Returns:
+            tuple: The inference size as (height, width).
+        """
+        scale = imgsz / max(width, height, 1)
+        rect_height = max(stride, math.ceil(height * scale / stride) * stride)
+        rect_width = max(stride, math.ceil(width * scale / stride) * stride)
+        return rect_height, rect_width
+
+    def set_frame_geometry(self, width: int, height: int) -> None:
+        """
+        Set the geometry of the frames (or regions) passed to the detector.
+
+        When rectangular inference is enabled, this picks the inference size for the geometry.
+
+        Args:
+            width (int): The frame width.
+            height (int): The frame height.
+        """
+        if self.rect_inference:
+            self.__predict_args['imgsz'] = FlyTracker.rect_inference_size(int(width), int(height), self.imgsz)
+        else:
+            self.__predict_args['imgsz'] = self.imgsz
+
+    def __timed(self, stage: str):
+        """
+        Measure a stage into the timer, if one is set.
+        """
+        return self.timer.measure(stage) if self.timer is not None else nullcontext()
+
     @staticmethod
-    def __yolo2sort(yolo_result) -> tuple:
+    def __yolo2sort(yolo_results: np.ndarray) -> list:
         """
         Convert YOLO detection results to DeepSort format.
 
         Args:
-            yolo_result (list): YOLO detection result.
+            yolo_results (np.ndarray): YOLO detection results, an (N, 6) array of rows (x1, y1, x2, y2, score, class_id).
 
         Returns:
-            tuple: Detection in DeepSort format.
+            list: Detections in DeepSort format.
         """
-        x1, y1, x2, y2, score, class_id = yolo_result
-        return [x1, y1, x2 - x1, y2 - y1], score, class_id
+        ltwh = yolo_results[:, :4].copy()
+        ltwh[:, 2:] -= ltwh[:, :2]
+        return list(zip(ltwh.tolist(), yolo_results[:, 4].tolist(), yolo_results[:, 5].tolist()))
 
     @staticmethod
     def __sort2result(track) -> tuple:
         """
-        Convert DeepSort track to result format.
+        Convert a tracker track to result format.
 
         Args:
-            track: DeepSort track.
+            track: DeepSort or MotionTracker track.
 
         Returns:
             tuple: Tracking result.
@@ -61,28 +214,131 @@ class FlyTracker:
         x2, y2 = x1 + w, y1 + h
         return int(track.track_id), track.get_det_conf(), x1, y1, x2, y2
 
-    def detect(self, frame) -> list:
+    def detect(self, frame, roi: dict = None) -> list:
         """
         Detect and track flies in a frame.
 
         Args:
             frame: Image frame.
+            roi (dict, optional): Region of interest with 'x_min', 'x_max', 'y_min', 'y_max' keys (inclusive bounds).
+                Detection runs only on this region, the results are in full-frame coordinates. Defaults to None.
 
         Returns:
             list: List of tracked objects satisfying the constraints.
         """
-        # pass the image through the yolo model
-        results = self.detector(frame, verbose=False)[0]
+        crop, offset = self.crop_to_roi(frame, roi)
+
+        # find the blobs by background subtraction, falling back to yolo on ambiguous frames in hybrid mode
+        if self.background_detector is not None:
+            expected_count = len([t for t in self.__active_tracks() if t.is_confirmed()])
+            with self.__timed('background'):
+                boxes, ambiguous = self.background_detector.detect(crop, expected_count)
+            if self.detector_backend == 'background' or not ambiguous:
+                return self.__track(frame, boxes, offset)
+
+        # pass the image (region) through the yolo model
+        with self.__timed('detect'):
+            results = self.detector(crop, **self.__predict_args)[0]
+
+        return self.__track(frame, results.boxes.data.cpu().numpy(), offset)
+
+    def detect_batch(self, frames: list, roi: dict = None) -> list:
+        """
+        Detect and track flies in a batch of consecutive frames.
+
+        The frames are passed through the YOLO model in a single forward pass, and the
+        per-frame detections are then fed to the tracker in order, so the tracking results
+        are identical to calling `detect` on each frame separately.
+
+        Args:
+            frames (list): List of consecutive image frames.
+            roi (dict, optional): Region of interest, see `detect`. Defaults to None.
+
+        Returns:
+            list: List of tracked objects lists, one per frame.
+        """
+        if len(frames) == 0:
+            return []
+
+        # background subtraction is sequential, and decides per frame whether yolo is needed
+        if self.background_detector is not None:
+            return [self.detect(frame, roi) for frame in frames]
+
+        # pass the images (regions) through the yolo model at once
+        crops = [self.crop_to_roi(frame, roi) for frame in frames]
+        with self.__timed('detect'):
+            batch_results = self.detector([crop for crop, _ in crops], **self.__predict_args)
+
+        return [self.__track(frame, results.boxes.data.cpu().numpy(), offset)
+                for frame, results, (_, offset) in zip(frames, batch_results, crops)]
+
+    @staticmethod
+    def crop_to_roi(frame, roi: dict = None) -> tuple:
+        """
+        Crop a frame to a region of interest.
+
+        Args:
+            frame: Image frame.
+            roi (dict, optional): Region of interest with 'x_min', 'x_max', 'y_min', 'y_max' keys (inclusive bounds).
+
+        Returns:
+            tuple: The cropped frame (a view), and the (x, y) offset of the crop within the frame.
+        """
+        if roi is None:
+            return frame, (0, 0)
+        height, width = frame.shape[:2]
+        x_min = int(max(min(roi['x_min'], width - 1), 0))
+        x_max = int(max(min(roi['x_max'], width - 1), x_min))
+        y_min = int(max(min(roi['y_min'], height - 1), 0))
+        y_max = int(max(min(roi['y_max'], height - 1), y_min))
+        return frame[y_min:y_max + 1, x_min:x_max + 1], (x_min, y_min)
+
+    def __track(self, frame, boxes: np.ndarray, offset: tuple = (0, 0)) -> list:
+        """
+        Pass the detections of a single frame through the tracker.
+
+        Args:
+            frame: Image frame the detections were produced from.
+            boxes (np.ndarray): The (N, 6) detections of the frame, in the YOLO results format.
+            offset (tuple, optional): The (x, y) offset of the region the results were produced from. Defaults to (0, 0).
+
+        Returns:
+            list: List of tracked objects satisfying the constraints.
+        """
+        # translate the detections back to full-frame coordinates
+        if offset != (0, 0):
+            boxes[:, [0, 2]] += offset[0]
+            boxes[:, [1, 3]] += offset[1]
+
+        # exclude degenerate boxes, deepsort discards them as well
+        boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
 
         # preproccess the detections for deepsort
-        detections = [self.__yolo2sort(result) for result in results.boxes.data.tolist()]
+        detections = self.__yolo2sort(boxes)
+
+        # compute the appearance embeddings up front when recording, so they can be stored alongside the detections
+        embeds = None
+        if self.recorder is not None:
+            if isinstance(self.tracker, DeepSort) and len(detections) > 0:
+                with self.__timed('embed'):
+                    embeds = self.tracker.generate_embeds(frame, detections)
+            self.recorder.append(boxes, embeds)
 
-        # exclude detections under the confidence threshold
-        if self.confidence_threshold > 0:
-            detections = [d for d in detections if d[1] >= self.confidence_threshold]
+        return self.__update(detections, embeds, frame)
+
+    def __update(self, detections: list, embeds, frame) -> list:
+        """
+        Pass detections in DeepSort format through the tracker.
 
+        Returns:
+            list: List of tracked objects satisfying the constraints.
+        """
         # pass the detections through the deepsort model
-        tracks = self.tracker.update_tracks(raw_detections=detections, frame=frame)
+        with self.__timed('track'):
+            if isinstance(self.tracker, DeepSort):
+                tracks = self.tracker.update_tracks(raw_detections=detections, embeds=embeds, frame=frame)
+            else:
+                tracks = self.tracker.update_tracks(raw_detections=detections, frame=frame)
 
         # exclude invalid tracks
         tracks = filter(lambda t: t.is_confirmed(), tracks)
@@ -92,9 +348,121 @@ class FlyTracker:
 
         return tracks
 
+    def replay(self, boxes: np.ndarray, embeds: np.ndarray = None) -> list:
+        """
+        Track flies in a frame from previously recorded detections, without the frame or the detector.
+
+        The recorded detections are filtered by the current confidence threshold, which can therefore only be raised
+        above the threshold the detections were recorded with.
+
+        Args:
+            boxes (np.ndarray): The recorded (N, 6) detections of the frame, or None if the frame was not detected.
+            embeds (np.ndarray, optional): The recorded appearance embeddings, required by the DeepSort tracker.
+
+        Returns:
+            list: List of tracked objects satisfying the constraints.
+        """
+        if boxes is None:
+            return self.predict()
+
+        mask = boxes[:, 4] >= self.confidence_threshold
+        detections = self.__yolo2sort(boxes[mask])
+
+        if isinstance(self.tracker, DeepSort):
+            if embeds is None:
+                raise Exception('Replaying through DeepSort requires recorded appearance embeddings.')
+            embeds = np.asarray(embeds, dtype=np.float32)[mask]
+
+        return self.__update(detections, embeds, None)
+
+    def __active_tracks(self) -> list:
+        """
+        Get the tracks currently held by the tracker.
+        """
+        if isinstance(self.tracker, DeepSort):
+            return self.tracker.tracker.tracks
+        return self.tracker.tracks
+
+    def predict(self) -> list:
+        """
+        Track flies in a frame without running the detector, using the tracker motion model alone.
+
+        The predicted tracks carry a `None` confidence, the same way synthetic points are marked.
+
+        Returns:
+            list: List of tracked objects satisfying the constraints.
+        """
+        with self.__timed('track'):
+            if isinstance(self.tracker, DeepSort):
+                self.tracker.tracker.predict()
+            else:
+                self.tracker.predict()
+
+        if self.recorder is not None:
+            self.recorder.append(None)
+
+        results = []
+        for track in filter(lambda t: t.is_confirmed(), self.__active_tracks()):
+            id, conf, x1, y1, x2, y2 = self.__sort2result(track)
+            results.append((id, None, x1, y1, x2, y2))
+        return results
+
+    def needs_detection(self, frames_elapsed: int, motion_threshold: float, uncertainty_threshold: float) -> bool:
+        """
+        Check whether the motion model can no longer be trusted to predict the next frame.
+
+        Args:
+            frames_elapsed (int): Number of frames since the last detection, including the next frame.
+            motion_threshold (float): Maximum predicted displacement [px] of a track since the last detection.
+            uncertainty_threshold (float): Maximum positional standard deviation [px] of a track.
+
+        Returns:
+            bool: True if the next frame should be passed through the detector.
+        """
+        for track in self.__active_tracks():
+            # unconfirmed tracks need detections to get confirmed
+            if track.is_tentative():
+                return True
+            if not track.is_confirmed():
+                continue
+            speed = math.hypot(track.mean[4], track.mean[5])
+            if speed * frames_elapsed > motion_threshold:
+                return True
+            if math.sqrt(track.covariance[0, 0] + track.covariance[1, 1]) > uncertainty_threshold:
+                return True
+        return False
+
+    def get_tracking_state(self) -> bytes:
+        """
+        Serialize the tracker state, so tracking can later continue from the same point with `set_tracking_state`.
+
+        The DeepSort appearance embedder holds no state and is not included. The background model of the
+        'background' and 'hybrid' detectors cannot be serialized, so analyses using them are not checkpointed.
+
+        Returns:
+            bytes: The serialized state.
+        """
+        if isinstance(self.tracker, DeepSort):
+            return pickle.dumps(self.tracker.tracker)
+        return pickle.dumps(self.tracker)
+
+    def set_tracking_state(self, state: bytes) -> None:
+        """
+        Restore a tracker state saved with `get_tracking_state`, by a FlyTracker with the same tracker backend.
+
+        Args:
+            state (bytes): The serialized state.
+        """
+        if isinstance(self.tracker, DeepSort):
+            self.tracker.tracker = pickle.loads(state)
+        else:
+            self.tracker = pickle.loads(state)
+
     def reset_tracking(self) -> None:
         """
-        Reset the tracker by deleting all tracks.
+        Reset the tracker by deleting all tracks, and discard the background model.
         """
         self.tracker.delete_all_tracks()
+        if self.background_detector is not None:
+            self.background_detector.reset()
 
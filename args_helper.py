@@ -0,0 +1,164 @@
+def split_options(args):
+    """
+    Separate `--name=value` (or bare `--name`) options from the positional arguments.
+
+    Args:
+        args (list): The raw command line arguments.
+
+    Returns:
+        tuple: The positional arguments list, and a dictionary of the options.
+    """
+    positional = []
+    options = {}
+    for arg in args:
+        if arg.startswith('--'):
+            name, _, value = arg[2:].partition('=')
+            options[name] = value if value != '' else True
+        else:
+            positional.append(arg)
+    return positional, options
+
+
+def parse_bool(value) -> bool:
+    """
+    Parse a boolean option, given as `true`, `false`, `1` or `0`, or as a bare flag.
+
+    Args:
+        value (str | bool): The option value, `True` for a bare flag as returned by `split_options`.
+
+    Returns:
+        bool: The option value.
+    """
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ValueError(f'Invalid boolean option value "{value}", expected true, false, 1 or 0.')
+
+
+def parse_roi(value: str) -> dict:
+    """
+    Parse a region of interest given as `x_min,y_min,x_max,y_max`.
+
+    Args:
+        value (str): The region of interest option value.
+
+    Returns:
+        dict: A dictionary with 'x_min', 'x_max', 'y_min', 'y_max' keys.
+    """
+    x_min, y_min, x_max, y_max = [int(v) for v in value.split(',')]
+    return {'x_min': x_min, 'x_max': x_max, 'y_min': y_min, 'y_max': y_max}
+
+
+def parse_analysis_options(options: dict) -> dict:
+    """
+    Build the `analyze_video` arguments from the command line options.
+
+    Args:
+        options (dict): The options, as returned by `split_options`.
+
+    Returns:
+        dict: The analysis keyword arguments.
+    """
+    return {
+        'batch_size': int(options.get('batch-size', 1)),
+        'prefetch': int(options.get('prefetch', 32)),
+        'preprocess_workers': int(options.get('preprocess-workers', 2)),
+        'detection_stride': int(options.get('stride', 1)),
+        'motion_threshold': float(options.get('motion-threshold', 5.0)),
+        'uncertainty_threshold': float(options.get('uncertainty-threshold', 10.0)),
+        'cache_detections': parse_bool(options.get('cache-detections', False)) or parse_bool(options.get('retrack', False)),
+        'checkpoint_interval': int(options.get('checkpoint-interval', 0)),
+        'resume': parse_bool(options.get('resume', False)),
+        'decoder': options.get('decoder', 'opencv'),
+        'decode_scale': float(options.get('decode-scale', 1.0)),
+        'decode_threads': int(options.get('decode-threads', 0)),
+        'profile_memory': parse_bool(options.get('memory', False)),
+    }
+
+
+def parse_tracker_options(options: dict) -> dict:
+    """
+    Build the `FlyTracker` arguments from the command line options.
+
+    Args:
+        options (dict): The options, as returned by `split_options`.
+
+    Returns:
+        dict: The tracker keyword arguments.
+    """
+    return {
+        'track_max_age': int(options.get('max-age', 10)),
+        'confidence_threshold': float(options.get('confidence', 0)),
+        'iou_threshold': float(options.get('iou', 0.7)),
+        'max_detections': int(options.get('max-det', 300)),
+        'tracker_backend': options.get('tracker', 'deepsort'),
+        'inference_engine': options.get('engine', 'torch'),
+        'imgsz': int(options.get('imgsz', 640)),
+        'rect_inference': parse_bool(options.get('rect', False)),
+        'detector_backend': options.get('detector', 'yolo'),
+        'background_args': {
+            'method': options.get('bg-method', 'mog2'),
+            'history': int(options.get('bg-history', 500)),
+            'min_area': int(options.get('min-area', 4)),
+            'max_area': int(options['max-area']) if 'max-area' in options else None,
+        },
+    }
+
+
+def parse_runtime_options(options: dict) -> dict:
+    """
+    Build the `runtime_config.configure_threads` arguments from the command line options.
+
+    Args:
+        options (dict): The options, as returned by `split_options`.
+
+    Returns:
+        dict: The runtime keyword arguments.
+    """
+    return {
+        'threads': int(options['threads']) if 'threads' in options else None,
+        'interop_threads': int(options['interop-threads']) if 'interop-threads' in options else None,
+        'pin_cores': parse_bool(options.get('pin', False)),
+    }
+
+
+def break_down_args(args):
+    def is_int(string: str) -> bool:
+        try:
+            int(string)
+            return True
+        except:
+            return False
+    
+    # split into lists
+    result = []
+    for arg in args:
+        if is_int(arg):
+            result[-1].append(int(arg))
+        else:
+            result.append([arg])
+    
+    # format into tuples
+    filtered_args = []
+    for arg in result:
+        if   len(arg) == 1:
+            filtered_args.append((arg[0], None, None))
+        elif len(arg) == 2:
+            filtered_args.append((arg[0], arg[1], None))
+        elif len(arg) == 3:
+            filtered_args.append((arg[0], arg[1], arg[2]))
+
+    # verify correctness
+    for arg in filtered_args:
+        path, start, end = arg
+        if not isinstance(path, str):
+            raise Exception()
+        if not isinstance(start, int) and start is not None:
+            raise Exception()
+        if not isinstance(end, int) and end is not None:
+            raise Exception()
+
+    return filtered_args
@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+
+
+class BackgroundDetector:
+    """
+    A classical fly detector for static camera videos, using background subtraction and connected components.
+
+    Every frame updates a MOG2 or KNN background model, the foreground mask is cleaned up with a morphological
+    opening and its connected components are reported as detections, in the (x1, y1, x2, y2, score, class_id)
+    format of the YOLO results. The score is the share of foreground pixels within the box.
+
+    Flies that stay still long enough are absorbed into the background and are no longer detected, the
+    `learning_rate` controls how quickly that happens.
+
+    Args:
+        method (str, optional): The background model, 'mog2' or 'knn'. Defaults to 'mog2'.
+        history (int, optional): Number of frames the background model is built from. Defaults to 500.
+        threshold (float, optional): The model's foreground threshold, MOG2 variance or KNN distance. Defaults to None (model default).
+        learning_rate (float, optional): The background model learning rate, -1 picks it from the history. Defaults to -1.
+        min_area (int, optional): Minimum blob area [px], smaller blobs are noise. Defaults to 4.
+        max_area (int, optional): Maximum blob area [px], larger blobs are discarded. Defaults to None (no limit).
+        merge_factor (float, optional): A blob this many times larger than the median blob is considered merged flies. Defaults to 1.8.
+        split_distance (int, optional): Blobs closer than this [px] are considered parts of a split fly. Defaults to 3.
+        warmup (int, optional): Number of frames before the background model is considered reliable. Defaults to 25.
+    """
+
+    METHODS = ('mog2', 'knn')
+
+    def __init__(self, method='mog2', history=500, threshold=None, learning_rate=-1, min_area=4, max_area=None,
+                 merge_factor=1.8, split_distance=3, warmup=25) -> None:
+        if method not in BackgroundDetector.METHODS:
+            raise ValueError(f'Unknown background subtraction method "{method}", expected one of {BackgroundDetector.METHODS}.')
+        self.method = method
+        self.history = history
+        self.threshold = threshold
+        self.learning_rate = learning_rate
+        self.min_area = min_area
+        self.max_area = max_area
+        self.merge_factor = merge_factor
+        self.split_distance = split_distance
+        self.warmup = warmup
+        self.__kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.reset()
+
+    def config(self) -> dict:
+        """
+        Get the settings that affect the detections.
+
+        Returns:
+            dict: The detector settings.
+        """
+        return {
+            'method': self.method, 'history': self.history, 'threshold': self.threshold, 'learning_rate': self.learning_rate,
+            'min_area': self.min_area, 'max_area': self.max_area,
+        }
+
+    def reset(self) -> None:
+        """
+        Discard the background model, e.g. before a new video.
+        """
+        if self.method == 'mog2':
+            self.__subtractor = cv2.createBackgroundSubtractorMOG2(history=self.history, detectShadows=False)
+            if self.threshold is not None:
+                self.__subtractor.setVarThreshold(self.threshold)
+        else:
+            self.__subtractor = cv2.createBackgroundSubtractorKNN(history=self.history, detectShadows=False)
+            if self.threshold is not None:
+                self.__subtractor.setDist2Threshold(self.threshold)
+        self.frames_seen = 0
+
+    def detect(self, image: np.ndarray, expected_count: int = None) -> tuple:
+        """
+        Update the background model with a frame and detect the foreground blobs.
+
+        Args:
+            image (np.ndarray): The BGR frame (or region).
+            expected_count (int, optional): The number of flies expected in the frame, e.g. the number of
+                confirmed tracks. Defaults to None (not checked).
+
+        Returns:
+            tuple: The (N, 6) detections, and whether the blobs are ambiguous, i.e. the model is still warming up,
+                blobs look merged or split, or their count differs from `expected_count`.
+        """
+        mask = self.__subtractor.apply(image, learningRate=self.learning_rate)
+        self.frames_seen += 1
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.__kernel)
+
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        # skip the background component
+        stats = stats[1:]
+        areas = stats[:, cv2.CC_STAT_AREA]
+        keep = areas >= self.min_area
+        if self.max_area is not None:
+            keep &= areas <= self.max_area
+        stats, areas = stats[keep], areas[keep]
+
+        x1 = stats[:, cv2.CC_STAT_LEFT].astype(np.float32)
+        y1 = stats[:, cv2.CC_STAT_TOP].astype(np.float32)
+        x2 = x1 + stats[:, cv2.CC_STAT_WIDTH]
+        y2 = y1 + stats[:, cv2.CC_STAT_HEIGHT]
+        score = areas / (stats[:, cv2.CC_STAT_WIDTH] * stats[:, cv2.CC_STAT_HEIGHT])
+        boxes = np.stack([x1, y1, x2, y2, score, np.zeros_like(x1)], axis=1).astype(np.float32).reshape(-1, 6)
+
+        return boxes, self.__is_ambiguous(boxes, areas, expected_count)
+
+    def __is_ambiguous(self, boxes: np.ndarray, areas: np.ndarray, expected_count: int) -> bool:
+        if self.frames_seen <= self.warmup:
+            return True
+        if expected_count is not None and len(boxes) != expected_count:
+            return True
+        if len(boxes) == 0:
+            return False
+
+        # merged flies show up as an unusually large blob
+        if areas.max() > self.merge_factor * np.median(areas):
+            return True
+
+        # a fly split into parts shows up as blobs whose boxes (nearly) touch
+        if len(boxes) > 1:
+            gap_x = np.maximum(boxes[:, None, 0], boxes[None, :, 0]) - np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+            gap_y = np.maximum(boxes[:, None, 1], boxes[None, :, 1]) - np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+            gap = np.maximum(gap_x, gap_y)
+            np.fill_diagonal(gap, np.inf)
+            if gap.min() < self.split_distance:
+                return True
+        return False
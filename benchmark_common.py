@@ -0,0 +1,40 @@
+import subprocess
+import importlib
+import platform
+import os
+
+
+DEFAULT_OUTPUT_DIR = './benchmark_results'
+
+
+def get_environment(modules: tuple = ('numpy', 'cv2', 'torch')) -> dict:
+    """
+    Describe the machine and library versions a benchmark ran with.
+
+    Args:
+        modules (tuple, optional): The libraries to report the versions of. Defaults to numpy, OpenCV and torch.
+
+    Returns:
+        dict: The environment description.
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    environment = {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+    for module in modules:
+        try:
+            environment[module] = importlib.import_module(module).__version__
+        except ImportError:
+            environment[module] = None
+    if environment.get('torch') is not None:
+        import torch
+        environment['cuda'] = torch.cuda.is_available()
+    return environment
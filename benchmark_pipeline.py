@@ -0,0 +1,248 @@
+from args_helper import split_options, parse_tracker_options
+from stage_timer import StageTimer
+from benchmark_common import get_environment, DEFAULT_OUTPUT_DIR
+import synthetic_data
+import file_helper
+from contextlib import redirect_stderr
+import tempfile
+import json
+import sys, os, time
+
+
+# a randomly initialized nano model, built from the ultralytics configuration without downloading weights
+DEFAULT_WEIGHTS = 'yolov8n.yaml'
+
+
+def timed_result(timer: StageTimer, wall_time: float, frames: int) -> dict:
+    return {'wall_s': wall_time, 'fps': frames / wall_time if wall_time > 0 else None, 'frames': frames, 'stages': timer.summary()}
+
+
+def bench_detect(ft, video_path: str, frames: int, warmup: int = 3) -> dict:
+    """
+    Time `FlyTracker.detect` on the first frames of a video, the frames are decoded up front.
+
+    Args:
+        ft (FlyTracker): The tracker.
+        video_path (str): The path to the video file.
+        frames (int): The number of frames to time.
+        warmup (int, optional): Number of untimed calls before measuring. Defaults to 3.
+
+    Returns:
+        dict: The timing results.
+    """
+    import frame_source
+
+    stream = frame_source.open_video(video_path)
+    images = []
+    for _ in range(frames):
+        success, image = stream.read()
+        if not success:
+            break
+        images.append(image)
+    stream.release()
+    ft.set_frame_geometry(images[0].shape[1], images[0].shape[0])
+
+    for image in images[:warmup]:
+        ft.detect(image)
+    ft.reset_tracking()
+
+    timer = StageTimer()
+    ft.timer = timer
+    begin = time.perf_counter()
+    try:
+        for image in images:
+            with timer.measure('detect_call'):
+                ft.detect(image)
+    finally:
+        ft.timer = None
+    wall_time = time.perf_counter() - begin
+    ft.reset_tracking()
+    return timed_result(timer, wall_time, len(images))
+
+
+def bench_analyze(ft, video_path: str, **analysis_args) -> tuple:
+    """
+    Time `analyze_video` on a whole video.
+
+    Args:
+        ft (FlyTracker): The tracker.
+        video_path (str): The path to the video file.
+        **analysis_args: Additional `analyze_video` arguments.
+
+    Returns:
+        tuple: The timing results, and the raw data of the analysis.
+    """
+    import flytracker_app
+
+    timer = StageTimer()
+    begin = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stderr(devnull):
+        raw_data = flytracker_app.analyze_video(ft, video_path, None, None, timer=timer, **analysis_args)
+    wall_time = time.perf_counter() - begin
+    ft.reset_tracking()
+    return timed_result(timer, wall_time, len(raw_data)), raw_data
+
+
+def bench_postprocess(raw_data: dict, repeats: int = 3) -> tuple:
+    """
+    Time the postprocessing chain, `generate_links` followed by `process_data`.
+
+    Args:
+        raw_data (dict): The raw tracks data.
+        repeats (int, optional): The number of timed runs. Defaults to 3.
+
+    Returns:
+        tuple: The timing results, and the processed data.
+    """
+    from data_postprocess import generate_links, process_data
+
+    timer = StageTimer()
+    begin = time.perf_counter()
+    for _ in range(repeats):
+        with timer.measure('generate_links'):
+            links = generate_links(raw_data, max_tracks_gap=3)
+        with timer.measure('process_data'):
+            processed_data = process_data(raw_data, links)
+    wall_time = (time.perf_counter() - begin) / repeats
+    return timed_result(timer, wall_time, len(raw_data)), processed_data
+
+
+def bench_annotate(processed_data: dict, video_path: str, output_path: str) -> dict:
+    """
+    Time `annotate_video` on a whole video.
+
+    Args:
+        processed_data (dict): The processed tracks data.
+        video_path (str): The path to the video file.
+        output_path (str): The path to the annotated output video.
+
+    Returns:
+        dict: The timing results.
+    """
+    from video_postprocess import annotate_video
+
+    timer = StageTimer()
+    begin = time.perf_counter()
+    with timer.measure('annotate'):
+        annotate_video(processed_data, video_path, output_path)
+    wall_time = time.perf_counter() - begin
+    return timed_result(timer, wall_time, len(processed_data))
+
+
+def compare_results(current: dict, previous: dict) -> str:
+    """
+    Format the wall time change of every benchmark against a previous run.
+
+    Args:
+        current (dict): The current results.
+        previous (dict): The results of a previous run.
+
+    Returns:
+        str: The comparison table.
+    """
+    lines = [f'{"benchmark":<14}{"previous [s]":>14}{"current [s]":>13}{"speedup":>10}']
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if before is None:
+            continue
+        speedup = before['wall_s'] / result['wall_s'] if result['wall_s'] > 0 else float('inf')
+        lines.append(f'{name:<14}{before["wall_s"]:>14.3f}{result["wall_s"]:>13.3f}{speedup:>9.2f}x')
+    return '\n'.join(lines)
+
+
+def run_benchmarks(weights: str = DEFAULT_WEIGHTS, frames: int = 300, flies: int = 3, width: int = 70, height: int = 420,
+                   seed: int = 0, detect_frames: int = 100, workdir: str = None, tracker_args: dict = None,
+                   analysis_args: dict = None) -> dict:
+    """
+    Generate a synthetic vial video and time the pipeline stages on it.
+
+    Args:
+        weights (str, optional): The YOLO weights or model configuration. Defaults to a randomly initialized nano model.
+        frames (int, optional): The video length. Defaults to 300.
+        flies (int, optional): The number of flies. Defaults to 3.
+        width (int, optional): The frame width [px]. Defaults to 70.
+        height (int, optional): The frame height [px]. Defaults to 420.
+        seed (int, optional): The random seed of the video and of the model initialization. Defaults to 0.
+        detect_frames (int, optional): The number of frames `FlyTracker.detect` is timed on. Defaults to 100.
+        workdir (str, optional): The directory for the generated files. Defaults to a temporary directory.
+        tracker_args (dict, optional): The `FlyTracker` arguments. Defaults to None.
+        analysis_args (dict, optional): Additional `analyze_video` arguments. Defaults to None.
+
+    Returns:
+        dict: The benchmark configuration, environment and results.
+    """
+    from FlyTracker import FlyTracker
+    import torch
+
+    workdir = workdir or tempfile.mkdtemp(prefix='flytracker_benchmark_')
+    video_path = file_helper.join_paths(workdir, f'vial_{flies}f_{width}x{height}_{frames}_{seed}.avi')
+    if not file_helper.check_existance(video_path):
+        paths = synthetic_data.generate_fly_paths(flies, frames, width, height, seed)
+        synthetic_data.write_vial_video(video_path, paths, width, height, seed=seed)
+
+    # a model built from its configuration is initialized at random, seeded so its detections repeat between runs
+    torch.manual_seed(seed)
+    ft = FlyTracker(weights, **(tracker_args or {}))
+
+    results = {}
+    print('timing detect...')
+    results['detect'] = bench_detect(ft, video_path, detect_frames)
+    print('timing analyze_video...')
+    results['analyze_video'], raw_data = bench_analyze(ft, video_path, **(analysis_args or {}))
+    print('timing postprocess...')
+    results['postprocess'], processed_data = bench_postprocess(raw_data)
+    print('timing annotate_video...')
+    results['annotate_video'] = bench_annotate(processed_data, video_path, file_helper.join_paths(workdir, 'annotated.mp4'))
+
+    return {
+        'config': {
+            'weights': weights, 'frames': frames, 'flies': flies, 'width': width, 'height': height, 'seed': seed,
+            'torch_seed': seed, 'detect_frames': detect_frames, 'tracker_args': tracker_args, 'analysis_args': analysis_args,
+        },
+        'environment': get_environment(),
+        'timestamp': time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime()),
+        'results': results,
+    }
+
+
+def main():
+    # usage: benchmark_pipeline.py [--frames=N] [--flies=N] [--width=N] [--height=N] [--seed=N] [--weights=<path>]
+    #                              [--output=<results.json>] [--compare=<previous.json>] [tracker options] [--batch-size=N] [--stride=N]
+    _, options = split_options(sys.argv[1:])
+    tracker_args = parse_tracker_options(options)
+    analysis_args = {
+        'batch_size': int(options.get('batch-size', 1)),
+        'detection_stride': int(options.get('stride', 1)),
+    }
+
+    report = run_benchmarks(
+        weights=options.get('weights', DEFAULT_WEIGHTS),
+        frames=int(options.get('frames', 300)),
+        flies=int(options.get('flies', 3)),
+        width=int(options.get('width', 70)),
+        height=int(options.get('height', 420)),
+        seed=int(options.get('seed', 0)),
+        detect_frames=int(options.get('detect-frames', 100)),
+        workdir=options.get('workdir'),
+        tracker_args=tracker_args,
+        analysis_args=analysis_args,
+    )
+
+    output_path = options.get('output')
+    if output_path is None:
+        os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+        output_path = file_helper.join_paths(DEFAULT_OUTPUT_DIR, f'{report["timestamp"]}_{report["environment"]["commit"]}.json')
+    with open(output_path, 'w') as file:
+        json.dump(report, file, indent=4)
+
+    for name, result in report['results'].items():
+        print(f'{name:<14}{result["wall_s"]:>9.3f} s{result["fps"]:>10.1f} frames/s')
+    print(f'results saved at:\n\t{output_path}')
+
+    if 'compare' in options:
+        with open(options['compare'], 'r') as file:
+            print(compare_results(report, json.load(file)))
+
+
+if __name__ == '__main__':
+    main()
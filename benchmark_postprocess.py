@@ -0,0 +1,313 @@
+from data_postprocess import generate_links, propagate_links, process_data, apply_constraints, find_gaps_in_data, fill_gaps_in_data
+from benchmark_common import get_environment, DEFAULT_OUTPUT_DIR
+from args_helper import split_options
+from contextlib import redirect_stdout
+import synthetic_data
+import storage_helper
+import file_helper
+import numpy as np
+import tracemalloc
+import tempfile
+import types
+import json
+import gc
+import sys, os, time
+
+
+def _open_no_video(video_path: str, *args, **kwargs):
+    raise Exception(f'OpenCV is not installed, the video at "{video_path}" is not read.')
+
+
+# the benchmark has no video, `extract_findings` falls back to the default video properties,
+# so it runs without OpenCV too, with a frame source which finds no video
+try:
+    import frame_source
+except ModuleNotFoundError as err:
+    if err.name != 'cv2':
+        raise
+    frame_source = types.ModuleType('frame_source')
+    frame_source.open_video = _open_no_video
+    sys.modules['frame_source'] = frame_source
+from extract_data import extract_findings
+
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+FUNCTIONS = ('generate_links', 'propagate_links', 'process_data', 'apply_constraints', 'find_gaps_in_data',
+             'fill_gaps_in_data', 'extract_findings')
+
+
+def prepare_inputs(flies: int, frames: int, seed: int, workdir: str) -> dict:
+    """
+    Generate synthetic tracks data and prepare the input of every benchmarked function.
+
+    The inputs are built from the generator's true links and gaps, so a slow function does not hold up the others.
+
+    Args:
+        flies (int): The number of flies.
+        frames (int): The number of frames.
+        seed (int): The random seed.
+        workdir (str): The directory for the results CSV read by `extract_findings`.
+
+    Returns:
+        dict: Per function, the function and a callable returning fresh arguments for a call.
+    """
+    width, height = 70, 420
+    raw_data, links, gaps = synthetic_data.generate_track_data(flies, frames, width, height, seed)
+    processed_data = process_data(raw_data, links)
+    constraints = {'x_min': 10, 'x_max': width - 10, 'y_min': 10, 'y_max': height - 10}
+
+    results_path = file_helper.join_paths(workdir, f'tracks_{frames}_result.csv')
+    storage_helper.write_tracks_csv(processed_data, results_path)
+
+    return {
+        'generate_links': (generate_links, lambda: (raw_data, 3.0)),
+        'propagate_links': (propagate_links, lambda: (links,)),
+        'process_data': (process_data, lambda: (raw_data, links)),
+        'apply_constraints': (apply_constraints, lambda: (processed_data, constraints)),
+        'find_gaps_in_data': (find_gaps_in_data, lambda: (processed_data,)),
+        # the gaps are filled in place, so every call gets its own copy of the frames
+        'fill_gaps_in_data': (fill_gaps_in_data, lambda: (dict(processed_data), gaps)),
+        'extract_findings': (extract_findings, lambda: (results_path,)),
+    }
+
+
+def time_call(function, get_args, min_time: float = 0.2, repeats: int = 5) -> float:
+    """
+    Time a function, repeating short calls until `min_time` is spent, and keep the fastest call.
+
+    Args:
+        function (callable): The function.
+        get_args (callable): Returns the arguments of a call, not timed.
+        min_time (float, optional): The minimal total time spent [sec]. Defaults to 0.2.
+        repeats (int, optional): The maximal number of calls. Defaults to 5.
+
+    Returns:
+        float: The duration of the fastest call [sec].
+    """
+    timings = []
+    while len(timings) < repeats and sum(timings) < min_time:
+        args = get_args()
+        begin = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - begin)
+    return min(timings)
+
+
+def peak_memory(function, get_args) -> int:
+    """
+    Measure the peak memory allocated by a function call, not counting its arguments.
+
+    Args:
+        function (callable): The function.
+        get_args (callable): Returns the arguments of the call.
+
+    Returns:
+        int: The peak of the allocated memory [bytes].
+    """
+    args = get_args()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def fit_slope(sizes: list, values: list, min_value: float = 0) -> float:
+    """
+    Fit the empirical complexity exponent, i.e. the slope of the values against the sizes on a log-log scale.
+
+    Args:
+        sizes (list): The input sizes.
+        values (list): The measured values.
+        min_value (float, optional): Values below this are too small to be reliable and are ignored. Defaults to 0.
+
+    Returns:
+        float: The slope, 1 for linear and 2 for quadratic scaling, or None with less than two usable values.
+    """
+    points = [(size, value) for size, value in zip(sizes, values) if value is not None and value > min_value]
+    if len(points) < 2:
+        return None
+    sizes, values = zip(*points)
+    return float(np.polyfit(np.log(sizes), np.log(values), 1)[0])
+
+
+def summarize_scaling(measurements: list) -> dict:
+    """
+    Fit the time and memory scaling of a function.
+
+    Args:
+        measurements (list): The {frames, time_s, peak_bytes} measurements of the function.
+
+    Returns:
+        dict: The overall and tail (last two sizes) time slopes, and the memory slope.
+    """
+    sizes = [m['frames'] for m in measurements]
+    times = [m['time_s'] for m in measurements]
+    memory = [m['peak_bytes'] for m in measurements]
+    return {
+        # sub-millisecond timings are dominated by overhead
+        'time_slope': fit_slope(sizes, times, 1e-3),
+        'tail_time_slope': fit_slope(sizes[-2:], times[-2:], 1e-3),
+        'memory_slope': fit_slope(sizes, memory, 1 << 16),
+    }
+
+
+def estimate_time(measurements: list, frames: int) -> float:
+    """
+    Extrapolate the duration of a function call at a larger size from its scaling so far.
+
+    Args:
+        measurements (list): The {frames, time_s} measurements of the function.
+        frames (int): The number of frames.
+
+    Returns:
+        float: The estimated duration [sec], assuming at least linear scaling.
+    """
+    if not measurements:
+        return 0
+    last = measurements[-1]
+    slope = fit_slope([m['frames'] for m in measurements[-2:]], [m['time_s'] for m in measurements[-2:]], 1e-3) or 1
+    return last['time_s'] * (frames / last['frames']) ** max(slope, 1)
+
+
+def find_regressions(current: dict, previous: dict, tolerance: float = 0.2) -> list:
+    """
+    Find the functions whose time or memory scaling got worse than in a previous run.
+
+    Args:
+        current (dict): The current results.
+        previous (dict): The results of a previous run.
+        tolerance (float, optional): The slope increase allowed for noise. Defaults to 0.2.
+
+    Returns:
+        list: A description of every regression.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = previous.get('results', {}).get(name)
+        if before is None:
+            continue
+        for key in ('time_slope', 'memory_slope'):
+            slope, previous_slope = result['scaling'][key], before['scaling'][key]
+            if slope is None or previous_slope is None:
+                continue
+            if slope > previous_slope + tolerance:
+                regressions.append(f'{name}: {key} grew from {previous_slope:.2f} to {slope:.2f}')
+    return regressions
+
+
+def run_benchmarks(sizes: tuple = DEFAULT_SIZES, flies: int = 5, seed: int = 0, budget: float = 60,
+                   measure_memory: bool = True, workdir: str = None) -> dict:
+    """
+    Time the postprocessing functions on synthetic tracks data of growing length.
+
+    A function expected to take longer than `budget` at a size, extrapolated from the smaller sizes,
+    is not run at that and the larger sizes.
+
+    Args:
+        sizes (tuple, optional): The numbers of frames. Defaults to 1e3 to 1e7.
+        flies (int, optional): The number of flies. Defaults to 5.
+        seed (int, optional): The random seed. Defaults to 0.
+        budget (float, optional): The time limit of a single call [sec]. Defaults to 60.
+        measure_memory (bool, optional): Measure the peak memory of every call, in an additional traced call. Defaults to True.
+        workdir (str, optional): The directory for the generated files. Defaults to a temporary directory.
+
+    Returns:
+        dict: The benchmark configuration, environment and results.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix='flytracker_benchmark_')
+    measurements = {name: [] for name in FUNCTIONS}
+    over_budget = set()
+
+    for frames in sizes:
+        print(f'generating {frames} frames...')
+        inputs = prepare_inputs(flies, frames, seed, workdir)
+        for name in FUNCTIONS:
+            if name in over_budget:
+                continue
+            if estimate_time(measurements[name], frames) > budget:
+                print(f'\t{name} is expected to exceed the time budget, skipping the larger sizes')
+                over_budget.add(name)
+                continue
+            function, get_args = inputs[name]
+            # silence the findings export messages
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                elapsed = time_call(function, get_args)
+                peak = peak_memory(function, get_args) if measure_memory else None
+            measurements[name].append({'frames': frames, 'time_s': elapsed, 'peak_bytes': peak})
+            print(f'\t{name:<20}{elapsed:>10.4f} s')
+        del inputs
+
+    return {
+        'config': {'sizes': list(sizes), 'flies': flies, 'seed': seed, 'budget': budget},
+        'environment': get_environment(('numpy',)),
+        'timestamp': time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime()),
+        'results': {
+            name: {'measurements': values, 'scaling': summarize_scaling(values)}
+            for name, values in measurements.items()
+        },
+    }
+
+
+def format_results(report: dict) -> str:
+    """
+    Format the scaling of every function as a table.
+
+    Args:
+        report (dict): The benchmark results.
+
+    Returns:
+        str: The results table.
+    """
+    slope = lambda value: f'{value:.2f}' if value is not None else '-'
+    lines = [f'{"function":<20}{"frames":>10}{"time [s]":>10}{"peak [MB]":>11}{"time ~n^":>10}{"tail ~n^":>10}{"memory ~n^":>12}']
+    for name, result in report['results'].items():
+        last = result['measurements'][-1]
+        peak = f'{last["peak_bytes"] / 2**20:.1f}' if last['peak_bytes'] is not None else '-'
+        scaling = result['scaling']
+        lines.append(
+            f'{name:<20}{last["frames"]:>10}{last["time_s"]:>10.3f}{peak:>11}{slope(scaling["time_slope"]):>10}'
+            f'{slope(scaling["tail_time_slope"]):>10}{slope(scaling["memory_slope"]):>12}'
+        )
+    return '\n'.join(lines)
+
+
+def main():
+    # usage: benchmark_postprocess.py [--sizes=1000,10000,...] [--flies=N] [--seed=N] [--budget=<sec>] [--no-memory]
+    #                                 [--output=<results.json>] [--compare=<previous.json>] [--tolerance=<slope>]
+    _, options = split_options(sys.argv[1:])
+    sizes = tuple(int(float(size)) for size in options['sizes'].split(',')) if 'sizes' in options else DEFAULT_SIZES
+
+    report = run_benchmarks(
+        sizes=sizes,
+        flies=int(options.get('flies', 5)),
+        seed=int(options.get('seed', 0)),
+        budget=float(options.get('budget', 60)),
+        measure_memory='no-memory' not in options,
+        workdir=options.get('workdir'),
+    )
+
+    output_path = options.get('output')
+    if output_path is None:
+        os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+        output_path = file_helper.join_paths(DEFAULT_OUTPUT_DIR, f'postprocess_{report["timestamp"]}_{report["environment"]["commit"]}.json')
+    with open(output_path, 'w') as file:
+        json.dump(report, file, indent=4)
+
+    print(format_results(report))
+    print(f'results saved at:\n\t{output_path}')
+
+    if 'compare' in options:
+        with open(options['compare'], 'r') as file:
+            regressions = find_regressions(report, json.load(file), float(options.get('tolerance', 0.2)))
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('no scaling regressions')
+
+
+if __name__ == '__main__':
+    main()
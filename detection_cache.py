@@ -0,0 +1,100 @@
+import numpy as np
+import json
+
+
+class DetectionCache:
+    """
+    A record of the raw per-frame detections of an analysis, allowing tracking to be replayed without the detector.
+
+    Frames are recorded in order starting at `start_frame`. A frame is either detected, holding an (N, 6) array
+    of (x1, y1, x2, y2, score, class_id) rows in full-frame coordinates and optionally the (N, D) appearance
+    embeddings of the detections, or predicted, meaning it was not passed through the detector.
+
+    Args:
+        start_frame (int, optional): The number of the first recorded frame. Defaults to 0.
+        metadata (dict, optional): JSON serializable information identifying the source of the detections.
+    """
+
+    def __init__(self, start_frame: int = 0, metadata: dict = None) -> None:
+        self.start_frame = start_frame
+        self.metadata = {} if metadata is None else metadata
+        self.__boxes = []
+        self.__embeds = []
+
+    def __len__(self) -> int:
+        return len(self.__boxes)
+
+    def append(self, boxes: np.ndarray, embeds=None) -> None:
+        """
+        Record the next frame.
+
+        Args:
+            boxes (np.ndarray): The (N, 6) detections of the frame, or None if the frame was not detected.
+            embeds (optional): The (N, D) appearance embeddings of the detections. Defaults to None.
+        """
+        self.__boxes.append(None if boxes is None else np.asarray(boxes, dtype=np.float32).reshape(-1, 6))
+        self.__embeds.append(None if embeds is None else np.asarray(embeds, dtype=np.float16))
+
+    def __iter__(self):
+        """
+        Iterate over the recorded frames.
+
+        Yields:
+            tuple: The frame number, the detections (None for predicted frames) and the embeddings (or None).
+        """
+        for index, (boxes, embeds) in enumerate(zip(self.__boxes, self.__embeds)):
+            yield self.start_frame + index, boxes, embeds
+
+    def save(self, output_path: str) -> None:
+        """
+        Save the cache as a binary `.npz` file.
+
+        The detections are stored flat, with a per-frame offsets index, predicted frames have a negative count.
+
+        Args:
+            output_path (str): The path to the output file.
+        """
+        counts = np.array([-1 if b is None else len(b) for b in self.__boxes], dtype=np.int64)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(np.maximum(counts, 0), out=offsets[1:])
+
+        detected = [b for b in self.__boxes if b is not None]
+        boxes = np.concatenate(detected) if detected else np.zeros((0, 6), dtype=np.float32)
+
+        arrays = {'counts': counts, 'offsets': offsets, 'boxes': boxes}
+        embeds = [(b, e) for b, e in zip(self.__boxes, self.__embeds) if b is not None]
+        dims = [e.shape[1] for _, e in embeds if e is not None and e.ndim == 2]
+        # store embeddings only if every detection has one, frames without detections have none to store
+        if dims and all(e is not None or len(b) == 0 for b, e in embeds):
+            arrays['embeds'] = np.concatenate([
+                e.reshape(-1, dims[0]) if e is not None else np.zeros((0, dims[0]), dtype=np.float16) for _, e in embeds
+            ])
+
+        header = json.dumps({'start_frame': self.start_frame, 'metadata': self.metadata})
+        with open(output_path, 'wb') as file:
+            np.savez(file, header=np.array(header), **arrays)
+
+    @staticmethod
+    def load(input_path: str) -> 'DetectionCache':
+        """
+        Load a cache saved with `save`.
+
+        Args:
+            input_path (str): The path to the `.npz` file.
+
+        Returns:
+            DetectionCache: The loaded cache.
+        """
+        with np.load(input_path) as file:
+            header = json.loads(str(file['header']))
+            counts, offsets, boxes = file['counts'], file['offsets'], file['boxes']
+            embeds = file['embeds'] if 'embeds' in file.files else None
+
+        cache = DetectionCache(header['start_frame'], header['metadata'])
+        for index, count in enumerate(counts):
+            if count < 0:
+                cache.append(None)
+                continue
+            begin, end = offsets[index], offsets[index + 1]
+            cache.append(boxes[begin:end], None if embeds is None else embeds[begin:end])
+        return cache
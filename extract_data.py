@@ -3,7 +3,7 @@ from data_postprocess import filter_by_ids
 import csv
 import re
 import numpy as np
-import cv2
+import frame_source
 import os
 
 __PX2CM = 1 / 25
@@ -214,7 +214,7 @@ def extract_findings(results_csv_path: str, requested_ids: set = None) -> str:
     """
     # read and parse available data
     video_path = results_csv_path.replace('_result.csv', '.avi')
-    data = storage_helper.read_from_csv(results_csv_path)
+    data = storage_helper.read_tracks_csv(results_csv_path)
     data_from_video_path = decompose_path(video_path)
 
     # prepare export filepath
@@ -225,14 +225,12 @@ def extract_findings(results_csv_path: str, requested_ids: set = None) -> str:
     
     # find the video frame rate and dimensions
     try:
-        capture = cv2.VideoCapture(video_path)
-        if not capture.isOpened:
-            raise Exception()
-        frame_rate = int(capture.get(cv2.CAP_PROP_FPS))
-        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        capture = frame_source.open_video(video_path)
+        frame_rate = int(capture.fps)
+        width = capture.width
+        height = capture.height
         capture.release()
-    except:
+    except Exception:
         frame_rate = 30
         width = 70
         height = 420
@@ -1,4 +1,5 @@
 from pathlib import Path
+import hashlib
 
 def normalize_path(file_path: str) -> str:
     """
@@ -78,3 +79,30 @@ def split_path(path: str) -> tuple[str, str, str]:
     """
     path = Path(path)
     return normalize_path(path.parent), path.stem, path.suffix
+
+def hash_file(path: str, sample_size: int = None) -> str:
+    """
+    Compute a SHA-256 digest identifying a file.
+
+    For large files (such as hour-long videos) hashing every byte is slow, so when `sample_size` is given
+    only the file size and its first and last `sample_size` bytes are hashed.
+
+    Args:
+        path (str): The path to the file.
+        sample_size (int, optional): Number of bytes sampled from each end of the file. Defaults to None (whole file).
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    size = Path(path).stat().st_size
+    with open(path, 'rb') as file:
+        if sample_size is None or size <= 2 * sample_size:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        else:
+            digest.update(str(size).encode())
+            digest.update(file.read(sample_size))
+            file.seek(-sample_size, 2)
+            digest.update(file.read(sample_size))
+    return digest.hexdigest()
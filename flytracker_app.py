@@ -1,145 +1,771 @@
 from FlyTracker import FlyTracker
-import cv2
+from detection_cache import DetectionCache
 from tqdm import tqdm
 from data_postprocess import process_data, generate_links
 from video_postprocess import annotate_video
 import video_preprocess
+import frame_source
 import file_helper
 import storage_helper
+from args_helper import split_options, break_down_args, parse_bool, parse_roi, parse_analysis_options, parse_tracker_options, parse_runtime_options
+import runtime_config
+from track_stitching import split_frame_range, stitch_segments
 import sys, os, time
+import json
+import threading, queue
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr, nullcontext
+from stage_timer import StageTimer
+from memory_tracker import MemoryTracker
+import traceback
+import pickle
 
 
-def preprocess_frame(frame):
-    # RED LUT
-    __R_LUT_X=[0, 100, 110, 150, 255]
-    __R_LUT_Y=[0, 146, 238, 255, 255]
+WEIGHTS_PATH = './_internal/weights.pt'
 
-    # GREEN LUT
-    __G_LUT_X=[0, 100, 110, 150, 255]
-    __G_LUT_Y=[0, 0, 156, 255, 255]
+# bytes hashed from each end of a video to identify it, hashing whole videos is too slow
+VIDEO_HASH_SAMPLE_SIZE = 4 << 20
 
-    # BLUE LUT
-    __B_LUT_X=[0, 63, 127, 191, 255]
-    __B_LUT_Y=[0, 0, 255, 255, 255]
-    lut_r = video_preprocess.create_lut_8uc1(__R_LUT_X, __R_LUT_Y)
-    lut_g = video_preprocess.create_lut_8uc1(__G_LUT_X, __G_LUT_Y)
-    lut_b = video_preprocess.create_lut_8uc1(__B_LUT_X, __B_LUT_Y)
+# analysis arguments that change how fast the frames are read, not the results, left out of the checkpoint settings
+RUNTIME_ANALYSIS_ARGS = ('prefetch', 'preprocess_workers', 'decode_threads')
 
-    adjusted_frame = video_preprocess.apply_curves_to_channels(frame, lut_r, lut_g, lut_b)
-    adjusted_frame = video_preprocess.to_grayscale_3c(adjusted_frame)
-    return adjusted_frame
 
+# the default preprocessing, color curves separating the flies from the background followed by a grayscale conversion
+PREPROCESS_PIPELINE = video_preprocess.PreprocessPipeline(
+    r_curve=([0, 100, 110, 150, 255], [0, 146, 238, 255, 255]),
+    g_curve=([0, 100, 110, 150, 255], [0, 0, 156, 255, 255]),
+    b_curve=([0, 63, 127, 191, 255], [0, 0, 255, 255, 255]),
+    grayscale=True,
+)
 
-def analyze_video(fly_tracker: FlyTracker, video_path: str, start_frame, end_frame, frame_preprocess_method = None):
-    # setup opencv video reader
-    stream = cv2.VideoCapture(video_path)
+
+def preprocess_frame(frame):
+    return PREPROCESS_PIPELINE(frame)
+
+
+def get_preprocess_pipeline(option) -> video_preprocess.PreprocessPipeline:
+    """
+    Get the preprocessing pipeline selected by the `--preprocess` option.
+
+    Args:
+        option: True for the default pipeline, the path to a JSON pipeline configuration, or None for no preprocessing.
+
+    Returns:
+        PreprocessPipeline: The pipeline, or None.
+    """
+    if option is None or option is False:
+        return None
+    if option is True:
+        return PREPROCESS_PIPELINE
+    with open(option, 'r') as file:
+        return video_preprocess.PreprocessPipeline.from_config(json.load(file))
+
+
+def get_preprocess_config(preprocess_method):
+    """
+    Describe a preprocess method for the analysis configuration.
+
+    Args:
+        preprocess_method (callable): The method applied to every frame, or None.
+
+    Returns:
+        The pipeline configuration, the method name for plain functions, or None.
+    """
+    if isinstance(preprocess_method, video_preprocess.PreprocessPipeline):
+        return preprocess_method.to_config()
+    return getattr(preprocess_method, '__name__', None)
+
+
+def prefetch_frames(stream, frames_count: int, frame_preprocess_method, prefetch: int = 32, workers: int = 2, timer: StageTimer = None):
+    """
+    Read and preprocess frames ahead of the consumer, yielding them in order.
+
+    A decoder thread reads frames from the stream and submits them to a pool of preprocessing
+    workers, the pending results are held in a bounded queue so decoding blocks once the
+    consumer falls `prefetch` frames behind, keeping memory flat on long videos.
+
+    Args:
+        stream (FrameSource): An opened stream, positioned at the first frame to read.
+        frames_count (int): The number of frames to read.
+        frame_preprocess_method (callable): The method applied to every frame.
+        prefetch (int, optional): Maximum number of frames read ahead. Defaults to 32.
+        workers (int, optional): Number of preprocessing threads. Defaults to 2.
+        timer (StageTimer, optional): Measures the decode stage when set. Defaults to None.
+
+    Yields:
+        numpy.ndarray: The preprocessed frames, stops early if a frame could not be read.
+    """
+    pending = queue.Queue(maxsize=max(int(prefetch), 1))
+    stop = threading.Event()
+    timed = timer.measure if timer is not None else lambda stage: nullcontext()
+
+    def put(item) -> bool:
+        # block while the queue is full, unless the consumer has stopped
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def decode():
+        try:
+            for _ in range(frames_count):
+                with timed('decode'):
+                    success, frame = stream.read()
+                if not success:
+                    break
+                if not put(pool.submit(frame_preprocess_method, frame)):
+                    return
+        finally:
+            put(None)
+
+    with ThreadPoolExecutor(max_workers=max(int(workers), 1)) as pool:
+        decoder = threading.Thread(target=decode, daemon=True)
+        decoder.start()
+        try:
+            while True:
+                future = pending.get()
+                if future is None:
+                    break
+                yield future.result()
+        finally:
+            # release the decoder if the consumer exits early
+            stop.set()
+            decoder.join()
+
+
+def scale_tracks(tracks: list, factor: float) -> list:
+    """
+    Scale the boxes of tracks.
+
+    Args:
+        tracks (list): A list of track tuples.
+        factor (float): The scaling factor.
+
+    Returns:
+        list: The scaled tracks.
+    """
+    return [(id, conf, x1 * factor, y1 * factor, x2 * factor, y2 * factor) for id, conf, x1, y1, x2, y2 in tracks]
+
+
+def analyze_video(fly_tracker: FlyTracker, video_path: str, start_frame, end_frame, frame_preprocess_method = None, batch_size = 1,
+                  prefetch = 32, preprocess_workers = 2, roi = None,
+                  detection_stride = 1, motion_threshold = 5.0, uncertainty_threshold = 10.0, detections_cache = None,
+                  progress_callback = None, checkpoint_callback = None, checkpoint_interval = 0, resume_state = None,
+                  raw_writer = None, decoder = 'opencv', decode_scale = 1.0, decode_threads = 0, timer = None, memory = None):
+    # setup the video reader, optionally downscaling the frames while decoding
+    stream = frame_source.open_video(video_path, decoder, decode_scale, decode_threads)
 
     if start_frame is None:
         start_frame = 0
     if end_frame is None:
-        end_frame = int(stream.get(cv2.CAP_PROP_FRAME_COUNT))
+        end_frame = stream.frame_count
     
-    stream.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-    success, frame = stream.read()
+    stream.seek(start_frame)
+
+    # detection runs on the downscaled frames, the region of interest is scaled to match
+    # and the tracks are scaled back to the video coordinates
+    if roi is not None and decode_scale != 1.0:
+        roi = {k: int(v * decode_scale) for k, v in roi.items()}
+
+    # pick the inference size for the analyzed region geometry
+    width = stream.width
+    height = stream.height
+    if roi is not None:
+        width = min(roi['x_max'], width - 1) - max(roi['x_min'], 0) + 1
+        height = min(roi['y_max'], height - 1) - max(roi['y_min'], 0) + 1
+    fly_tracker.set_frame_geometry(width, height)
 
     # prepare variables for storing data
-    frames_count = int(stream.get(cv2.CAP_PROP_FRAME_COUNT))
-    skipped_frames = list(range(start_frame)) + list(range(end_frame, frames_count))
-    data = { k:[] for k in skipped_frames }
+    # when streaming, the frames are written as they complete instead, the skipped frames around the range included
+    frames_count = stream.frame_count
+    if raw_writer is None:
+        skipped_frames = list(range(start_frame)) + list(range(end_frame, frames_count))
+        data = { k:[] for k in skipped_frames }
+    else:
+        data = {}
+        if resume_state is None:
+            for skipped_frame in range(start_frame):
+                raw_writer.write(skipped_frame, [])
 
     # prepare preprocess method
     if frame_preprocess_method is None:
         frame_preprocess_method = lambda f: f
+    elif timer is not None:
+        frame_preprocess_method = timer.wrap('preprocess', frame_preprocess_method)
+    timed = timer.measure if timer is not None else lambda stage: nullcontext()
+
+    batch_size = max(int(batch_size), 1)
+    detection_stride = max(int(detection_stride), 1)
+    frames_since_detection = 0
+    # whether a frame is detected depends on the tracks of the previous one, so strided frames are not batched
+    if detection_stride > 1 and batch_size > 1:
+        print(f'warning: the batch size {batch_size} is ignored with a detection stride, the frames are detected one at a time.')
+
+    # continue from a checkpoint, with the tracks and tracker state of the frames already tracked
+    resume_frame = start_frame
+    if resume_state is not None:
+        data = resume_state['data']
+        resume_frame = resume_state['frame_number']
+        frames_since_detection = resume_state['frames_since_detection']
+        fly_tracker.set_tracking_state(resume_state['tracker_state'])
+        stream.seek(resume_frame)
+        print(f'resuming from frame {resume_frame}')
+
+    last_checkpoint = resume_frame
+    def checkpoint(frame_number):
+        nonlocal last_checkpoint
+        last_checkpoint = frame_number
+        checkpoint_callback({
+            'frame_number': frame_number,
+            'data': data,
+            'raw_offset': None if raw_writer is None else raw_writer.tell(),
+            'frames_since_detection': frames_since_detection,
+            'tracker_state': fly_tracker.get_tracking_state(),
+        })
+
+    def detect_strided(frame):
+        # run the detector every `detection_stride` frames, or sooner when the motion model becomes unreliable,
+        # in between the tracks are predicted by the tracker motion model
+        nonlocal frames_since_detection
+        frames_elapsed = frames_since_detection + 1
+        if frames_elapsed >= detection_stride or fly_tracker.needs_detection(frames_elapsed, motion_threshold, uncertainty_threshold):
+            frames_since_detection = 0
+            return fly_tracker.detect(frame, roi)
+        frames_since_detection = frames_elapsed
+        return fly_tracker.predict()
+
+    def flush(frames, frame_number):
+        if detection_stride > 1:
+            batch_tracks = [detect_strided(frame) for frame in frames]
+        elif batch_size == 1:
+            batch_tracks = [fly_tracker.detect(frame, roi) for frame in frames]
+        else:
+            batch_tracks = fly_tracker.detect_batch(frames, roi)
+        for tracks in batch_tracks:
+            if decode_scale != 1.0:
+                tracks = scale_tracks(tracks, 1 / decode_scale)
+            if raw_writer is None:
+                data[frame_number] = tracks
+            else:
+                with timed('write'):
+                    raw_writer.write(frame_number, tracks)
+            frame_number += 1
+        progress.update(len(frames))
+        if progress_callback is not None:
+            progress_callback(frame_number - start_frame, end_frame - start_frame)
+        # checkpoints are only taken between batches, so a resumed run batches the frames the same way
+        if checkpoint_callback is not None and checkpoint_interval > 0 and frame_number - last_checkpoint >= checkpoint_interval:
+            checkpoint(frame_number)
+        return frame_number
+
+    # record the raw detections if requested
+    if detections_cache is not None:
+        detections_cache.start_frame = start_frame
+    fly_tracker.recorder = detections_cache
+    fly_tracker.timer = timer
 
     # setup progress bar
-    # iterate over video frames, and append tracks to the data variable
-    for frame_number in tqdm(range(start_frame, end_frame), desc='Analysis Progress', unit='frame', dynamic_ncols=True):
-        if not success:
-            print(f'Failed to read frame {frame_number} from {video_path}')
-            break
-        frame = frame_preprocess_method(frame)
-        tracks = fly_tracker.detect(frame)
-
-        data[frame_number] = tracks
-
-        success, frame = stream.read()
+    # decode and preprocess frames ahead, then track them in order and append tracks to the data variable
+    progress = tqdm(total=end_frame - start_frame, initial=resume_frame - start_frame, desc='Analysis Progress', unit='frame', dynamic_ncols=True)
+    frame_number = resume_frame
+    frames = []
+    try:
+        for frame in prefetch_frames(stream, end_frame - resume_frame, frame_preprocess_method, prefetch, preprocess_workers, timer):
+            frames.append(frame)
+            if len(frames) == batch_size:
+                frame_number = flush(frames, frame_number)
+                frames = []
+        frame_number = flush(frames, frame_number)
+    finally:
+        fly_tracker.recorder = None
+        fly_tracker.timer = None
+
+    # a final checkpoint lets a run interrupted while exporting skip the analysis
+    if checkpoint_callback is not None and checkpoint_interval > 0 and frame_number > last_checkpoint:
+        checkpoint(frame_number)
+
+    if raw_writer is not None:
+        for skipped_frame in range(end_frame, frames_count):
+            raw_writer.write(skipped_frame, [])
+        raw_writer.flush()
+
+    if frame_number < end_frame:
+        print(f'Failed to read frame {frame_number} from {video_path}')
     
     # close streams and progress bars
+    progress.close()
     stream.release()
 
+    # streamed frames are not kept, their tracks are reported as the `raw_data` read back by the export
+    if memory is not None and raw_writer is None:
+        memory.track('analyze_video data', data)
     return data
 
 
-def process_video(ft: FlyTracker, video_path: str, start_frame, end_frame, preprocess_method) -> None:
+def export_results(raw_data: dict, video_path: str, write_raw: bool = True, decoder: str = 'opencv', timer: StageTimer = None,
+                   memory: MemoryTracker = None) -> None:
     # prepare output basename
     output_path = storage_helper.get_prepared_path(video_path)
-
-    # read and process data
-    raw_data = analyze_video(ft, video_path, start_frame, end_frame, preprocess_method)
-    links = generate_links(raw_data, max_tracks_gap=3)
-    processed_data = process_data(raw_data, links)
-
-    # outputs
-    storage_helper.write_to_csv(raw_data, f'{output_path}_raw.csv')
-    annotate_video(processed_data, video_path, f'{output_path}_result.mp4')
-    storage_helper.write_to_csv(processed_data, f'{output_path}_result.csv')
+    timed = timer.measure if timer is not None else lambda stage: nullcontext()
+    measured = memory.measure if memory is not None else lambda stage: nullcontext()
+
+    # process data
+    with timed('link'), measured('link'):
+        links = generate_links(raw_data, max_tracks_gap=3)
+        processed_data = process_data(raw_data, links)
+    if memory is not None:
+        memory.track('raw_data', raw_data)
+        memory.track('processed_data', processed_data)
+
+    # outputs, the raw data may have been streamed to its file already
+    # the binary track stores are loaded by the editor, the CSV files are kept for exchange
+    with timed('write'), measured('write'):
+        if write_raw:
+            storage_helper.write_tracks_csv(raw_data, f'{output_path}_raw.csv')
+        storage_helper.write_tracks_csv(processed_data, f'{output_path}_result.csv')
+        storage_helper.write_track_store(raw_data, storage_helper.get_track_store_path(video_path, 'raw'))
+        storage_helper.write_track_store(processed_data, storage_helper.get_track_store_path(video_path, 'result'))
+    with timed('annotate'), measured('annotate'):
+        annotate_video(processed_data, video_path, f'{output_path}_result.mp4', decoder=decoder, memory=memory)
 
     # notify the user
-    print(f'results saved at:\n\t{output_path}_result.mp4\n\t{output_path}_result.csv\n\t{output_path}_raw.csv\n')
+    print(f'results saved at:\n\t{output_path}_result.mp4\n\t{output_path}_result.csv\n\t{output_path}_raw.csv\n'
+          f'\t{output_path}_result_tracks.npy\n\t{output_path}_raw_tracks.npy\n')
+
+    # report where the time went
+    if timer is not None:
+        timer.save(f'{output_path}_run_report.json', video=video_path, frames=len(raw_data))
+        print(f'{timer.format_summary()}\nrun report saved at:\n\t{output_path}_run_report.json\n')
+
+    # report where the memory went
+    if memory is not None:
+        memory.save(f'{output_path}_memory_report.json', video=video_path, frames=len(raw_data))
+        print(f'{memory.format_summary()}\nmemory report saved at:\n\t{output_path}_memory_report.json\n')
+
+
+def save_checkpoint(checkpoint: dict, video_path: str) -> None:
+    """
+    Save an analysis checkpoint next to the video, replacing the previous one.
+
+    Args:
+        checkpoint (dict): The checkpoint, the analysis state and the settings it was created with.
+        video_path (str): The path to the video file.
+    """
+    checkpoint_path = storage_helper.get_checkpoint_path(video_path)
+    # write to a temporary file first, so an interruption while saving keeps the previous checkpoint intact
+    with open(f'{checkpoint_path}.tmp', 'wb') as file:
+        pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f'{checkpoint_path}.tmp', checkpoint_path)
+
+
+def load_checkpoint(video_path: str, settings: dict) -> dict:
+    """
+    Load the analysis checkpoint of a video, if it was created with the same settings.
+
+    Args:
+        video_path (str): The path to the video file.
+        settings (dict): The settings of the current analysis.
+
+    Returns:
+        dict: The checkpoint if it exists and is valid, otherwise None.
+    """
+    checkpoint_path = storage_helper.get_checkpoint_path(video_path)
+    if not file_helper.check_existance(checkpoint_path):
+        print(f'no checkpoint found at "{checkpoint_path}".')
+        return None
+
+    with open(checkpoint_path, 'rb') as file:
+        checkpoint = pickle.load(file)
+    if checkpoint.get('settings') != settings:
+        print(f'the checkpoint at "{checkpoint_path}" was created with different settings, starting over.')
+        return None
+    return checkpoint
+
+
+def process_video(ft: FlyTracker, video_path: str, start_frame, end_frame, preprocess_method, roi = None,
+                  cache_detections = False, checkpoint_interval = 0, resume = False, profile_memory = False,
+                  progress_callback = None, **analysis_args) -> None:
+    # use the region of interest stored for the video, unless one was given
+    if roi is None:
+        roi = storage_helper.read_roi(video_path)
+    if roi is not None:
+        print(f'restricting detection to {roi}')
+
+    # the background model cannot be saved, a resumed analysis would not detect the same blobs
+    if ft.background_detector is not None and (resume or checkpoint_interval):
+        print(f'analyses with the "{ft.detector_backend}" detector are not checkpointed, starting over.')
+        resume, checkpoint_interval = False, 0
+
+    # a checkpoint is only resumed by an analysis that would produce the same results,
+    # the settings are pickled with it and compared on resume, so they hold plain values only
+    settings = {
+        'video_hash': file_helper.hash_file(video_path, VIDEO_HASH_SAMPLE_SIZE),
+        'weights_hash': file_helper.hash_file(ft.model_path),
+        'start_frame': start_frame,
+        'end_frame': end_frame,
+        'roi': roi,
+        'detector': ft.detector_config(),
+        'tracker': type(ft.tracker).__name__,
+        'preprocess': get_preprocess_config(preprocess_method),
+        'cache_detections': cache_detections,
+        'analysis': {k: v for k, v in analysis_args.items() if k not in RUNTIME_ANALYSIS_ARGS and not callable(v)},
+        'raw_stream': True,
+    }
+    checkpoint = load_checkpoint(video_path, settings) if resume else None
+
+    # read data, recording the raw detections if requested
+    detections_cache = DetectionCache() if cache_detections else None
+    if checkpoint is not None:
+        detections_cache = checkpoint['detections_cache']
+
+    def save_state(state):
+        save_checkpoint({'settings': settings, 'detections_cache': detections_cache, **state}, video_path)
+
+    # trace the memory of every stage when requested, tracing slows the analysis down
+    memory = MemoryTracker() if profile_memory else None
+    measured = memory.measure if memory is not None else lambda stage: nullcontext()
+    with memory if memory is not None else nullcontext():
+        # stream the tracked frames to the raw file, continuing it when resuming
+        timer = StageTimer()
+        raw_path = f'{storage_helper.get_prepared_path(video_path)}_raw.csv'
+        resume_offset = None if checkpoint is None else checkpoint['raw_offset']
+        with storage_helper.RawDataWriter(raw_path, resume_offset=resume_offset) as raw_writer, measured('analyze'):
+            analyze_video(ft, video_path, start_frame, end_frame, preprocess_method, roi=roi,
+                          detections_cache=detections_cache, checkpoint_callback=save_state,
+                          checkpoint_interval=checkpoint_interval, resume_state=checkpoint, raw_writer=raw_writer,
+                          progress_callback=progress_callback, timer=timer, memory=memory, **analysis_args)
+
+        # the post processing needs all the frames at once
+        with timer.measure('read'), measured('read'):
+            raw_data = storage_helper.read_tracks_csv(raw_path)
+
+        if detections_cache is not None:
+            detections_cache.metadata = {
+                'video_hash': file_helper.hash_file(video_path, VIDEO_HASH_SAMPLE_SIZE),
+                'weights_hash': file_helper.hash_file(ft.model_path),
+                'frames_count': max(raw_data.keys()) + 1 if raw_data else 0,
+                'detector': ft.detector_config(),
+                'roi': roi,
+                'decode_scale': analysis_args.get('decode_scale', 1.0),
+                'preprocess': get_preprocess_config(preprocess_method),
+            }
+            detections_cache.save(storage_helper.get_detections_cache_path(video_path))
+            if memory is not None:
+                memory.track('detections_cache', detections_cache)
+
+        export_results(raw_data, video_path, write_raw=False, decoder=analysis_args.get('decoder', 'opencv'), timer=timer, memory=memory)
+
+    # the results are complete, the checkpoint is no longer needed
+    checkpoint_path = storage_helper.get_checkpoint_path(video_path)
+    if file_helper.check_existance(checkpoint_path):
+        os.remove(checkpoint_path)
 
     # reset tracking for next video
     ft.reset_tracking()
     return
 
 
-def break_down_args(args):
-    def is_int(string: str) -> bool:
+def load_detections_cache(video_path: str, weights_path: str, ft: FlyTracker = None) -> DetectionCache:
+    """
+    Load the raw detections cache of a video, if it matches the video and weights.
+
+    Args:
+        video_path (str): The path to the video file.
+        weights_path (str): The path to the YOLO weights.
+        ft (FlyTracker, optional): The tracker the cache is replayed through, a DeepSort tracker needs the cache
+            to hold the appearance embeddings. Defaults to None (not checked).
+
+    Returns:
+        DetectionCache: The cache if it exists and is valid, otherwise None.
+    """
+    cache_path = storage_helper.get_detections_cache_path(video_path)
+    if not file_helper.check_existance(cache_path):
+        return None
+
+    cache = DetectionCache.load(cache_path)
+    if cache.metadata.get('video_hash') != file_helper.hash_file(video_path, VIDEO_HASH_SAMPLE_SIZE):
+        print(f'the detections cache at "{cache_path}" does not match the video.')
+        return None
+    if cache.metadata.get('weights_hash') != file_helper.hash_file(weights_path):
+        print(f'the detections cache at "{cache_path}" was created with different weights.')
+        return None
+    if ft is not None and ft.detector_config()['embeds'] and not cache.metadata['detector'].get('embeds'):
+        print(f'the detections cache at "{cache_path}" holds no appearance embeddings, which the DeepSort tracker needs.')
+        return None
+    return cache
+
+
+def retrack_video(ft: FlyTracker, video_path: str, cache: DetectionCache, profile_memory: bool = False) -> None:
+    # replay the recorded detections through the tracker, without decoding the video or running the detector
+    detector = cache.metadata['detector']
+    cached_threshold = detector.get('conf') or 0
+    # the yolo predictor applies its default threshold when none is passed, the background blobs are not filtered
+    if detector.get('backend', 'yolo') != 'background':
+        cached_threshold = max(cached_threshold, FlyTracker.PREDICTOR_CONFIDENCE)
+    if cached_threshold > ft.confidence_threshold:
+        print(f'warning: detections were cached with confidence threshold {cached_threshold}, lower thresholds have no effect.')
+
+    # detections of downscaled frames are scaled back to the video coordinates
+    decode_scale = cache.metadata.get('decode_scale', 1.0)
+    timer = StageTimer()
+    memory = MemoryTracker() if profile_memory else None
+    measured = memory.measure if memory is not None else lambda stage: nullcontext()
+    with memory if memory is not None else nullcontext():
+        ft.timer = timer
+        raw_data = { k:[] for k in range(cache.metadata['frames_count']) }
         try:
-            int(string)
-            return True
-        except:
-            return False
-    
-    # split into lists
-    result = []
-    for arg in args:
-        if is_int(arg):
-            result[-1].append(int(arg))
-        else:
-            result.append([arg])
-    
-    # format into tuples
-    filtered_args = []
-    for arg in result:
-        if   len(arg) == 1:
-            filtered_args.append((arg[0], None, None))
-        elif len(arg) == 2:
-            filtered_args.append((arg[0], arg[1], None))
-        elif len(arg) == 3:
-            filtered_args.append((arg[0], arg[1], arg[2]))
-
-    # verify correctness
-    for arg in filtered_args:
-        path, start, end = arg
-        if not isinstance(path, str):
-            raise Exception()
-        if not isinstance(start, int) and start is not None:
-            raise Exception()
-        if not isinstance(end, int) and end is not None:
-            raise Exception()
+            with measured('retrack'):
+                for frame_number, boxes, embeds in tqdm(cache, desc='Re-tracking Progress', unit='frame', dynamic_ncols=True):
+                    raw_data[frame_number] = scale_tracks(ft.replay(boxes, embeds), 1 / decode_scale)
+        finally:
+            ft.timer = None
+        if memory is not None:
+            memory.track('detections_cache', cache)
 
-    return filtered_args
+        export_results(raw_data, video_path, timer=timer, memory=memory)
+
+    # reset tracking for next video
+    ft.reset_tracking()
+    return
+
+
+def run_video(get_tracker, video_path: str, start_frame, end_frame, preprocess_method, roi, retrack: bool,
+              tracker_args: dict, analysis_args: dict) -> None:
+    # re-track from the cached raw detections when possible
+    if retrack:
+        ft = FlyTracker(None, **tracker_args)
+        cache = load_detections_cache(video_path, WEIGHTS_PATH, ft)
+        if cache is not None:
+            # the cache holds the detections of the frames and region it was recorded with
+            if start_frame is not None or end_frame is not None or roi is not None:
+                print('the start and end frames and the region of interest are ignored when re-tracking, all the cached frames are replayed.')
+            retrack_video(ft, video_path, cache, analysis_args.get('profile_memory', False))
+            return
+        print('no valid detections cache found, running a full analysis.')
+
+    process_video(get_tracker(), video_path, start_frame, end_frame, preprocess_method, roi, **analysis_args)
+
+
+def get_analyzed_length(video_path: str, start_frame, end_frame) -> int:
+    """
+    Get the number of frames an analysis of a video would process.
+
+    Args:
+        video_path (str): The path to the video file.
+        start_frame (int): The first frame to analyze, or None for the start of the video.
+        end_frame (int): The frame to stop the analysis at, or None for the end of the video.
+
+    Returns:
+        int: The number of analyzed frames.
+    """
+    stream = frame_source.open_video(video_path)
+    frames_count = stream.frame_count
+    stream.release()
+    start_frame = 0 if start_frame is None else start_frame
+    end_frame = frames_count if end_frame is None else min(end_frame, frames_count)
+    return max(end_frame - start_frame, 0)
+
+
+# the tracker of a pool worker process, created on its first job and kept for the following ones
+_POOL_TRACKER = None
+_POOL_TRACKER_ARGS = None
+_POOL_RUNTIME = None
+_POOL_PROGRESS = None
+
+
+def init_pool_worker(tracker_args: dict, runtime_args: dict, workers: int, worker_counter, progress_counter = None) -> None:
+    global _POOL_TRACKER_ARGS, _POOL_RUNTIME, _POOL_PROGRESS
+    _POOL_TRACKER_ARGS = tracker_args
+    _POOL_PROGRESS = progress_counter
+
+    # split the cores between the workers, each worker takes the next index
+    with worker_counter.get_lock():
+        worker_index = worker_counter.value
+        worker_counter.value += 1
+    _POOL_RUNTIME = runtime_config.configure_threads(workers=workers, worker_index=worker_index, **runtime_args)
+
+
+def get_pool_tracker() -> FlyTracker:
+    global _POOL_TRACKER
+    if _POOL_TRACKER is None:
+        _POOL_TRACKER = FlyTracker(WEIGHTS_PATH, **_POOL_TRACKER_ARGS)
+    return _POOL_TRACKER
+
+
+def run_pool_job(job: tuple) -> tuple:
+    """
+    Analyze a single video in a pool worker process, writing its output to a log file next to the video.
+
+    Args:
+        job (tuple): The `run_video` arguments, without the tracker getter.
+
+    Returns:
+        tuple: The video path, whether the analysis succeeded, and the error message if it failed.
+    """
+    video_path = job[0]
+    log_path = f'{storage_helper.get_prepared_path(video_path)}_analysis.log'
+    with open(log_path, 'w') as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            print(f'runtime settings: {_POOL_RUNTIME}')
+            print(f'working on "{video_path}"...')
+            run_video(get_pool_tracker, *job)
+            return video_path, True, None
+        except Exception as err:
+            traceback.print_exc()
+            # the tracker may be what failed to build, it is only reset when it exists
+            if _POOL_TRACKER is not None:
+                _POOL_TRACKER.reset_tracking()
+            return video_path, False, str(err)
+
+
+def process_videos_parallel(jobs: list, workers: int, tracker_args: dict, runtime_args: dict = None) -> list:
+    """
+    Analyze videos in a pool of worker processes, each holding its own tracker.
+
+    The videos are scheduled longest first, so the longest analyses don't end up running last.
+    Every video's output is written to its own `_analysis.log` file.
+
+    Args:
+        jobs (list): The `run_video` arguments of every video, without the tracker getter.
+        workers (int): The number of worker processes.
+        tracker_args (dict): The `FlyTracker` arguments.
+        runtime_args (dict, optional): The `runtime_config.configure_threads` arguments of each worker. Defaults to None.
+
+    Returns:
+        list: The (video path, success, error) results, in completion order.
+    """
+    jobs = sorted(jobs, key=lambda job: get_analyzed_length(job[0], job[1], job[2]), reverse=True)
+    workers = min(workers, len(jobs))
+
+    results = []
+    initargs = (tracker_args, runtime_args or {}, workers, multiprocessing.Value('i', 0))
+    with multiprocessing.Pool(processes=workers, initializer=init_pool_worker, initargs=initargs) as pool:
+        for video_path, success, error in tqdm(pool.imap_unordered(run_pool_job, jobs, chunksize=1), total=len(jobs),
+                                               desc='Videos Progress', unit='video', dynamic_ncols=True):
+            print(f'{"finished" if success else "failed"} "{video_path}"' + ('' if success else f': {error}'))
+            results.append((video_path, success, error))
+    return results
+
+
+def run_segment_job(job: tuple) -> tuple:
+    """
+    Track a single segment of a video in a pool worker process, starting from a fresh tracker state.
+
+    Args:
+        job (tuple): The video path, segment start and end frames, preprocess method, region of interest and analysis arguments.
+
+    Returns:
+        tuple: The segment start and end frames, and the data of the segment frames.
+    """
+    video_path, start_frame, end_frame, preprocess_method, roi, analysis_args = job
+
+    # the frames done are summed over all segments in the shared counter
+    reported = 0
+    def report_progress(done, total):
+        nonlocal reported
+        with _POOL_PROGRESS.get_lock():
+            _POOL_PROGRESS.value += done - reported
+        reported = done
+
+    ft = get_pool_tracker()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+        try:
+            data = analyze_video(ft, video_path, start_frame, end_frame, preprocess_method, roi=roi,
+                                 progress_callback=report_progress, **analysis_args)
+        finally:
+            ft.reset_tracking()
+    return start_frame, end_frame, {frame: data[frame] for frame in range(start_frame, end_frame) if frame in data}
+
+
+def process_video_segmented(video_path: str, start_frame, end_frame, preprocess_method, roi, segments: int, overlap: int,
+                            workers: int, tracker_args: dict, runtime_args: dict = None, analysis_args: dict = None) -> None:
+    """
+    Analyze a single video split into overlapping segments, tracked in parallel worker processes.
+
+    The track IDs are stitched across the overlaps, so the results are written as from a single pass.
+
+    Args:
+        video_path (str): The path to the video file.
+        start_frame (int): The first frame to analyze, or None for the start of the video.
+        end_frame (int): The frame to stop the analysis at, or None for the end of the video.
+        preprocess_method (callable): The method applied to every frame, must be picklable.
+        roi (dict): The region of interest, or None to use the one stored for the video.
+        segments (int): The number of segments.
+        overlap (int): The number of frames shared by neighbouring segments.
+        workers (int): The number of worker processes.
+        tracker_args (dict): The `FlyTracker` arguments.
+        runtime_args (dict, optional): The `runtime_config.configure_threads` arguments of each worker. Defaults to None.
+        analysis_args (dict, optional): The `analyze_video` arguments. Defaults to None.
+    """
+    # use the region of interest stored for the video, unless one was given
+    if roi is None:
+        roi = storage_helper.read_roi(video_path)
+    if roi is not None:
+        print(f'restricting detection to {roi}')
+
+    analysis_args = dict(analysis_args or {})
+    if analysis_args.pop('cache_detections', False):
+        print('detections are not cached in segmented mode.')
+    analysis_args.pop('checkpoint_interval', None)
+    if analysis_args.pop('resume', False):
+        print('segmented analyses are not checkpointed, starting over.')
+    profile_memory = analysis_args.pop('profile_memory', False)
+
+    frames_count = get_analyzed_length(video_path, 0, None)
+    start_frame = 0 if start_frame is None else start_frame
+    end_frame = frames_count if end_frame is None else min(end_frame, frames_count)
+    ranges = split_frame_range(start_frame, end_frame, segments, overlap)
+    print(f'tracking {len(ranges)} segments: {ranges}')
+
+    # the segments are analyzed in other processes, only their total duration is measured here
+    timer = StageTimer()
+    jobs = [(video_path, start, end, preprocess_method, roi, analysis_args) for start, end in ranges]
+    workers = min(workers, len(jobs))
+    progress_counter = multiprocessing.Value('i', 0)
+    initargs = (tracker_args, runtime_args or {}, workers, multiprocessing.Value('i', 0), progress_counter)
+    with timer.measure('segments'), multiprocessing.Pool(processes=workers, initializer=init_pool_worker, initargs=initargs) as pool:
+        pending = pool.map_async(run_segment_job, jobs, chunksize=1)
+        with tqdm(total=sum(end - start for start, end in ranges), desc='Analysis Progress', unit='frame', dynamic_ncols=True) as progress:
+            while not pending.ready():
+                pending.wait(0.5)
+                progress.update(progress_counter.value - progress.n)
+        results = pending.get()
+
+    # the segments were tracked in other processes, only the stitching and export are traced here
+    memory = MemoryTracker() if profile_memory else None
+    measured = memory.measure if memory is not None else lambda stage: nullcontext()
+    with memory if memory is not None else nullcontext():
+        # frames outside the analyzed range are kept empty, as in a single pass
+        with timer.measure('stitch'), measured('stitch'):
+            raw_data = stitch_segments(results)
+        for frame in list(range(start_frame)) + list(range(end_frame, frames_count)):
+            raw_data[frame] = []
+
+        export_results(raw_data, video_path, timer=timer, memory=memory)
 
 
 def main():
     # sys.argv[0] is the name of the script
     os.chdir(os.path.dirname(os.path.abspath(sys.argv[0])))
     # sys.argv[1:] contains the arguments passed to the script
-    args = sys.argv[1:]
+    args, options = split_options(sys.argv[1:])
     if args:
         print(f'Arguments received: {args}\n')
         try:
             filtered_args = break_down_args(args)
+            roi = parse_roi(options['roi']) if 'roi' in options else None
+            analysis_args = parse_analysis_options(options)
+            tracker_args = parse_tracker_options(options)
+            retrack = parse_bool(options.get('retrack', False))
+            runtime_args = parse_runtime_options(options)
+            workers = int(options.get('workers', 1))
+            preprocess_method = get_preprocess_pipeline(options.get('preprocess'))
+            segments = int(options.get('segments', 1))
+            overlap = int(options.get('overlap', 60))
         except:
             print('Could not parse the arguments, make sure they are formatted correctly!')
             raise Exception('Could not parse the arguments, make sure they are formatted correctly!')
@@ -147,28 +773,51 @@ def main():
         print('No arguments provided!')
         raise Exception('No arguments provided!')
 
-    # setup model
-    ft = FlyTracker('./_internal/weights.pt')
-
-    # define a preprocess method for the videos
-    preprocess_method = None
-
-    # iterate over videos
+    # check videos existance
+    jobs = []
     for arg in filtered_args:
-        # check video existance
         video_path = file_helper.normalize_path(arg[0])
-        start_frame = arg[1]
-        end_frame = arg[2]
-        if file_helper.check_existance(video_path):
-            print(f'working on "{video_path}"...')
-        else:
+        if not file_helper.check_existance(video_path):
             print(f'could not locate the video at "{video_path}".')
             continue
-        
-        process_video(ft, video_path, start_frame, end_frame, preprocess_method)
+        jobs.append((video_path, arg[1], arg[2], preprocess_method, roi, retrack, tracker_args, analysis_args))
+
+    # split every video into segments tracked in parallel worker processes
+    if segments > 1 and not retrack:
+        for video_path, start_frame, end_frame, *_ in jobs:
+            print(f'working on "{video_path}"...')
+            process_video_segmented(video_path, start_frame, end_frame, preprocess_method, roi, segments, overlap,
+                                    workers if workers > 1 else segments, tracker_args, runtime_args, analysis_args)
+        return
+
+    # analyze the videos in parallel worker processes
+    if workers > 1 and len(jobs) > 1:
+        results = process_videos_parallel(jobs, workers, tracker_args, runtime_args)
+        failed = [video_path for video_path, success, _ in results if not success]
+        if failed:
+            raise Exception(f'Analysis failed for: {failed}')
+        return
+
+    # limit the threads of the single process
+    runtime_config.configure_threads(**runtime_args)
+
+    # setup model, loaded once a video actually needs the detector
+    ft = None
+    def get_tracker():
+        nonlocal ft
+        if ft is None:
+            ft = FlyTracker(WEIGHTS_PATH, **tracker_args)
+        return ft
+
+    # iterate over videos
+    for job in jobs:
+        print(f'working on "{job[0]}"...')
+        run_video(get_tracker, *job)
 
 
 if __name__ == '__main__':
+    # required for worker processes of the frozen executable
+    multiprocessing.freeze_support()
     try:
         main()
         sys.exit(0)
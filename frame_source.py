@@ -0,0 +1,263 @@
+from abc import ABC, abstractmethod
+import importlib.util
+
+import cv2
+
+
+# the decoder backends, 'auto' picks PyAV when it is installed
+BACKENDS = ('opencv', 'pyav', 'auto')
+
+# seeking up to this many frames ahead grabs the frames in between instead, which is frame accurate
+# and faster than a container seek for short distances
+GRAB_SEEK_LIMIT = 250
+
+
+class FrameSource(ABC):
+    """
+    A sequential video frame reader, the common interface of the decoder backends.
+
+    Frames are read in order with `read`, or skipped without converting them with `grab`. `position` is the
+    number of the next frame to read. Frames can optionally be downscaled while decoding, the reported
+    `width` and `height` are then the downscaled size.
+
+    The `get`, `set` and `isOpened` methods mirror the `cv2.VideoCapture` interface for the frame count,
+    frame rate, frame size and position properties, so a source can stand in for a capture.
+
+    Backends implement `grab`, `read`, `seek` and `release`.
+    """
+
+    def __init__(self, video_path: str, scale: float = 1.0) -> None:
+        self.video_path = video_path
+        self.scale = scale
+        self.position = 0
+        self.frame_count = 0
+        self.fps = 0.0
+        self.source_width = 0
+        self.source_height = 0
+
+    @property
+    def width(self) -> int:
+        return max(int(round(self.source_width * self.scale)), 1)
+
+    @property
+    def height(self) -> int:
+        return max(int(round(self.source_height * self.scale)), 1)
+
+    @abstractmethod
+    def grab(self) -> bool:
+        """
+        Skip the next frame, decoding it without converting it to an image.
+
+        Returns:
+            bool: True if a frame was skipped, False at the end of the video.
+        """
+
+    @abstractmethod
+    def read(self) -> tuple:
+        """
+        Read the next frame.
+
+        Returns:
+            tuple: Whether a frame was read, and the BGR frame (None at the end of the video).
+        """
+
+    @abstractmethod
+    def seek(self, frame_number: int) -> None:
+        """
+        Position the source so the next frame read is `frame_number`.
+
+        Args:
+            frame_number (int): The frame number.
+        """
+
+    def skip(self, count: int) -> int:
+        """
+        Skip frames by grabbing them.
+
+        Args:
+            count (int): The number of frames to skip.
+
+        Returns:
+            int: The number of frames skipped, less than `count` at the end of the video.
+        """
+        for skipped in range(count):
+            if not self.grab():
+                return skipped
+        return count
+
+    @abstractmethod
+    def release(self) -> None:
+        """
+        Close the video.
+        """
+
+    def isOpened(self) -> bool:
+        return True
+
+    def get(self, prop: int) -> float:
+        properties = {
+            cv2.CAP_PROP_FRAME_COUNT: self.frame_count,
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_WIDTH: self.width,
+            cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+            cv2.CAP_PROP_POS_FRAMES: self.position,
+        }
+        return float(properties.get(prop, 0))
+
+    def set(self, prop: int, value: float) -> bool:
+        if prop != cv2.CAP_PROP_POS_FRAMES:
+            return False
+        self.seek(int(value))
+        return True
+
+
+class OpenCVFrameSource(FrameSource):
+    """
+    A frame source decoding through `cv2.VideoCapture`.
+
+    Args:
+        video_path (str): The path to the video file.
+        scale (float, optional): The downscaling factor applied to the decoded frames. Defaults to 1.0.
+    """
+
+    def __init__(self, video_path: str, scale: float = 1.0) -> None:
+        super().__init__(video_path, scale)
+        self.__capture = cv2.VideoCapture(video_path)
+        if not self.__capture.isOpened():
+            raise Exception(f'Could not open the video at "{video_path}".')
+        self.frame_count = int(self.__capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.__capture.get(cv2.CAP_PROP_FPS)
+        self.source_width = int(self.__capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.source_height = int(self.__capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def grab(self) -> bool:
+        success = self.__capture.grab()
+        self.position += int(success)
+        return success
+
+    def read(self) -> tuple:
+        success, frame = self.__capture.read()
+        if not success:
+            return False, None
+        self.position += 1
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        return True, frame
+
+    def seek(self, frame_number: int) -> None:
+        if 0 <= frame_number - self.position <= GRAB_SEEK_LIMIT:
+            self.skip(frame_number - self.position)
+            return
+        self.__capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        self.position = frame_number
+
+    def release(self) -> None:
+        self.__capture.release()
+
+
+class PyAVFrameSource(FrameSource):
+    """
+    A frame source decoding through PyAV (FFmpeg), with frame and slice threading enabled in the decoder.
+
+    Downscaling is done by FFmpeg's scaler as part of the color conversion, without a separate resize.
+
+    Args:
+        video_path (str): The path to the video file.
+        scale (float, optional): The downscaling factor applied to the decoded frames. Defaults to 1.0.
+        threads (int, optional): The number of decoder threads. Defaults to 0 (chosen by FFmpeg).
+    """
+
+    def __init__(self, video_path: str, scale: float = 1.0, threads: int = 0) -> None:
+        super().__init__(video_path, scale)
+        import av
+        self.__av = av
+        self.__container = av.open(video_path)
+        self.__stream = self.__container.streams.video[0]
+        self.__stream.thread_type = 'AUTO'
+        self.__stream.thread_count = int(threads)
+
+        self.fps = float(self.__stream.average_rate or self.__stream.guessed_rate or 0)
+        self.frame_count = self.__stream.frames
+        if not self.frame_count and self.__stream.duration is not None:
+            self.frame_count = int(round(float(self.__stream.duration * self.__stream.time_base) * self.fps))
+        self.source_width = self.__stream.codec_context.width
+        self.source_height = self.__stream.codec_context.height
+        self.__start_pts = self.__stream.start_time or 0
+        self.__frames = self.__container.decode(self.__stream)
+        self.__pending = None
+
+    def __next_frame(self):
+        if self.__pending is not None:
+            frame, self.__pending = self.__pending, None
+            return frame
+        return next(self.__frames, None)
+
+    def __frame_number(self, frame) -> int:
+        return int(round(float((frame.pts - self.__start_pts) * self.__stream.time_base) * self.fps))
+
+    def grab(self) -> bool:
+        if self.__next_frame() is None:
+            return False
+        self.position += 1
+        return True
+
+    def read(self) -> tuple:
+        frame = self.__next_frame()
+        if frame is None:
+            return False, None
+        self.position += 1
+        if self.scale != 1.0:
+            return True, frame.reformat(width=self.width, height=self.height, format='bgr24', interpolation='AREA').to_ndarray()
+        return True, frame.to_ndarray(format='bgr24')
+
+    def seek(self, frame_number: int) -> None:
+        if 0 <= frame_number - self.position <= GRAB_SEEK_LIMIT:
+            self.skip(frame_number - self.position)
+            return
+
+        # seek to the keyframe before the frame, then decode up to it
+        self.__pending = None
+        if frame_number > 0 and self.fps > 0:
+            target_pts = self.__start_pts + int(frame_number / self.fps / self.__stream.time_base)
+            self.__container.seek(target_pts, stream=self.__stream, backward=True, any_frame=False)
+        else:
+            self.__container.seek(self.__start_pts, stream=self.__stream, backward=True, any_frame=False)
+        self.__frames = self.__container.decode(self.__stream)
+
+        for frame in self.__frames:
+            if frame.pts is None:
+                # no timestamps to seek by, decode from the start instead
+                self.__container.seek(self.__start_pts, stream=self.__stream, backward=True, any_frame=False)
+                self.__frames = self.__container.decode(self.__stream)
+                self.position = 0
+                self.skip(frame_number)
+                return
+            if self.__frame_number(frame) >= frame_number:
+                self.__pending = frame
+                break
+        self.position = frame_number
+
+    def release(self) -> None:
+        self.__container.close()
+
+
+def open_video(video_path: str, backend: str = 'opencv', scale: float = 1.0, threads: int = 0) -> FrameSource:
+    """
+    Open a video with the given decoder backend.
+
+    Args:
+        video_path (str): The path to the video file.
+        backend (str, optional): One of 'opencv', 'pyav' or 'auto' (PyAV when installed). Defaults to 'opencv'.
+        scale (float, optional): The downscaling factor applied to the decoded frames. Defaults to 1.0.
+        threads (int, optional): The number of decoder threads, PyAV only. Defaults to 0 (automatic).
+
+    Returns:
+        FrameSource: The opened video.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown decoder backend "{backend}", expected one of {BACKENDS}.')
+    if backend == 'auto':
+        backend = 'pyav' if importlib.util.find_spec('av') is not None else 'opencv'
+    if backend == 'pyav':
+        return PyAVFrameSource(video_path, scale, threads)
+    return OpenCVFrameSource(video_path, scale)
@@ -0,0 +1,258 @@
+from collections.abc import KeysView, ValuesView
+from contextlib import contextmanager
+from itertools import islice
+import numpy as np
+import tracemalloc
+import threading
+import json
+import sys, os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def get_rss() -> int:
+    """
+    Get the resident set size of the process.
+
+    Returns:
+        int: The resident memory [bytes], or None when it cannot be read (no psutil and no /proc).
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def deep_sizeof(obj, sample: int = 10_000, seen: set = None) -> int:
+    """
+    Estimate the memory held by an object and everything it references, e.g. a tracks data dictionary.
+
+    Containers with more than `sample` items are estimated from an evenly spaced sample of their items,
+    so sizing the data of long videos stays fast.
+
+    Args:
+        obj (object): The object.
+        sample (int, optional): The number of items sized per container. Defaults to 10,000.
+        seen (set, optional): The ids of the objects already counted. Defaults to None.
+
+    Returns:
+        int: The estimated size [bytes].
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+
+    # arrays owning their data include it in their size
+    if isinstance(obj, (str, bytes, np.ndarray)):
+        return size
+    if isinstance(obj, dict):
+        groups = [obj.keys(), obj.values()]
+    elif isinstance(obj, (list, tuple, set, frozenset, KeysView, ValuesView)):
+        groups = [obj]
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        groups = [[vars(obj)]]
+    else:
+        return size
+
+    for items in groups:
+        if len(items) == 0:
+            continue
+        step = max(len(items) // sample, 1)
+        sizes = [deep_sizeof(item, sample, seen) for item in islice(items, 0, None, step)]
+        size += int(sum(sizes) * len(items) / len(sizes))
+    return size
+
+
+class MemoryTracker:
+    """
+    Collect the memory usage of the pipeline stages of a run, and the sizes of its large data structures.
+
+    Python allocations are traced with `tracemalloc`, and the resident memory (RSS) of the process, which also
+    covers the native allocations of torch, OpenCV and numpy, is sampled in a background thread. Every stage
+    reports its peak traced and resident memory, and the source lines that held the most memory at its end.
+
+    Tracing slows the run down, so the tracker is opt-in. Stages should not be nested, each resets the traced peak.
+
+    Args:
+        sample_interval (float, optional): The resident memory sampling interval [sec]. Defaults to 0.1.
+        top_allocations (int, optional): The number of source lines reported per stage. Defaults to 10.
+    """
+
+    def __init__(self, sample_interval: float = 0.1, top_allocations: int = 10) -> None:
+        self.sample_interval = sample_interval
+        self.top_allocations = top_allocations
+        self.__stages = {}
+        self.__structures = {}
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__sampler = None
+        self.__rss_peak = 0
+        self.__stage_rss_peak = 0
+        self.__traced_peak = 0
+        self.__owns_tracing = False
+
+    def start(self) -> None:
+        """
+        Start tracing the allocations and sampling the resident memory.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__owns_tracing = True
+        self.__stop.clear()
+        self.__sampler = threading.Thread(target=self.__sample, daemon=True)
+        self.__sampler.start()
+
+    def stop(self) -> None:
+        """
+        Stop the tracing and sampling, the collected measurements are kept.
+        """
+        self.__stop.set()
+        if self.__sampler is not None:
+            self.__sampler.join()
+            self.__sampler = None
+        if self.__owns_tracing:
+            self.__traced_peak = max(self.__traced_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.__owns_tracing = False
+
+    def __enter__(self) -> 'MemoryTracker':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def __sample(self) -> None:
+        while True:
+            rss = get_rss()
+            if rss is not None:
+                with self.__lock:
+                    self.__rss_peak = max(self.__rss_peak, rss)
+                    self.__stage_rss_peak = max(self.__stage_rss_peak, rss)
+            if self.__stop.wait(self.sample_interval):
+                return
+
+    @contextmanager
+    def measure(self, stage: str):
+        """
+        Measure the memory usage of the enclosed block as a stage, repeated stages keep their largest values.
+
+        Args:
+            stage (str): The stage name.
+        """
+        if not tracemalloc.is_tracing():
+            yield
+            return
+
+        self.__traced_peak = max(self.__traced_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        rss_before = get_rss()
+        with self.__lock:
+            self.__stage_rss_peak = rss_before or 0
+        try:
+            yield
+        finally:
+            traced_after, traced_peak = tracemalloc.get_traced_memory()
+            self.__traced_peak = max(self.__traced_peak, traced_peak)
+            rss_after = get_rss()
+            with self.__lock:
+                rss_peak = max(self.__stage_rss_peak, rss_after or 0)
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:self.top_allocations]
+            self.__record(stage, {
+                'traced_before_bytes': traced_before,
+                'traced_after_bytes': traced_after,
+                'traced_peak_bytes': traced_peak,
+                'rss_before_bytes': rss_before,
+                'rss_after_bytes': rss_after,
+                'rss_peak_bytes': rss_peak if rss_after is not None else None,
+                'top_allocations': [
+                    {'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}', 'bytes': stat.size, 'count': stat.count}
+                    for stat in statistics
+                ],
+            })
+
+    def __record(self, stage: str, measurement: dict) -> None:
+        with self.__lock:
+            previous = self.__stages.get(stage)
+            if previous is not None and (previous['traced_peak_bytes'] or 0) > measurement['traced_peak_bytes']:
+                previous['count'] += 1
+                return
+            measurement['count'] = 1 if previous is None else previous['count'] + 1
+            self.__stages[stage] = measurement
+
+    def track(self, name: str, obj) -> None:
+        """
+        Record the size of a data structure, repeated records keep the largest size.
+
+        Args:
+            name (str): The structure name, e.g. 'processed_data'.
+            obj (object): The structure.
+        """
+        if obj is None:
+            return
+        size = deep_sizeof(obj)
+        items = len(obj) if hasattr(obj, '__len__') else None
+        with self.__lock:
+            if size >= self.__structures.get(name, {}).get('bytes', 0):
+                self.__structures[name] = {'bytes': size, 'items': items}
+
+    def summary(self) -> dict:
+        """
+        Summarize the measurements.
+
+        Returns:
+            dict: The overall peak traced and resident memory, and the measurements of every stage and structure [bytes].
+        """
+        traced_peak = self.__traced_peak
+        if tracemalloc.is_tracing():
+            traced_peak = max(traced_peak, tracemalloc.get_traced_memory()[1])
+        with self.__lock:
+            return {
+                'traced_peak_bytes': traced_peak,
+                'rss_peak_bytes': self.__rss_peak or None,
+                'stages': {stage: dict(measurement) for stage, measurement in self.__stages.items()},
+                'structures': {name: dict(structure) for name, structure in self.__structures.items()},
+            }
+
+    def format_summary(self) -> str:
+        """
+        Format the summary as tables of the stages and structures.
+
+        Returns:
+            str: The summary tables.
+        """
+        summary = self.summary()
+        mb = lambda value: f'{value / 2**20:.1f}' if value is not None else '-'
+        lines = [f'{"stage":<12}{"count":>7}{"traced peak [MB]":>18}{"traced after":>14}{"rss peak [MB]":>15}{"rss after":>11}']
+        for stage, stats in summary['stages'].items():
+            lines.append(
+                f'{stage:<12}{stats["count"]:>7}{mb(stats["traced_peak_bytes"]):>18}{mb(stats["traced_after_bytes"]):>14}'
+                f'{mb(stats["rss_peak_bytes"]):>15}{mb(stats["rss_after_bytes"]):>11}'
+            )
+        lines.append(f'{"structure":<24}{"items":>12}{"size [MB]":>12}')
+        for name, structure in summary['structures'].items():
+            items = structure['items'] if structure['items'] is not None else '-'
+            lines.append(f'{name:<24}{items:>12}{mb(structure["bytes"]):>12}')
+        lines.append(f'peak traced: {mb(summary["traced_peak_bytes"])} MB, peak resident: {mb(summary["rss_peak_bytes"])} MB')
+        return '\n'.join(lines)
+
+    def save(self, output_path: str, **info) -> None:
+        """
+        Save a JSON memory report.
+
+        Args:
+            output_path (str): The path to the report file.
+            **info: Additional JSON serializable information about the run, e.g. the video and frames count.
+        """
+        report = {**info, **self.summary()}
+        with open(output_path, 'w') as file:
+            json.dump(report, file, indent=4)
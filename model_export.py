@@ -0,0 +1,447 @@
+from ultralytics import YOLO
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+import file_helper
+from args_helper import split_options, parse_bool, parse_roi
+import sys, os, time
+
+
+ENGINES = ('torch', 'onnx', 'openvino', 'onnx-int8')
+
+
+def get_exported_path(model_path: str, engine: str) -> str:
+    """
+    Get the path where the exported model of a given engine is cached.
+
+    The exported models are stored next to the weights, using the naming ultralytics uses for its exports.
+
+    Args:
+        model_path (str): The path to the YOLO `.pt` weights.
+        engine (str): The inference engine, one of `ENGINES`.
+
+    Returns:
+        str: The path of the exported model.
+    """
+    directory, filename, extension = file_helper.split_path(model_path)
+    if engine == 'torch':
+        return model_path
+    if engine == 'onnx':
+        return file_helper.join_paths(directory, f'{filename}.onnx')
+    if engine == 'openvino':
+        return file_helper.join_paths(directory, f'{filename}_openvino_model')
+    if engine == 'onnx-int8':
+        return file_helper.join_paths(directory, f'{filename}_int8.onnx')
+    raise ValueError(f'Unknown inference engine "{engine}", expected one of {ENGINES}.')
+
+
+def find_exported_model(model_path: str, engine: str) -> str:
+    """
+    Find an up to date exported model of the given weights.
+
+    Args:
+        model_path (str): The path to the YOLO `.pt` weights.
+        engine (str): The inference engine, one of `ENGINES`.
+
+    Returns:
+        str: The path to the exported model if it exists and is newer than the weights, otherwise None.
+    """
+    exported_path = get_exported_path(model_path, engine)
+    if not file_helper.check_existance(exported_path):
+        return None
+    if engine != 'torch' and os.path.getmtime(exported_path) < os.path.getmtime(model_path):
+        return None
+    return exported_path
+
+
+def export_model(model_path: str, engine: str = 'onnx', force: bool = False, **export_args) -> str:
+    """
+    Export the YOLO weights for a CPU inference engine, caching the result next to the weights.
+
+    The export uses dynamic input shapes, so the exported model accepts batches and non square input sizes.
+
+    Args:
+        model_path (str): The path to the YOLO `.pt` weights.
+        engine (str, optional): The inference engine, either 'onnx' or 'openvino'. Defaults to 'onnx'.
+        force (bool, optional): Export even if an up to date export exists. Defaults to False.
+        **export_args: Additional arguments passed to the ultralytics exporter.
+
+    Returns:
+        str: The path to the exported model.
+    """
+    if engine == 'torch':
+        return model_path
+
+    exported_path = find_exported_model(model_path, engine)
+    if exported_path is not None and not force:
+        return exported_path
+
+    if engine == 'onnx-int8':
+        raise Exception('The INT8 model needs calibration frames, create it with `quantize_model`.')
+
+    export_args.setdefault('dynamic', True)
+    exported_path = YOLO(model_path).export(format=engine, **export_args)
+    return file_helper.normalize_path(exported_path)
+
+
+def read_clip(video_path: str, frames_count: int) -> list:
+    """
+    Read the first frames of a video.
+
+    Args:
+        video_path (str): The path to the video file.
+        frames_count (int): The maximum number of frames to read.
+
+    Returns:
+        list: The frames read from the video.
+    """
+    stream = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < frames_count:
+        success, frame = stream.read()
+        if not success:
+            break
+        frames.append(frame)
+    stream.release()
+    return frames
+
+
+def tracker_input(frame: np.ndarray, preprocess=None, roi: dict = None) -> np.ndarray:
+    """
+    Prepare a frame the way `FlyTracker` passes it to the detector, preprocessed and cropped to the region of interest.
+
+    Args:
+        frame (np.ndarray): The BGR frame.
+        preprocess (callable, optional): The method applied to every frame before detection. Defaults to None.
+        roi (dict, optional): Region of interest, see `FlyTracker.detect`. Defaults to None.
+
+    Returns:
+        np.ndarray: The detector input frame.
+    """
+    from FlyTracker import FlyTracker
+
+    if preprocess is not None:
+        frame = preprocess(frame)
+    return FlyTracker.crop_to_roi(frame, roi)[0]
+
+
+def inference_size(frame: np.ndarray, imgsz: int = 640, rect_inference: bool = False):
+    """
+    Get the inference size `FlyTracker` picks for the geometry of a frame.
+
+    Args:
+        frame (np.ndarray): The detector input frame.
+        imgsz (int, optional): The YOLO inference size (longest side). Defaults to 640.
+        rect_inference (bool, optional): Use a rectangular inference size matching the frame aspect ratio. Defaults to False.
+
+    Returns:
+        int | tuple: The square inference size, or the rectangular one as (height, width).
+    """
+    if not rect_inference:
+        return imgsz
+    from FlyTracker import FlyTracker
+
+    height, width = frame.shape[:2]
+    return FlyTracker.rect_inference_size(int(width), int(height), imgsz)
+
+
+def time_inference(model_path: str, frames: list, warmup: int = 5, imgsz=640) -> float:
+    """
+    Measure the average YOLO inference time per frame.
+
+    Args:
+        model_path (str): The path to the model, either `.pt` weights or an exported model.
+        frames (list): The frames to pass through the model.
+        warmup (int, optional): Number of frames passed before timing starts. Defaults to 5.
+        imgsz (int | tuple, optional): The inference size. Defaults to 640.
+
+    Returns:
+        float: The average inference time per frame, in seconds.
+    """
+    model = YOLO(model_path, task='detect')
+    for frame in frames[:warmup]:
+        model(frame, verbose=False, imgsz=imgsz)
+
+    start_time = time.perf_counter()
+    for frame in frames:
+        model(frame, verbose=False, imgsz=imgsz)
+    return (time.perf_counter() - start_time) / max(len(frames), 1)
+
+
+def compare_engines(model_path: str, video_path: str, engine: str = 'onnx', frames_count: int = 300, imgsz: int = 640,
+                    rect_inference: bool = False, preprocess=None, roi: dict = None) -> dict:
+    """
+    Compare the inference speed of an exported model against the torch model on the same clip.
+
+    The frames are preprocessed, cropped and sized like the tracker does with the same settings.
+
+    Args:
+        model_path (str): The path to the YOLO `.pt` weights.
+        video_path (str): The path to the video clip.
+        engine (str, optional): The exported inference engine to compare. Defaults to 'onnx'.
+        frames_count (int, optional): Number of frames to time. Defaults to 300.
+        imgsz (int, optional): The YOLO inference size (longest side). Defaults to 640.
+        rect_inference (bool, optional): Use a rectangular inference size matching the frames aspect ratio. Defaults to False.
+        preprocess (callable, optional): The method applied to every frame before detection. Defaults to None.
+        roi (dict, optional): Region of interest, see `FlyTracker.detect`. Defaults to None.
+
+    Returns:
+        dict: The average seconds per frame of each engine, and the speedup of the exported engine.
+    """
+    frames = [tracker_input(frame, preprocess, roi) for frame in read_clip(video_path, frames_count)]
+    if len(frames) == 0:
+        raise Exception(f'Could not read frames from "{video_path}".')
+    size = inference_size(frames[0], imgsz, rect_inference)
+
+    exported_path = find_exported_model(model_path, engine) or export_model(model_path, engine)
+    torch_time = time_inference(model_path, frames, imgsz=size)
+    engine_time = time_inference(exported_path, frames, imgsz=size)
+
+    return {
+        'frames': len(frames),
+        'torch': torch_time,
+        engine: engine_time,
+        'speedup': torch_time / engine_time if engine_time > 0 else None,
+    }
+
+
+def sample_frames(video_paths: list, samples: int, seed: int = 0) -> list:
+    """
+    Sample frames uniformly at random from a set of videos.
+
+    Args:
+        video_paths (list): The paths to the video files.
+        samples (int): The total number of frames to sample.
+        seed (int, optional): The random seed, so calibrations are reproducible. Defaults to 0.
+
+    Returns:
+        list: The sampled frames.
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    per_video = int(np.ceil(samples / max(len(video_paths), 1)))
+    for video_path in video_paths:
+        stream = cv2.VideoCapture(video_path)
+        frames_count = int(stream.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frames_count > 0:
+            positions = np.sort(rng.choice(frames_count, size=min(per_video, frames_count), replace=False))
+            for position in positions:
+                stream.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+                success, frame = stream.read()
+                if success:
+                    frames.append(frame)
+        stream.release()
+    return frames[:samples]
+
+
+def prepare_model_input(frame: np.ndarray, imgsz=640) -> np.ndarray:
+    """
+    Letterbox and normalize a BGR frame into the YOLO network input layout.
+
+    Args:
+        frame (np.ndarray): The BGR frame.
+        imgsz (int | tuple, optional): The square network input size, or the rectangular one as (height, width). Defaults to 640.
+
+    Returns:
+        np.ndarray: A (1, 3, height, width) float32 array.
+    """
+    input_height, input_width = (imgsz, imgsz) if np.isscalar(imgsz) else imgsz
+    height, width = frame.shape[:2]
+    ratio = min(input_height / height, input_width / width)
+    resized_height, resized_width = int(round(height * ratio)), int(round(width * ratio))
+    resized = cv2.resize(frame, (resized_width, resized_height), interpolation=cv2.INTER_LINEAR)
+
+    top = (input_height - resized_height) // 2
+    left = (input_width - resized_width) // 2
+    padded = np.full((input_height, input_width, 3), 114, dtype=np.uint8)
+    padded[top:top + resized_height, left:left + resized_width] = resized
+
+    return np.ascontiguousarray(padded[..., ::-1].transpose(2, 0, 1))[None].astype(np.float32) / 255
+
+
+class FrameCalibrationReader:
+    """
+    An ONNX Runtime calibration data reader, feeding sampled video frames to the quantizer.
+
+    Args:
+        frames (list): The calibration frames, as passed to the detector.
+        input_name (str): The name of the model input.
+        imgsz (int, optional): The YOLO inference size (longest side). Defaults to 640.
+        rect_inference (bool, optional): Use a rectangular inference size matching the frames aspect ratio. Defaults to False.
+    """
+
+    def __init__(self, frames: list, input_name: str, imgsz: int = 640, rect_inference: bool = False) -> None:
+        self.frames = frames
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self.rect_inference = rect_inference
+        self.rewind()
+
+    def get_next(self):
+        frame = next(self.__iterator, None)
+        if frame is None:
+            return None
+        return {self.input_name: prepare_model_input(frame, inference_size(frame, self.imgsz, self.rect_inference))}
+
+    def rewind(self) -> None:
+        self.__iterator = iter(self.frames)
+
+
+def detection_recall(reference: list, candidate: list, iou_threshold: float = 0.5) -> float:
+    """
+    Calculate the recall of candidate detections against reference detections.
+
+    Args:
+        reference (list): Per frame (N, 4) arrays of reference xyxy boxes.
+        candidate (list): Per frame (M, 4) arrays of candidate xyxy boxes.
+        iou_threshold (float, optional): Minimum IoU for a candidate to recall a reference box. Defaults to 0.5.
+
+    Returns:
+        float: The fraction of reference boxes recalled, 1 if there are no reference boxes.
+    """
+    total = 0
+    recalled = 0
+    for ref_boxes, cand_boxes in zip(reference, candidate):
+        total += len(ref_boxes)
+        if len(ref_boxes) == 0 or len(cand_boxes) == 0:
+            continue
+        top_left = np.maximum(ref_boxes[:, None, :2], cand_boxes[None, :, :2])
+        bottom_right = np.minimum(ref_boxes[:, None, 2:], cand_boxes[None, :, 2:])
+        intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+        ref_area = np.prod(ref_boxes[:, 2:] - ref_boxes[:, :2], axis=1)
+        cand_area = np.prod(cand_boxes[:, 2:] - cand_boxes[:, :2], axis=1)
+        iou = intersection / np.maximum(ref_area[:, None] + cand_area[None, :] - intersection, 1e-9)
+
+        # optimal one to one matching, pairs below the threshold are never matched
+        gated = iou < iou_threshold
+        rows, cols = linear_sum_assignment(np.where(gated, 1e5, 1 - iou))
+        recalled += int(np.count_nonzero(~gated[rows, cols]))
+    return recalled / total if total > 0 else 1.0
+
+
+def predict_boxes(model_path: str, frames: list, imgsz=640) -> list:
+    """
+    Run a model over frames and collect the detected boxes.
+
+    Args:
+        model_path (str): The path to the model.
+        frames (list): The frames to pass through the model.
+        imgsz (int | tuple, optional): The inference size. Defaults to 640.
+
+    Returns:
+        list: Per frame (N, 4) arrays of xyxy boxes.
+    """
+    model = YOLO(model_path, task='detect')
+    return [model(frame, verbose=False, imgsz=imgsz)[0].boxes.xyxy.cpu().numpy() for frame in frames]
+
+
+def quantize_model(model_path: str, calibration_videos: list, validation_video: str, samples: int = 200,
+                   validation_frames: int = 300, max_recall_drop: float = 0.02, imgsz: int = 640,
+                   rect_inference: bool = False, preprocess=None, roi: dict = None) -> dict:
+    """
+    Create an INT8 quantized ONNX model, calibrated on our own videos and validated against the FP32 model.
+
+    The quantized model is only cached next to the weights if its recall of the FP32 detections on the
+    held out clip does not drop by more than `max_recall_drop`, otherwise it is discarded and an exception raised.
+    Both calibration and validation frames are preprocessed, cropped and sized like the tracker does with the same
+    settings, so the guardrail checks the input the model sees during the analysis.
+
+    Args:
+        model_path (str): The path to the YOLO `.pt` weights.
+        calibration_videos (list): The videos to sample calibration frames from.
+        validation_video (str): The held out clip used for the accuracy check.
+        samples (int, optional): Number of calibration frames. Defaults to 200.
+        validation_frames (int, optional): Number of validation frames. Defaults to 300.
+        max_recall_drop (float, optional): Maximum allowed drop in recall. Defaults to 0.02.
+        imgsz (int, optional): The YOLO inference size (longest side). Defaults to 640.
+        rect_inference (bool, optional): Use a rectangular inference size matching the frames aspect ratio. Defaults to False.
+        preprocess (callable, optional): The method applied to every frame before detection. Defaults to None.
+        roi (dict, optional): Region of interest, see `FlyTracker.detect`. Defaults to None.
+
+    Returns:
+        dict: The quantized model path and the measured recall.
+    """
+    # optional dependencies, only needed when quantizing
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    fp32_path = export_model(model_path, 'onnx')
+    int8_path = get_exported_path(model_path, 'onnx-int8')
+    directory, filename, extension = file_helper.split_path(int8_path)
+    candidate_path = file_helper.join_paths(directory, f'{filename}_candidate.onnx')
+
+    calibration_frames = [tracker_input(frame, preprocess, roi) for frame in sample_frames(calibration_videos, samples)]
+    if len(calibration_frames) == 0:
+        raise Exception('Could not read any calibration frames.')
+
+    fp32_model = onnx.load(fp32_path)
+    reader = FrameCalibrationReader(calibration_frames, fp32_model.graph.input[0].name, imgsz, rect_inference)
+    quantize_static(fp32_path, candidate_path, reader, quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+    # carry over the ultralytics metadata (names, stride, imgsz) so the quantized model loads like the export
+    int8_model = onnx.load(candidate_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, candidate_path)
+
+    # accuracy guardrail, compare against the fp32 detections on the held out clip
+    validation = [tracker_input(frame, preprocess, roi) for frame in read_clip(validation_video, validation_frames)]
+    if len(validation) == 0:
+        os.remove(candidate_path)
+        raise Exception(f'Could not read frames from "{validation_video}".')
+    size = inference_size(validation[0], imgsz, rect_inference)
+    recall = detection_recall(predict_boxes(fp32_path, validation, size), predict_boxes(candidate_path, validation, size))
+
+    if recall < 1 - max_recall_drop:
+        os.remove(candidate_path)
+        raise Exception(f'The quantized model was refused, recall against FP32 dropped to {recall:.4f} '
+                        f'(allowed drop {max_recall_drop}).')
+
+    os.replace(candidate_path, int8_path)
+    return {'path': int8_path, 'recall': recall, 'calibration_frames': len(calibration_frames), 'validation_frames': len(validation)}
+
+
+def main():
+    # usage: model_export.py <weights.pt> [--engine=onnx|openvino] [--force] [--video=<clip> [--frames=N]]
+    #        model_export.py <weights.pt> --engine=onnx-int8 --calibrate=<a.avi,b.avi> --validate=<clip> [--max-recall-drop=0.02]
+    # the tracker input options (--preprocess, --roi, --imgsz, --rect) apply to the calibration, validation and timing frames
+    from flytracker_app import get_preprocess_pipeline
+
+    positional, options = split_options(sys.argv[1:])
+    if len(positional) != 1:
+        raise Exception('Expected the path to the weights file!')
+
+    model_path = file_helper.normalize_path(positional[0])
+    engine = options.get('engine', 'onnx')
+    input_args = {
+        'imgsz': int(options.get('imgsz', 640)),
+        'rect_inference': parse_bool(options.get('rect', False)),
+        'preprocess': get_preprocess_pipeline(options.get('preprocess')),
+        'roi': parse_roi(options['roi']) if 'roi' in options else None,
+    }
+
+    if engine == 'onnx-int8':
+        calibration_videos = [file_helper.normalize_path(p) for p in str(options.get('calibrate', '')).split(',') if p]
+        if len(calibration_videos) == 0 or 'validate' not in options:
+            raise Exception('Quantization requires --calibrate=<videos> and --validate=<clip>!')
+        result = quantize_model(model_path, calibration_videos, file_helper.normalize_path(options['validate']),
+                                samples=int(options.get('samples', 200)),
+                                max_recall_drop=float(options.get('max-recall-drop', 0.02)), **input_args)
+        print(f'quantized model accepted with recall {result["recall"]:.4f} against FP32')
+        exported_path = result['path']
+    else:
+        exported_path = export_model(model_path, engine, force=parse_bool(options.get('force', False)))
+    print(f'exported model available at:\n\t{exported_path}\n')
+
+    if 'video' in options:
+        report = compare_engines(model_path, file_helper.normalize_path(options['video']), engine, int(options.get('frames', 300)),
+                                 **input_args)
+        print(f'average inference time over {report["frames"]} frames:')
+        print(f'\ttorch:\t{report["torch"] * 1000:.2f} ms/frame')
+        print(f'\t{engine}:\t{report[engine] * 1000:.2f} ms/frame')
+        print(f'\tspeedup: x{report["speedup"]:.2f}')
+
+
+if __name__ == '__main__':
+    main()
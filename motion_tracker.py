@@ -0,0 +1,307 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+def ltwh_to_xyah(ltwh: np.ndarray) -> np.ndarray:
+    """
+    Convert boxes from (left, top, width, height) to (center x, center y, width, height).
+
+    Args:
+        ltwh (np.ndarray): Boxes as an (N, 4) or (4,) array.
+
+    Returns:
+        np.ndarray: Boxes in center format.
+    """
+    boxes = np.array(ltwh, dtype=float)
+    boxes[..., :2] += boxes[..., 2:] / 2
+    return boxes
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Calculate the intersection over union between every pair of boxes.
+
+    Args:
+        boxes_a (np.ndarray): An (N, 4) array of ltwh boxes.
+        boxes_b (np.ndarray): An (M, 4) array of ltwh boxes.
+
+    Returns:
+        np.ndarray: An (N, M) array of IoU values.
+    """
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = inter_w * inter_h
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def centroid_distance_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Calculate the Euclidean distance between the centers of every pair of boxes.
+
+    Args:
+        boxes_a (np.ndarray): An (N, 4) array of ltwh boxes.
+        boxes_b (np.ndarray): An (M, 4) array of ltwh boxes.
+
+    Returns:
+        np.ndarray: An (N, M) array of distances.
+    """
+    centers_a = boxes_a[:, :2] + boxes_a[:, 2:] / 2
+    centers_b = boxes_b[:, :2] + boxes_b[:, 2:] / 2
+    return np.linalg.norm(centers_a[:, None, :] - centers_b[None, :, :], axis=2)
+
+
+class KalmanBoxFilter:
+    """
+    A constant velocity Kalman filter over a box state (cx, cy, w, h, vx, vy, vw, vh).
+
+    Args:
+        ltwh (array-like): The initial box measurement.
+    """
+
+    __STD_POSITION = 1 / 20
+    __STD_VELOCITY = 1 / 160
+
+    def __init__(self, ltwh) -> None:
+        measurement = ltwh_to_xyah(ltwh)
+        self.mean = np.concatenate([measurement, np.zeros(4)])
+
+        std = self.__std(measurement[3])
+        self.covariance = np.diag(np.concatenate([2 * std[:4], 10 * std[4:]]) ** 2)
+
+        self.__transition = np.eye(8)
+        self.__transition[:4, 4:] = np.eye(4)
+        self.__projection = np.eye(4, 8)
+
+    def __std(self, height: float) -> np.ndarray:
+        # scale the noise with the box size, with a floor for the tiny fly boxes
+        scale = max(height, 1.0)
+        return np.array([self.__STD_POSITION] * 4 + [self.__STD_VELOCITY] * 4) * scale
+
+    def predict(self) -> None:
+        """
+        Advance the state by a single frame.
+        """
+        motion_cov = np.diag(self.__std(self.mean[3]) ** 2)
+        self.mean = self.__transition @ self.mean
+        self.covariance = self.__transition @ self.covariance @ self.__transition.T + motion_cov
+
+    def update(self, ltwh) -> None:
+        """
+        Correct the state with a box measurement.
+
+        Args:
+            ltwh (array-like): The measured box.
+        """
+        measurement = ltwh_to_xyah(ltwh)
+        innovation_cov = self.__projection @ self.covariance @ self.__projection.T
+        innovation_cov += np.diag(self.__std(self.mean[3])[:4] ** 2)
+        gain = np.linalg.solve(innovation_cov, self.__projection @ self.covariance).T
+        self.mean = self.mean + gain @ (measurement - self.__projection @ self.mean)
+        self.covariance = self.covariance - gain @ innovation_cov @ gain.T
+
+    def to_ltwh(self) -> np.ndarray:
+        """
+        Get the current box estimate.
+
+        Returns:
+            np.ndarray: The box as (left, top, width, height).
+        """
+        cx, cy, w, h = self.mean[:4]
+        return np.array([cx - w / 2, cy - h / 2, w, h])
+
+
+class MotionTrack:
+    """
+    A single track of the motion tracker, mirroring the parts of the DeepSort track interface used by FlyTracker.
+
+    Args:
+        track_id (int): The track identifier.
+        ltwh (array-like): The box of the detection that started the track.
+        det_conf (float): The confidence of the detection that started the track.
+        det_class: The class of the detection that started the track.
+        n_init (int): Number of consecutive hits required to confirm the track.
+        max_age (int): Maximum number of consecutive misses before a confirmed track is deleted.
+    """
+
+    TENTATIVE = 1
+    CONFIRMED = 2
+    DELETED = 3
+
+    def __init__(self, track_id: int, ltwh, det_conf: float, det_class, n_init: int, max_age: int) -> None:
+        self.track_id = track_id
+        self.kf = KalmanBoxFilter(ltwh)
+        self.det_conf = det_conf
+        self.det_class = det_class
+        self.hits = 1
+        self.age = 1
+        self.time_since_update = 0
+        self.state = MotionTrack.TENTATIVE if n_init > 1 else MotionTrack.CONFIRMED
+        self.__n_init = n_init
+        self.__max_age = max_age
+
+    def predict(self) -> None:
+        """
+        Propagate the track state to the next frame, clearing the detection confidence.
+        """
+        self.kf.predict()
+        self.age += 1
+        self.time_since_update += 1
+        self.det_conf = None
+
+    def update(self, ltwh, det_conf: float, det_class) -> None:
+        """
+        Update the track with an associated detection.
+        """
+        self.kf.update(ltwh)
+        self.det_conf = det_conf
+        self.det_class = det_class
+        self.hits += 1
+        self.time_since_update = 0
+        if self.state == MotionTrack.TENTATIVE and self.hits >= self.__n_init:
+            self.state = MotionTrack.CONFIRMED
+
+    def mark_missed(self) -> None:
+        """
+        Mark the track as missed in the current frame, deleting it when it is no longer valid.
+        """
+        if self.state == MotionTrack.TENTATIVE or self.time_since_update > self.__max_age:
+            self.state = MotionTrack.DELETED
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self.kf.mean
+
+    @property
+    def covariance(self) -> np.ndarray:
+        return self.kf.covariance
+
+    def is_tentative(self) -> bool:
+        return self.state == MotionTrack.TENTATIVE
+
+    def is_confirmed(self) -> bool:
+        return self.state == MotionTrack.CONFIRMED
+
+    def is_deleted(self) -> bool:
+        return self.state == MotionTrack.DELETED
+
+    def to_ltwh(self) -> np.ndarray:
+        return self.kf.to_ltwh()
+
+    def get_det_conf(self):
+        return self.det_conf
+
+    def get_det_class(self):
+        return self.det_class
+
+
+class MotionTracker:
+    """
+    A motion-only multi object tracker, using a Kalman filter and ByteTrack-style two-stage association.
+
+    Detections are split by confidence, the high confidence detections are matched to all tracks first,
+    and the tracks left unmatched get a second chance against the low confidence detections. The matching
+    cost combines the IoU with the centroid distance, so small fast flies whose boxes no longer overlap the
+    prediction can still be associated. Only unmatched high confidence detections start new tracks.
+
+    Args:
+        max_age (int, optional): Maximum number of consecutive misses before a track is deleted. Defaults to 10.
+        n_init (int, optional): Number of consecutive hits required to confirm a track. Defaults to 3.
+        high_threshold (float, optional): Confidence separating high and low detections. Defaults to 0.5.
+        min_iou (float, optional): Minimum IoU for a match, unless the centroids are close enough. Defaults to 0.1.
+        max_centroid_distance (float, optional): Maximum centroid distance [px] for a match without overlap. Defaults to 20.
+    """
+
+    def __init__(self, max_age=10, n_init=3, high_threshold=0.5, min_iou=0.1, max_centroid_distance=20.0) -> None:
+        self.max_age = max_age
+        self.n_init = n_init
+        self.high_threshold = high_threshold
+        self.min_iou = min_iou
+        self.max_centroid_distance = max_centroid_distance
+        self.tracks = []
+        self._next_id = 1
+
+    def __match(self, track_indices: list, detections: list, detection_indices: list) -> tuple:
+        """
+        Associate tracks and detections by solving the assignment problem over the combined cost.
+
+        Returns:
+            tuple: The list of matched (track index, detection index) pairs, and the unmatched track and detection indices.
+        """
+        if len(track_indices) == 0 or len(detection_indices) == 0:
+            return [], list(track_indices), list(detection_indices)
+
+        track_boxes = np.array([self.tracks[i].to_ltwh() for i in track_indices])
+        detection_boxes = np.array([detections[i][0] for i in detection_indices], dtype=float)
+
+        iou = iou_matrix(track_boxes, detection_boxes)
+        distance = centroid_distance_matrix(track_boxes, detection_boxes)
+        cost = (1 - iou) + np.minimum(distance / self.max_centroid_distance, 1)
+        gated = (iou < self.min_iou) & (distance > self.max_centroid_distance)
+
+        rows, cols = linear_sum_assignment(np.where(gated, 1e5, cost))
+
+        matches = []
+        for row, col in zip(rows, cols):
+            if not gated[row, col]:
+                matches.append((track_indices[row], detection_indices[col]))
+        matched_tracks = {m[0] for m in matches}
+        matched_detections = {m[1] for m in matches}
+        unmatched_tracks = [i for i in track_indices if i not in matched_tracks]
+        unmatched_detections = [i for i in detection_indices if i not in matched_detections]
+        return matches, unmatched_tracks, unmatched_detections
+
+    def predict(self) -> None:
+        """
+        Propagate all tracks a single frame ahead, without associating detections.
+
+        Used for frames that are not passed through the detector, the next `update_tracks` call
+        predicts its own frame as usual.
+        """
+        for track in self.tracks:
+            track.predict()
+
+    def update_tracks(self, raw_detections: list, frame=None) -> list:
+        """
+        Advance the tracker by a single frame.
+
+        Args:
+            raw_detections (list): Detections as a list of ([left, top, width, height], confidence, class) tuples.
+            frame (optional): Unused, kept for compatibility with the DeepSort interface.
+
+        Returns:
+            list: The active tracks.
+        """
+        self.predict()
+
+        high = [i for i, d in enumerate(raw_detections) if d[1] is None or d[1] >= self.high_threshold]
+        low = [i for i, d in enumerate(raw_detections) if d[1] is not None and d[1] < self.high_threshold]
+
+        # first stage, high confidence detections against all tracks
+        matches, unmatched_tracks, unmatched_high = self.__match(list(range(len(self.tracks))), raw_detections, high)
+
+        # second stage, low confidence detections against the remaining tracks
+        low_matches, unmatched_tracks, _ = self.__match(unmatched_tracks, raw_detections, low)
+        matches.extend(low_matches)
+
+        for track_index, detection_index in matches:
+            ltwh, conf, class_id = raw_detections[detection_index]
+            self.tracks[track_index].update(ltwh, conf, class_id)
+        for track_index in unmatched_tracks:
+            self.tracks[track_index].mark_missed()
+        for detection_index in unmatched_high:
+            ltwh, conf, class_id = raw_detections[detection_index]
+            self.tracks.append(MotionTrack(self._next_id, ltwh, conf, class_id, self.n_init, self.max_age))
+            self._next_id += 1
+
+        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+        return self.tracks
+
+    def delete_all_tracks(self) -> None:
+        """
+        Delete all tracks and restart the track identifiers.
+        """
+        self.tracks = []
+        self._next_id = 1
@@ -0,0 +1,127 @@
+import os
+
+
+# environment variables read by the BLAS / OpenMP runtimes when they are first loaded
+THREAD_ENV_VARS = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+
+
+def get_available_cores() -> list:
+    """
+    Get the CPU cores the current process is allowed to run on.
+
+    Returns:
+        list: The core indices.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def default_thread_count(workers: int = 1) -> int:
+    """
+    Get the default number of threads of a single worker, splitting the available cores evenly between the workers.
+
+    Args:
+        workers (int, optional): The number of workers running side by side. Defaults to 1.
+
+    Returns:
+        int: The number of threads.
+    """
+    return max(1, len(get_available_cores()) // max(1, workers))
+
+
+def worker_cores(worker_index: int, threads: int) -> list:
+    """
+    Get the block of cores assigned to a worker when pinning, wrapping around if the workers outnumber the cores.
+
+    Args:
+        worker_index (int): The index of the worker.
+        threads (int): The number of threads of each worker.
+
+    Returns:
+        list: The core indices.
+    """
+    cores = get_available_cores()
+    begin = (worker_index * threads) % len(cores)
+    return [cores[(begin + i) % len(cores)] for i in range(min(threads, len(cores)))]
+
+
+def set_affinity(cores: list) -> bool:
+    """
+    Pin the current process to the given cores.
+
+    Args:
+        cores (list): The core indices.
+
+    Returns:
+        bool: True if the affinity was set, False if it is not supported on this platform.
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+        return True
+    try:
+        import psutil
+    except ImportError:
+        return False
+    psutil.Process().cpu_affinity(cores)
+    return True
+
+
+def configure_threads(threads: int = None, interop_threads: int = None, workers: int = 1,
+                      worker_index: int = None, pin_cores: bool = False, verbose: bool = True) -> dict:
+    """
+    Limit the threads used by torch, OpenCV and the BLAS libraries in the current process, and optionally pin it to cores.
+
+    Running several trackers side by side with the libraries' defaults makes each of them use every core,
+    oversubscribing the CPU. Call this once per worker process, before running inference.
+
+    Args:
+        threads (int, optional): The number of compute threads. Defaults to None (available cores / workers).
+        interop_threads (int, optional): The number of torch inter-op threads. Defaults to None (1 when running several workers).
+        workers (int, optional): The number of workers running side by side. Defaults to 1.
+        worker_index (int, optional): The index of this worker, used to pick its cores when pinning. Defaults to None (0).
+        pin_cores (bool, optional): Pin the process to a block of `threads` cores. Defaults to False.
+        verbose (bool, optional): Print the chosen settings. Defaults to True.
+
+    Returns:
+        dict: The applied settings.
+    """
+    import cv2
+    import torch
+
+    threads = default_thread_count(workers) if threads is None else max(1, threads)
+    if interop_threads is None:
+        interop_threads = 1 if workers > 1 else max(1, min(threads, 4))
+    settings = {'threads': threads, 'interop_threads': interop_threads, 'workers': workers, 'worker_index': worker_index}
+
+    # blas runtimes that are not loaded yet (and child processes) pick up the environment
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    # already loaded ones are limited through threadpoolctl, if installed
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+        settings['blas'] = 'threadpoolctl'
+    except ImportError:
+        settings['blas'] = 'environment'
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_interop_threads(interop_threads)
+    except RuntimeError:
+        # can only be set once, before any inter-op parallel work started
+        settings['interop_threads'] = torch.get_num_interop_threads()
+    cv2.setNumThreads(threads)
+
+    settings['cores'] = None
+    if pin_cores:
+        cores = worker_cores(worker_index or 0, threads)
+        if set_affinity(cores):
+            settings['cores'] = cores
+
+    if verbose:
+        print(f'runtime: {settings["threads"]} threads, {settings["interop_threads"]} inter-op threads, '
+              f'blas limited via {settings["blas"]}, '
+              + (f'pinned to cores {settings["cores"]}' if settings['cores'] is not None else 'not pinned')
+              + ('' if worker_index is None else f' (worker {worker_index + 1}/{workers})'))
+    return settings
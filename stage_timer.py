@@ -0,0 +1,119 @@
+from contextlib import contextmanager
+from array import array
+import numpy as np
+import threading
+import json
+import time
+
+
+class StageTimer:
+    """
+    Collect the durations of the pipeline stages of a run, e.g. decode, preprocess, detect, track, write.
+
+    Every measured call is kept as a sample, so the summary can report percentiles and not just totals.
+    Samples can be recorded from several threads.
+    """
+
+    def __init__(self) -> None:
+        self.__samples = {}
+        self.__lock = threading.Lock()
+        self.__started = time.perf_counter()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """
+        Record a single duration of a stage.
+
+        Args:
+            stage (str): The stage name.
+            seconds (float): The duration [sec].
+        """
+        with self.__lock:
+            if stage not in self.__samples:
+                self.__samples[stage] = array('d')
+            self.__samples[stage].append(seconds)
+
+    @contextmanager
+    def measure(self, stage: str):
+        """
+        Measure the duration of the enclosed block as a sample of a stage.
+
+        Args:
+            stage (str): The stage name.
+        """
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - begin)
+
+    def wrap(self, stage: str, method):
+        """
+        Wrap a method so every call is measured as a sample of a stage.
+
+        Args:
+            stage (str): The stage name.
+            method (callable): The method to measure.
+
+        Returns:
+            callable: The measured method.
+        """
+        def measured(*args, **kwargs):
+            with self.measure(stage):
+                return method(*args, **kwargs)
+        return measured
+
+    def summary(self) -> dict:
+        """
+        Summarize the samples of every stage.
+
+        Returns:
+            dict: Per stage, the number of samples, the total, mean, p50, p90, p99 and max durations [ms].
+        """
+        with self.__lock:
+            samples = {stage: np.frombuffer(values, dtype=np.float64).copy() for stage, values in self.__samples.items()}
+
+        summary = {}
+        for stage, values in samples.items():
+            p50, p90, p99 = np.percentile(values, [50, 90, 99]) * 1000
+            summary[stage] = {
+                'count': int(len(values)),
+                'total_ms': float(values.sum() * 1000),
+                'mean_ms': float(values.mean() * 1000),
+                'p50_ms': float(p50),
+                'p90_ms': float(p90),
+                'p99_ms': float(p99),
+                'max_ms': float(values.max() * 1000),
+            }
+        return summary
+
+    def format_summary(self) -> str:
+        """
+        Format the summary as a table, with each stage's share of the total measured time.
+
+        Returns:
+            str: The summary table.
+        """
+        summary = self.summary()
+        measured = sum(stats['total_ms'] for stats in summary.values()) or 1
+        lines = [f'{"stage":<12}{"count":>9}{"total [s]":>11}{"share":>8}{"mean [ms]":>11}{"p50":>9}{"p90":>9}{"p99":>9}']
+        for stage, stats in summary.items():
+            lines.append(
+                f'{stage:<12}{stats["count"]:>9}{stats["total_ms"] / 1000:>11.2f}{stats["total_ms"] / measured:>8.1%}'
+                f'{stats["mean_ms"]:>11.2f}{stats["p50_ms"]:>9.2f}{stats["p90_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}'
+            )
+        return '\n'.join(lines)
+
+    def save(self, output_path: str, **info) -> None:
+        """
+        Save a JSON run report with the stage summary.
+
+        Note the stages overlap in time when frames are decoded and preprocessed ahead of the detection,
+        so the stage totals can add up to more than the wall time.
+
+        Args:
+            output_path (str): The path to the report file.
+            **info: Additional JSON serializable information about the run, e.g. the video and frames count.
+        """
+        report = {**info, 'wall_time_s': time.perf_counter() - self.__started, 'stages': self.summary()}
+        with open(output_path, 'w') as file:
+            json.dump(report, file, indent=4)
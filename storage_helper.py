@@ -1,5 +1,9 @@
 import file_helper
+from track_store import TrackStore
+from track_csv import HEADER, read_tracks_csv, write_tracks_csv, format_tracks_csv
 import csv
+import json
+import os
 
 def write_to_csv(data: dict, output_path: str) -> None:
     """
@@ -20,6 +24,82 @@ def write_to_csv(data: dict, output_path: str) -> None:
             for track in tracks:
                 writer.writerow([frame_num, *track])
 
+class RawDataWriter:
+    """
+    Append frames to a CSV file as they are tracked, in the `write_to_csv` format.
+
+    Rows are buffered and flushed to disk in blocks of frames, formatted with `format_tracks_csv`, so the memory
+    use does not grow with the video and the flushed part of the file can be read while frames are still being
+    written. Frames must be written in order.
+
+    Args:
+        output_path (str): The path to the output CSV file.
+        block_size (int, optional): The number of frames buffered between flushes. Defaults to 1000.
+        resume_offset (int, optional): Continue a file written earlier, truncated at this offset (as returned
+            by `tell`), instead of starting a new one. Defaults to None.
+        decimals (int, optional): Round the confidences and coordinates to this many decimals. Defaults to None,
+            the exact `repr` of the floats.
+    """
+
+    def __init__(self, output_path: str, block_size: int = 1000, resume_offset: int = None, decimals: int = None) -> None:
+        self.output_path = output_path
+        self.block_size = max(int(block_size), 1)
+        self.decimals = decimals
+        if resume_offset is None:
+            self.__file = open(output_path, 'wb')
+            self.__file.write(HEADER)
+        else:
+            # drop the rows written after the offset, they are written again
+            with open(output_path, 'r+b') as file:
+                file.truncate(resume_offset)
+            self.__file = open(output_path, 'ab')
+        self.__data = {}
+
+    def write(self, frame_num: int, tracks: list) -> None:
+        """
+        Write the tracks of the next frame.
+
+        Args:
+            frame_num (int): The frame number.
+            tracks (list): The track data of the frame.
+        """
+        self.__data[frame_num] = list(tracks)
+        if len(self.__data) >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered frames to disk.
+        """
+        if self.__data:
+            self.__file.write(format_tracks_csv(self.__data, self.decimals))
+        self.__file.flush()
+        self.__data = {}
+
+    def tell(self) -> int:
+        """
+        Flush the buffered frames and get the current end of the file, for resuming with `resume_offset`.
+
+        Returns:
+            int: The file offset.
+        """
+        self.flush()
+        return self.__file.tell()
+
+    def close(self) -> None:
+        """
+        Flush the buffered frames and close the file.
+        """
+        if not self.__file.closed:
+            self.flush()
+            self.__file.close()
+
+    def __enter__(self) -> 'RawDataWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
 def read_from_csv(input_path: str) -> dict:
     """
     Read data from a CSV file and return it as a dictionary.
@@ -46,18 +126,115 @@ def read_from_csv(input_path: str) -> dict:
             data[frame_number].append( (id, confidence, x1, y1, x2, y2) )
     return data
 
+def write_roi(roi: dict, video_path: str) -> None:
+    """
+    Store the region of interest of a given video next to it.
+
+    Args:
+        roi (dict): A dictionary with 'x_min', 'x_max', 'y_min', 'y_max' keys.
+        video_path (str): The path to the video file.
+    """
+    with open(f'{get_prepared_path(video_path)}_roi.json', 'w') as file:
+        json.dump({k: int(roi[k]) for k in ('x_min', 'x_max', 'y_min', 'y_max')}, file)
+
+def read_roi(video_path: str) -> dict:
+    """
+    Read the stored region of interest of a given video.
+
+    Args:
+        video_path (str): The path to the video file.
+
+    Returns:
+        dict: A dictionary with 'x_min', 'x_max', 'y_min', 'y_max' keys if a region is stored, otherwise None.
+    """
+    roi_file = f'{get_prepared_path(video_path)}_roi.json'
+    if not file_helper.check_existance(roi_file):
+        return None
+    with open(roi_file, 'r') as file:
+        return json.load(file)
+
+def get_detections_cache_path(video_path: str) -> str:
+    """
+    Get the path of the raw detections cache of a given video.
+
+    Args:
+        video_path (str): The path to the video file.
+
+    Returns:
+        str: The path to the detections cache file, next to the raw CSV file.
+    """
+    return f'{get_prepared_path(video_path)}_detections.npz'
+
+def get_checkpoint_path(video_path: str) -> str:
+    """
+    Get the path of the analysis checkpoint of a given video.
+
+    Args:
+        video_path (str): The path to the video file.
+
+    Returns:
+        str: The path to the checkpoint file, next to the raw CSV file.
+    """
+    return f'{get_prepared_path(video_path)}_checkpoint.pkl'
+
+def get_track_store_path(video_path: str, kind: str = 'raw') -> str:
+    """
+    Get the path of the binary track store of a given video.
+
+    Args:
+        video_path (str): The path to the video file.
+        kind (str, optional): The tracks stored, 'raw' or 'result'. Defaults to 'raw'.
+
+    Returns:
+        str: The path to the `.npy` track store file, next to the CSV file of the same tracks.
+    """
+    return f'{get_prepared_path(video_path)}_{kind}_tracks.npy'
+
+def write_track_store(data: dict, output_path: str, metadata: dict = None) -> None:
+    """
+    Write data to a binary track store, see `TrackStore`.
+
+    Args:
+        data (dict): A dictionary where keys are frame numbers and values are lists of track data.
+        output_path (str): The path to the output `.npy` file.
+        metadata (dict, optional): JSON serializable information about the tracks. Defaults to None.
+    """
+    TrackStore.from_dict(data, metadata).save(output_path)
+
+def read_tracks(input_path: str):
+    """
+    Read tracks data from a binary track store (memory-mapped) or a CSV file, by the file extension.
+
+    Args:
+        input_path (str): The path to the `.npy` track store or the CSV file.
+
+    Returns:
+        dict: A dictionary (or a read-only `TrackStore` mapping) where keys are frame numbers and values are
+            lists of track data.
+    """
+    if input_path.endswith('.npy'):
+        return TrackStore.load(input_path)
+    return read_tracks_csv(input_path)
+
 def find_raw_data(video_path: str) -> str:
     """
-    Find the path to the raw CSV file of a given video.
+    Find the path to the raw tracks of a given video, preferring the binary track store over the CSV file.
 
     Args:
         video_path (str): The path to the video file.
 
     Returns:
-        str: The path to the raw CSV file if it exists, otherwise None.
+        str: The path to the raw track store, or to the raw CSV file if the store is missing or older than it,
+            otherwise None.
     """
     raw_csv = f'{get_prepared_path(video_path)}_raw.csv'
-    return raw_csv if file_helper.check_existance(raw_csv) else None
+    raw_store = get_track_store_path(video_path, 'raw')
+    if not file_helper.check_existance(raw_csv):
+        return raw_store if file_helper.check_existance(raw_store) else None
+    # the CSV may have been written again, e.g. by an older version, keep the newer of the two
+    if file_helper.check_existance(raw_store) and os.path.getmtime(raw_store) >= os.path.getmtime(raw_csv):
+        return raw_store
+    return raw_csv
 
 def get_prepared_path(video_path: str) -> str:
     """
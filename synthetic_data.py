@@ -0,0 +1,199 @@
+import numpy as np
+
+
+def generate_fly_paths(flies: int, frames: int, width: int, height: int, seed: int = 0, speed: float = 1.5,
+                       margin: int = 6) -> np.ndarray:
+    """
+    Generate deterministic fly trajectories within a vial.
+
+    Every fly follows a random walk with momentum, bouncing off the vial walls, and occasionally rests.
+
+    Args:
+        flies (int): The number of flies.
+        frames (int): The number of frames.
+        width (int): The vial width [px].
+        height (int): The vial height [px].
+        seed (int, optional): The random seed. Defaults to 0.
+        speed (float, optional): The typical fly speed [px/frame]. Defaults to 1.5.
+        margin (int, optional): The distance kept from the vial walls [px]. Defaults to 6.
+
+    Returns:
+        np.ndarray: The (frames, flies, 2) fly centers.
+    """
+    rng = np.random.default_rng(seed)
+    low = np.array([margin, margin], dtype=float)
+    high = np.array([width - margin, height - margin], dtype=float)
+
+    position = rng.uniform(low, high, size=(flies, 2))
+    velocity = rng.normal(0, speed, size=(flies, 2))
+    resting = np.zeros(flies, dtype=bool)
+
+    paths = np.empty((frames, flies, 2))
+    for frame in range(frames):
+        # flies start and stop resting at random
+        resting ^= rng.random(flies) < np.where(resting, 0.05, 0.01)
+        velocity = 0.9 * velocity + rng.normal(0, speed * 0.3, size=(flies, 2))
+        position += np.where(resting[:, None], 0, velocity)
+
+        # bounce off the walls
+        below, above = position < low, position > high
+        position = np.where(below, 2 * low - position, np.where(above, 2 * high - position, position))
+        velocity = np.where(below | above, -velocity, velocity)
+        paths[frame] = position
+    return paths
+
+
+def paths_to_data(paths: np.ndarray, fly_size: tuple = (6, 3)) -> dict:
+    """
+    Convert fly trajectories to the tracks data format, with the fly index + 1 as the ID.
+
+    Args:
+        paths (np.ndarray): The (frames, flies, 2) fly centers.
+        fly_size (tuple, optional): The (length, width) of a fly [px]. Defaults to (6, 3).
+
+    Returns:
+        dict: A dictionary where keys are frame numbers and values are lists of track data.
+    """
+    half = max(fly_size) / 2
+    return {
+        frame: [(fly + 1, 1.0, x - half, y - half, x + half, y + half) for fly, (x, y) in enumerate(centers)]
+        for frame, centers in enumerate(paths.tolist())
+    }
+
+
+def write_vial_video(output_path: str, paths: np.ndarray, width: int, height: int, fps: int = 30, seed: int = 0,
+                     fly_size: tuple = (6, 3)) -> None:
+    """
+    Render fly trajectories as a video of dark blobs moving on a static textured vial background.
+
+    The background texture and the per-frame sensor noise are seeded, so the same arguments give the same video.
+
+    Args:
+        output_path (str): The path to the output `.avi` file.
+        paths (np.ndarray): The (frames, flies, 2) fly centers.
+        width (int): The frame width [px].
+        height (int): The frame height [px].
+        fps (int, optional): The video frame rate. Defaults to 30.
+        seed (int, optional): The random seed. Defaults to 0.
+        fly_size (tuple, optional): The (length, width) of a fly [px]. Defaults to (6, 3).
+    """
+    # only rendering needs OpenCV, the track data generators do not
+    import cv2
+
+    rng = np.random.default_rng(seed)
+
+    # a smooth light texture with the vial walls drawn along the sides
+    texture = rng.normal(0, 25, size=(height, width)).astype(np.float32)
+    texture = cv2.GaussianBlur(texture, (0, 0), 3) + 200
+    background = cv2.cvtColor(np.clip(texture, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+    cv2.rectangle(background, (0, 0), (width - 1, height - 1), (120, 120, 120), 2)
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    axes = (max(int(fly_size[0] / 2), 1), max(int(fly_size[1] / 2), 1))
+    previous = paths[0]
+    for centers in paths:
+        frame = background.copy()
+        for (x, y), (px, py) in zip(centers, previous):
+            # orient the flies along their motion
+            angle = float(np.degrees(np.arctan2(y - py, x - px))) if (x, y) != (px, py) else 90.0
+            cv2.ellipse(frame, (int(round(x)), int(round(y))), axes, angle, 0, 360, (40, 35, 30), -1, cv2.LINE_AA)
+        noise = rng.normal(0, 3, size=frame.shape)
+        writer.write(np.clip(frame + noise, 0, 255).astype(np.uint8))
+        previous = centers
+    writer.release()
+
+
+def generate_track_data(flies: int, frames: int, width: int = 70, height: int = 420, seed: int = 0, speed: float = 1.5,
+                        swap_rate: float = 1e-3, gap_rate: float = 1e-3, max_gap: int = 10, predicted_rate: float = 0.02,
+                        noise: float = 0.5, fly_size: tuple = (6, 3), margin: int = 6) -> tuple:
+    """
+    Generate deterministic tracks data with ID swaps, gaps and noise, without rendering a video.
+
+    The flies follow random walks folded into the vial. A swap gives a fly a new ID, with the old ID predicted
+    (confidence None) in the frame before, so `generate_links` can link them. A gap drops a fly for a few frames,
+    away from the swaps and the ends of the data. Other tracks are predicted at random, and the box corners jitter.
+
+    Args:
+        flies (int): The number of flies.
+        frames (int): The number of frames.
+        width (int, optional): The vial width [px]. Defaults to 70.
+        height (int, optional): The vial height [px]. Defaults to 420.
+        seed (int, optional): The random seed. Defaults to 0.
+        speed (float, optional): The typical fly speed [px/frame]. Defaults to 1.5.
+        swap_rate (float, optional): The chance of a fly getting a new ID in a frame. Defaults to 1e-3.
+        gap_rate (float, optional): The chance of a gap starting for a fly in a frame. Defaults to 1e-3.
+        max_gap (int, optional): The maximum gap length [frames]. Defaults to 10.
+        predicted_rate (float, optional): The chance of a track being predicted. Defaults to 0.02.
+        noise (float, optional): The standard deviation of the box corners jitter [px]. Defaults to 0.5.
+        fly_size (tuple, optional): The (length, width) of a fly [px]. Defaults to (6, 3).
+        margin (int, optional): The distance kept from the vial walls [px]. Defaults to 6.
+
+    Returns:
+        tuple: The tracks data, the true links {swapped: original} and the true gaps, in the
+            `find_gaps_in_data` format, of the data once the links are applied.
+    """
+    rng = np.random.default_rng(seed)
+    low = np.array([margin, margin], dtype=float)
+    span = np.array([width - 2 * margin, height - 2 * margin], dtype=float)
+
+    # random walks, folded back into the vial
+    centers = rng.uniform(0, span, size=(1, flies, 2)) + np.cumsum(rng.normal(0, speed, size=(frames, flies, 2)), axis=0)
+    centers = np.mod(centers, 2 * span)
+    centers = low + np.where(centers > span, 2 * span - centers, centers)
+
+    visible = np.ones((frames, flies), dtype=bool)
+    predicted = rng.random((frames, flies)) < predicted_rate
+    ids = np.empty((frames, flies), dtype=np.int64)
+    links, gaps = {}, []
+
+    next_id = 1
+    for fly in range(flies):
+        # swaps, at least 10 frames apart
+        swaps = []
+        for frame in np.flatnonzero(rng.random(frames) < swap_rate).tolist():
+            if frame >= (swaps[-1] if swaps else 0) + 10 and frame < frames - 2:
+                swaps.append(frame)
+
+        root_id = next_id
+        bounds = [0, *swaps, frames]
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            ids[begin:end, fly] = next_id
+            if begin > 0:
+                links[next_id] = next_id - 1
+            next_id += 1
+        predicted[np.array(swaps, dtype=int) - 1, fly] = True
+
+        # gaps, separated from each other, the swaps and the ends of the data
+        blocked = np.zeros(frames, dtype=bool)
+        blocked[:2] = blocked[-2:] = True
+        for frame in swaps:
+            blocked[max(frame - 2, 0):frame + 3] = True
+        fly_gaps, last_end = [], 0
+        for frame in np.flatnonzero(rng.random(frames) < gap_rate).tolist():
+            length = int(rng.integers(1, max_gap + 1))
+            if frame <= last_end or blocked[frame:frame + length + 1].any():
+                continue
+            visible[frame:frame + length, fly] = False
+            fly_gaps.append(list(range(frame, frame + length)))
+            last_end = frame + length
+        if fly_gaps:
+            gaps.append((root_id, fly_gaps))
+
+    # flatten the visible tracks, ordered by frame
+    frame_rows, fly_rows = np.nonzero(visible)
+    half = max(fly_size) / 2
+    jitter = rng.normal(0, noise, size=(len(frame_rows), 4))
+    x = centers[frame_rows, fly_rows, 0]
+    y = centers[frame_rows, fly_rows, 1]
+    confidences = np.round(rng.uniform(0.5, 1.0, size=len(frame_rows)), 2).tolist()
+    for row in np.flatnonzero(predicted[frame_rows, fly_rows]).tolist():
+        confidences[row] = None
+
+    tracks = list(zip(
+        ids[frame_rows, fly_rows].tolist(), confidences,
+        (x - half + jitter[:, 0]).tolist(), (y - half + jitter[:, 1]).tolist(),
+        (x + half + jitter[:, 2]).tolist(), (y + half + jitter[:, 3]).tolist(),
+    ))
+    offsets = np.searchsorted(frame_rows, np.arange(frames + 1)).tolist()
+    data = {frame: tracks[offsets[frame]:offsets[frame + 1]] for frame in range(frames)}
+    return data, links, gaps
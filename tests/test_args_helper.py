@@ -0,0 +1,19 @@
+import pytest
+from args_helper import parse_analysis_options, parse_bool, split_options
+
+
+@pytest.mark.parametrize('value, expected', [(True, True), (False, False), ('true', True), ('False', False), ('1', True), ('0', False)])
+def test_parse_bool(value, expected):
+    assert parse_bool(value) is expected
+
+
+def test_parse_bool_rejects_other_values():
+    with pytest.raises(ValueError, match='Invalid boolean option value "yes"'):
+        parse_bool('yes')
+
+
+def test_boolean_options():
+    _, options = split_options(['video.avi', '--cache-detections=false', '--memory'])
+    analysis_args = parse_analysis_options(options)
+    assert analysis_args['cache_detections'] is False
+    assert analysis_args['profile_memory'] is True
@@ -0,0 +1,161 @@
+import pytest
+
+for module in ('cv2', 'tqdm', 'torch', 'ultralytics', 'deep_sort_realtime'):
+    pytest.importorskip(module)
+
+import numpy as np
+import flytracker_app
+import frame_source
+import storage_helper
+
+
+FRAMES = 40
+
+
+class FakeStream:
+    """
+    A video of blank frames.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.frame_count, self.width, self.height = FRAMES, 16, 32
+        self.position = 0
+
+    def seek(self, frame: int) -> None:
+        self.position = frame
+
+    def read(self) -> tuple:
+        if self.position >= self.frame_count:
+            return False, None
+        self.position += 1
+        return True, np.zeros((self.height, self.width, 3), dtype=np.uint8)
+
+    def release(self) -> None:
+        pass
+
+
+class FakeTracker:
+    """
+    A tracker whose tracks depend on its state, so a resumed run only matches an uninterrupted one
+    if the state is restored. Raises on the `fail_at` detection, to interrupt an analysis.
+    """
+
+    def __init__(self, model_path: str, fail_at: int = None) -> None:
+        self.model_path = model_path
+        self.tracker = self
+        self.detector_backend = 'yolo'
+        self.background_detector = None
+        self.recorder = None
+        self.timer = None
+        self.fail_at = fail_at
+        self.calls = 0
+        self.state = 0
+
+    def detector_config(self) -> dict:
+        return {'conf': 0}
+
+    def set_frame_geometry(self, width: int, height: int) -> None:
+        pass
+
+    def detect(self, frame, roi: dict = None) -> list:
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise KeyboardInterrupt()
+        self.state += 1
+        return [(1, 0.5, self.state * 0.25, 1.0, self.state * 0.25 + 2, 3.0)]
+
+    def get_tracking_state(self) -> int:
+        return self.state
+
+    def set_tracking_state(self, state: int) -> None:
+        self.state = state
+
+    def reset_tracking(self) -> None:
+        self.state = 0
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    monkeypatch.setattr(frame_source, 'open_video', FakeStream)
+    exported = []
+    monkeypatch.setattr(flytracker_app, 'export_results', lambda raw_data, *args, **kwargs: exported.append(raw_data))
+    video_path = tmp_path / 'vial.avi'
+    video_path.write_bytes(b'video')
+    weights_path = tmp_path / 'weights.pt'
+    weights_path.write_bytes(b'weights')
+    return str(video_path), str(weights_path), exported
+
+
+def run(video_path: str, tracker: FakeTracker, resume: bool = False):
+    # a local closure, as passed by the tracking worker, is not picklable
+    reports = []
+    def report_progress(done, total):
+        reports.append((done, total))
+
+    flytracker_app.process_video(tracker, video_path, None, None, None, checkpoint_interval=10, resume=resume,
+                                 progress_callback=report_progress, prefetch=4)
+    return reports
+
+
+def test_checkpoint_with_progress_callback(video):
+    video_path, weights_path, exported = video
+    run(video_path, FakeTracker(weights_path))
+    assert len(exported) == 1 and len(exported[0]) == FRAMES
+    # the final checkpoint was saved, then removed with the results
+    assert not flytracker_app.file_helper.check_existance(storage_helper.get_checkpoint_path(video_path))
+
+
+def test_resume_matches_uninterrupted_run(video):
+    video_path, weights_path, exported = video
+    run(video_path, FakeTracker(weights_path))
+
+    with pytest.raises(KeyboardInterrupt):
+        run(video_path, FakeTracker(weights_path, fail_at=25))
+    reports = run(video_path, FakeTracker(weights_path), resume=True)
+
+    # the run continued from the checkpoint at frame 20, with the restored tracker state
+    assert reports[0] == (21, FRAMES)
+    assert exported[1] == exported[0]
+
+
+def test_background_model_is_not_checkpointed(video):
+    video_path, weights_path, exported = video
+    tracker = FakeTracker(weights_path, fail_at=25)
+    tracker.detector_backend, tracker.background_detector = 'background', object()
+    with pytest.raises(KeyboardInterrupt):
+        run(video_path, tracker)
+    assert not flytracker_app.file_helper.check_existance(storage_helper.get_checkpoint_path(video_path))
+
+    tracker = FakeTracker(weights_path)
+    tracker.detector_backend, tracker.background_detector = 'background', object()
+    reports = run(video_path, tracker, resume=True)
+    assert reports[0] == (1, FRAMES) and len(exported[0]) == FRAMES
+
+
+def test_pool_job_reports_tracker_errors(video, monkeypatch):
+    video_path, weights_path, exported = video
+    def broken_tracker(*args, **kwargs):
+        raise Exception('missing engine')
+    monkeypatch.setattr(flytracker_app, 'FlyTracker', broken_tracker)
+    monkeypatch.setattr(flytracker_app, '_POOL_TRACKER', None)
+    monkeypatch.setattr(flytracker_app, '_POOL_TRACKER_ARGS', {})
+
+    job = (video_path, None, None, None, None, False, {}, {})
+    assert flytracker_app.run_pool_job(job) == (video_path, False, 'missing engine')
+
+
+@pytest.mark.parametrize('embeds, valid', [(True, False), (False, True)])
+def test_cache_without_embeddings_needs_a_tracker_without(video, embeds, valid):
+    video_path, weights_path, _ = video
+    cache = flytracker_app.DetectionCache(metadata={
+        'video_hash': flytracker_app.file_helper.hash_file(video_path, flytracker_app.VIDEO_HASH_SAMPLE_SIZE),
+        'weights_hash': flytracker_app.file_helper.hash_file(weights_path),
+        'detector': {'conf': None, 'embeds': False},
+    })
+    cache.append(np.zeros((0, 6)))
+    cache.save(storage_helper.get_detections_cache_path(video_path))
+
+    tracker = FakeTracker(weights_path)
+    tracker.detector_config = lambda: {'conf': None, 'embeds': embeds}
+    loaded = flytracker_app.load_detections_cache(video_path, weights_path, tracker)
+    assert (loaded is not None) == valid
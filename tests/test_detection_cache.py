@@ -0,0 +1,49 @@
+import numpy as np
+from detection_cache import DetectionCache
+
+
+def boxes(count: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).uniform(0, 100, (count, 6))
+
+
+def frames(cache: DetectionCache) -> list:
+    return [(frame, None if b is None else b.tolist(), None if e is None else e.tolist()) for frame, b, e in cache]
+
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / 'detections.npz')
+    cache = DetectionCache(start_frame=5, metadata={'detector': {'conf': 0.3}})
+    cache.append(boxes(2, 0), np.ones((2, 4)))
+    cache.append(None)
+    cache.append(np.zeros((0, 6)), None)
+    cache.append(boxes(1, 1), np.full((1, 4), 0.5))
+    cache.save(path)
+
+    loaded = DetectionCache.load(path)
+    assert len(loaded) == 4 and loaded.start_frame == 5
+    assert loaded.metadata == {'detector': {'conf': 0.3}}
+    # a frame without detections gets the empty embeddings of its detections
+    assert frames(loaded) == frames(cache)[:2] + [(7, [], [])] + frames(cache)[3:]
+    assert [frame for frame, _, _ in loaded] == [5, 6, 7, 8]
+    # the boxes are stored as float32, the embeddings as float16
+    assert next(iter(loaded))[1].dtype == np.float32 and next(iter(loaded))[2].dtype == np.float16
+
+
+def test_save_load_without_all_embeddings(tmp_path):
+    path = str(tmp_path / 'detections.npz')
+    cache = DetectionCache()
+    cache.append(boxes(2, 0), np.ones((2, 4)))
+    cache.append(boxes(1, 1))
+    cache.save(path)
+
+    loaded = DetectionCache.load(path)
+    assert [e for _, _, e in loaded] == [None, None]
+    assert [b.tolist() for _, b, _ in loaded] == [b.tolist() for _, b, _ in cache]
+
+
+def test_save_load_empty(tmp_path):
+    path = str(tmp_path / 'detections.npz')
+    DetectionCache(start_frame=3).save(path)
+
+    loaded = DetectionCache.load(path)
+    assert len(loaded) == 0 and loaded.start_frame == 3 and loaded.metadata == {}
@@ -0,0 +1,76 @@
+import pickle
+import numpy as np
+from motion_tracker import MotionTracker, iou_matrix
+
+
+def detection(x: float, y: float, conf: float = 0.9) -> tuple:
+    return [x, y, 6.0, 3.0], conf, 0
+
+
+def track_ids(tracks: list) -> list:
+    return sorted(track.track_id for track in tracks)
+
+
+def test_iou_matrix():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 10, 10], [20, 20, 0, 0]], dtype=float)
+    iou = iou_matrix(boxes, boxes)
+    assert np.allclose(iou[0], [1, 1 / 3, 0]) and iou[2, 2] == 0
+
+
+def test_tracks_keep_their_ids():
+    tracker = MotionTracker(n_init=3)
+    for frame in range(10):
+        tracks = tracker.update_tracks([detection(10 + frame, 50), detection(40 - frame, 80)])
+        assert [track.is_confirmed() for track in tracks] == [frame >= 2] * 2
+
+    first, second = tracks
+    assert (first.track_id, second.track_id) == (1, 2)
+    assert np.allclose(first.to_ltwh(), [19, 50, 6, 3], atol=0.5)
+    assert np.allclose(second.to_ltwh(), [31, 80, 6, 3], atol=0.5)
+
+
+def test_fast_fly_without_overlap_is_matched():
+    # the fly moves 8 px a frame, more than its width, the boxes of consecutive frames never overlap
+    tracker = MotionTracker(n_init=1)
+    for frame in range(6):
+        tracks = tracker.update_tracks([detection(8.0 * frame, 50)])
+    assert track_ids(tracks) == [1]
+
+
+def test_low_confidence_detections_only_continue_tracks():
+    tracker = MotionTracker(n_init=1, high_threshold=0.5)
+    tracker.update_tracks([detection(10, 50)])
+    tracks = tracker.update_tracks([detection(11, 50, 0.2), detection(60, 50, 0.2)])
+
+    assert track_ids(tracks) == [1]
+    assert tracks[0].time_since_update == 0 and tracks[0].get_det_conf() == 0.2
+
+
+def test_missed_tracks_are_deleted():
+    tracker = MotionTracker(max_age=2, n_init=2)
+    tracker.update_tracks([detection(10, 50), detection(40, 50)])
+    tracker.update_tracks([detection(10, 50)])
+    # the tentative track is deleted at its first miss
+    assert track_ids(tracker.tracks) == [1]
+
+    # the confirmed track survives `max_age` misses
+    for _ in range(2):
+        assert track_ids(tracker.update_tracks([])) == [1]
+        assert tracker.tracks[0].get_det_conf() is None
+    assert tracker.update_tracks([]) == []
+
+    tracker.update_tracks([detection(10, 50)])
+    tracker.delete_all_tracks()
+    assert tracker.tracks == [] and track_ids(tracker.update_tracks([detection(10, 50)])) == [1]
+
+
+def test_pickled_state_continues_the_same():
+    tracker = MotionTracker()
+    for frame in range(5):
+        tracker.update_tracks([detection(10 + frame, 50), detection(40, 50 + 2 * frame)])
+    restored = pickle.loads(pickle.dumps(tracker))
+
+    for frame in range(5, 10):
+        detections = [detection(10 + frame, 50), detection(40, 50 + 2 * frame)]
+        expected = [(track.track_id, track.to_ltwh().tolist()) for track in tracker.update_tracks(detections)]
+        assert [(track.track_id, track.to_ltwh().tolist()) for track in restored.update_tracks(detections)] == expected
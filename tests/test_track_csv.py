@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+import storage_helper
+import track_csv
+
+
+EDGE_FIELDS = [
+    '0', '-0.0', '12', '-7', '0.5', '.5', '5.', '00012.5000', '1e-05', '-2.5E+3', 'inf',
+    '0.30000000000000004', '9007199254740993', '9007199254740993.0', '1.7976931348623157', '2.2250738585072011',
+    '18446744073709551615', '1844674407370955161.5', '999999999999999999.9', '123456789012345678901234',
+    '0.000000000000000000001', '0.00001234567890123456789',
+]
+
+
+def write_lines(path, lines: list) -> None:
+    path.write_bytes(track_csv.HEADER + ''.join(f'{line}\r\n' for line in lines).encode())
+
+
+def random_tracks(frames: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    data = {}
+    for frame in range(frames):
+        tracks = []
+        for track_id in range(int(rng.integers(0, 4))):
+            conf = None if rng.random() < 0.2 else float(rng.random())
+            x1, y1 = (float(value) for value in rng.uniform(-5, 2000, 2))
+            tracks.append((track_id, conf, x1, y1, x1 + float(rng.uniform(0, 50)), y1 + 1e-7 * float(rng.random())))
+        data[frame] = tracks
+    return data
+
+
+def test_read_repr_floats_exactly(tmp_path):
+    path = tmp_path / 'tracks.csv'
+    data = random_tracks(3000)
+    storage_helper.write_to_csv(data, str(path))
+
+    # small blocks, so lines are split between blocks
+    assert track_csv.read_tracks_csv(str(path), block_size=4096) == storage_helper.read_from_csv(str(path)) == data
+
+
+def test_read_edge_fields(tmp_path):
+    path = tmp_path / 'tracks.csv'
+    write_lines(path, [f'1,2,,{field},{field},{field},{field}' for field in EDGE_FIELDS] + ['3'])
+
+    store = track_csv.read_tracks_csv(str(path), as_store=True)
+    expected = np.array([float(field) for field in EDGE_FIELDS])
+    assert np.isnan(store.rows['conf']).all()
+    for name in ('x1', 'y1', 'x2', 'y2'):
+        assert np.array_equal(store.rows[name], expected)
+        assert np.array_equal(np.signbit(store.rows[name]), np.signbit(expected))
+    assert store.frames.tolist() == [1, 3] and store[3] == []
+
+
+@pytest.mark.parametrize('line, message', [
+    ('1,2,0.5,1.2.3,0,0,0', 'the fields must be numbers'),
+    ('1,2,0.5,--1,0,0,0', 'the fields must be numbers'),
+    ('1,2,0.5,0,0,0', 'with 6 fields'),
+    (',2,0.5,0,0,0,0', 'without a frame number'),
+])
+def test_read_rejects_malformed_rows(tmp_path, line, message):
+    path = tmp_path / 'tracks.csv'
+    write_lines(path, ['0,1,0.5,0,0,1,1', line])
+    with pytest.raises(Exception, match=message):
+        track_csv.read_tracks_csv(str(path))
+
+
+def test_write_exact_like_write_to_csv(tmp_path):
+    data = random_tracks(3000, seed=1)
+    data[3000] = [(4, 0.0, -0.0, 1e-05, 123456789012345.6, 5e-324), (5, None, 1e16, -2.5, 0.1, 2.0 ** -20)]
+    data[3001] = []
+    storage_helper.write_to_csv(data, str(tmp_path / 'expected.csv'))
+    expected = (tmp_path / 'expected.csv').read_bytes()
+
+    track_csv.write_tracks_csv(data, str(tmp_path / 'dict.csv'), block_size=100)
+    track_csv.write_tracks_csv(storage_helper.TrackStore.from_dict(data), str(tmp_path / 'store.csv'))
+    with storage_helper.RawDataWriter(str(tmp_path / 'raw.csv'), block_size=37) as writer:
+        for frame, tracks in data.items():
+            writer.write(frame, tracks)
+    for name in ('dict.csv', 'store.csv', 'raw.csv'):
+        assert (tmp_path / name).read_bytes() == expected
+    assert track_csv.read_tracks_csv(str(tmp_path / 'dict.csv')) == data
+
+
+def test_write_rounded(tmp_path):
+    path = tmp_path / 'tracks.csv'
+    data = random_tracks(500, seed=2)
+    track_csv.write_tracks_csv(data, str(path), decimals=4)
+
+    store = track_csv.read_tracks_csv(str(path), as_store=True)
+    expected = storage_helper.TrackStore.from_dict(data)
+    assert store.frames.tolist() == expected.frames.tolist()
+    for name in ('conf', 'x1', 'y1', 'x2', 'y2'):
+        assert np.array_equal(store.rows[name], np.round(expected.rows[name], 4), equal_nan=True)
+
+
+EDGE_VALUES = [
+    0.0, -0.0, 5e-324, -5e-324, 2.225073858507201e-308, 2.2250738585072014e-308, 1.7976931348623157e308, 1e-05,
+    9.999999999999999e-05, 0.0001, 0.00010000000000000002, 0.30000000000000004, 1.0000000000000002, 0.1, 2.5, 1e14,
+    99999999999999.98, 123456789012345.67, 9007199254740992.0, 9007199254740994.0, 1e16, 1e22, 1e23, 2.0 ** -20,
+    -1234.5678901234567, 4.35, 0.3, 7.1e-10,
+]
+
+
+def random_doubles(count: int, seed: int) -> np.ndarray:
+    # random bit patterns cover every exponent, with shortest representations of up to 17 digits
+    bits = np.random.default_rng(seed).integers(0, 2**63, count, dtype=np.int64, endpoint=False)
+    values = bits.view(np.float64)
+    return values[np.isfinite(values)]
+
+
+def test_write_like_repr(tmp_path):
+    rng = np.random.default_rng(3)
+    values = EDGE_VALUES + random_doubles(20000, 4).tolist() + rng.uniform(-2000, 2000, 20000).tolist()
+    values += [float(f'{value:.17g}') for value in rng.uniform(0, 100, 5000)]
+    data = {frame: [(1, value, value, -value, value, value)] for frame, value in enumerate(values)}
+
+    lines = track_csv.format_tracks_csv(data).decode().split('\r\n')[:-1]
+    for line, value in zip(lines, values):
+        assert line.split(',')[2:] == [repr(value), repr(value), repr(-value), repr(value), repr(value)]
+
+
+def test_read_like_float(tmp_path):
+    path = tmp_path / 'tracks.csv'
+    values = EDGE_VALUES + random_doubles(20000, 5).tolist()
+    digits = np.random.default_rng(6).integers(10**16, 10**17, 5000).tolist()
+    fields = [repr(value) for value in values] + [f'{number}e-{exponent}' for number, exponent in zip(digits, range(5000))]
+    fields += [f'0.{number}' for number in digits] + [f'{str(number)[:9]}.{str(number)[9:]}' for number in digits]
+    negated = [field[1:] if field.startswith('-') else f'-{field}' for field in fields]
+    write_lines(path, [f'0,1,{field},{field},0,0,{negative}' for field, negative in zip(fields, negated)])
+
+    store = track_csv.read_tracks_csv(str(path), as_store=True)
+    expected = np.array([float(field) for field in fields])
+    for name, sign in (('conf', 1), ('x1', 1), ('y2', -1)):
+        assert np.array_equal(store.rows[name].view(np.int64), (sign * expected).view(np.int64))
+
+
+def test_write_integer_coordinates_as_floats(tmp_path):
+    # gap filled tracks may hold integers, which are written as floats and read back equal
+    data = {0: [(1, None, 5, 6, 7.5, 8)]}
+    assert track_csv.format_tracks_csv(data) == b'0,1,,5.0,6.0,7.5,8.0\r\n'
+    path = tmp_path / 'tracks.csv'
+    track_csv.write_tracks_csv(data, str(path))
+    assert track_csv.read_tracks_csv(str(path)) == data
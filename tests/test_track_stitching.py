@@ -0,0 +1,41 @@
+from track_stitching import match_segment_ids, split_frame_range, stitch_segments
+
+
+def fly_box(fly: int, frame: int) -> tuple:
+    # flies 10 px apart, moving down 1 px per frame
+    x, y = 20.0 * fly, 2.0 * fly + frame
+    return x, y, x + 10, y + 4
+
+
+def segment(start: int, end: int, ids: dict) -> dict:
+    """The tracks of a segment, where `ids` maps a fly to its ID and the first frame it is seen."""
+    return {
+        frame: [(track_id, 0.9, *fly_box(fly, frame)) for fly, (track_id, first) in ids.items() if frame >= first]
+        for frame in range(start, end)
+    }
+
+
+def test_split_frame_range():
+    assert split_frame_range(0, 100, 2, 10) == [(0, 50), (40, 100)]
+    assert split_frame_range(10, 40, 4, 10) == [(10, 40)]
+
+
+def test_match_segment_ids():
+    previous = segment(0, 60, {0: (1, 0), 1: (2, 0)})
+    following = segment(40, 100, {0: (7, 0), 1: (5, 0), 2: (9, 55)})
+
+    assert match_segment_ids(previous, following, range(40, 60)) == {7: 1, 5: 2}
+    # too few shared frames to vote a match
+    assert match_segment_ids(previous, following, range(58, 60)) == {}
+
+
+def test_stitch_segments():
+    segments = [
+        (0, 60, segment(0, 60, {0: (1, 0), 1: (2, 0)})),
+        (40, 100, segment(40, 100, {0: (7, 0), 1: (5, 0), 2: (9, 80)})),
+        (80, 120, segment(80, 120, {0: (3, 0), 1: (1, 0), 2: (2, 80)})),
+    ]
+
+    stitched = stitch_segments(segments)
+    expected = segment(0, 120, {0: (1, 0), 1: (2, 0), 2: (3, 80)})
+    assert stitched == expected
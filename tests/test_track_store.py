@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from track_store import TrackStore
+
+
+DATA = {
+    0: [(1, 0.9, 1.0, 2.0, 3.0, 4.0), (2, None, -1.5, 0.0, 2.5, 1e-7)],
+    1: [],
+    2: [(1, 0.0, 1.25, 2.0, 3.0, 4.0)],
+    5: [],
+    7: [(3, 0.5, 0.1, 0.2, 0.30000000000000004, 123456.789)],
+}
+
+
+def test_from_dict_round_trip():
+    store = TrackStore.from_dict(DATA)
+
+    assert store.to_dict() == DATA
+    assert list(store) == sorted(DATA) and len(store) == len(DATA)
+    assert store.offsets.tolist() == [0, 2, 2, 3, 3, 4]
+    assert np.isnan(store.rows['conf'][1])
+    for frame, tracks in DATA.items():
+        assert store[frame] == tracks
+    for frame in (-1, 3, 8):
+        with pytest.raises(KeyError):
+            store[frame]
+
+
+def test_from_dict_empty():
+    store = TrackStore.from_dict({})
+    assert len(store.rows) == 0 and store.to_dict() == {}
+    assert TrackStore.from_dict({0: [], 1: []}).to_dict() == {0: [], 1: []}
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_load(tmp_path, mmap):
+    path = str(tmp_path / 'tracks.npy')
+    TrackStore.from_dict(DATA, metadata={'source': 'test'}).save(path)
+
+    store = TrackStore.load(path, mmap=mmap)
+    assert isinstance(store.rows, np.memmap) == mmap
+    assert store.metadata == {'source': 'test'}
+    assert store.to_dict() == DATA
+    store.detach()
+    assert not isinstance(store.rows, np.memmap)
+
+
+def test_load_rejects_other_formats(tmp_path):
+    path = str(tmp_path / 'tracks.npy')
+    TrackStore.from_dict(DATA).save(path)
+    np.save(path, np.zeros(3))
+    with pytest.raises(Exception, match='unexpected format'):
+        TrackStore.load(path)
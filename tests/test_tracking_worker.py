@@ -0,0 +1,50 @@
+import os
+import stat
+import threading
+from multiprocessing.connection import Listener
+import pytest
+import tracking_worker
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('USERPROFILE', str(tmp_path))
+    return tmp_path
+
+
+def test_authkey_file(home):
+    address = ('localhost', 1)
+    assert tracking_worker.read_authkey(address) is None
+    tracking_worker.write_authkey(b'key', address)
+    tracking_worker.write_authkey(b'other key', address)
+
+    path = tracking_worker.get_authkey_path(address)
+    assert os.path.dirname(path) == str(home)
+    assert tracking_worker.read_authkey(address) == b'other key'
+    if os.name == 'posix':
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_clients_need_the_key(home):
+    listener = Listener(('localhost', 0), authkey=b'secret')
+    address = listener.address
+
+    def answer():
+        try:
+            with listener.accept() as conn:
+                conn.recv()
+                conn.send({'type': 'pong'})
+        except Exception:
+            pass
+    thread = threading.Thread(target=answer, daemon=True)
+    thread.start()
+
+    # without the key file the clients do not connect at all
+    assert not tracking_worker.is_available(address)
+    with pytest.raises(Exception, match='No tracking worker key'):
+        tracking_worker.submit_job('video.avi', address=address)
+
+    tracking_worker.write_authkey(b'secret', address)
+    assert tracking_worker.is_available(address)
+    listener.close()
@@ -4,6 +4,7 @@ import threading
 import time
 import re
 import subprocess
+from contextlib import nullcontext
 
 from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import (
@@ -17,15 +18,20 @@ from PyQt5.QtGui import QPixmap, QFont, QImage
 # Custom modules
 import storage_helper, extract_data, file_helper
 import data_postprocess
+import tracking_worker
+import frame_source
 import video_postprocess
+from memory_tracker import MemoryTracker
+from track_store import TrackStore
 from AdjustmentDialog import AdjustmentDialog
 
 
 class MainWindow(QtWidgets.QWidget):
     # Define a custom signal
     model_finished = pyqtSignal(bool, str)
+    model_progress = pyqtSignal(int, int)
 
-    def __init__(self):
+    def __init__(self, profile_memory=False):
         super().__init__()
 
         # Initialize variables
@@ -52,6 +58,11 @@ class MainWindow(QtWidgets.QWidget):
         self.TRIMMED_DATA = None
         self.DATA_GAPS = None
 
+        # Memory tracing, opt-in as it slows the editor down
+        self.MEMORY = MemoryTracker() if profile_memory else None
+        if self.MEMORY is not None:
+            self.MEMORY.start()
+
         # Video variables
         self.VIDEO_CAPTURE = None
         self.VIDEO_TOTAL_FRAMES = 0
@@ -358,6 +369,7 @@ class MainWindow(QtWidgets.QWidget):
 
         # Connect the custom signal to the slot
         self.model_finished.connect(self.on_model_finished)
+        self.model_progress.connect(self.on_model_progress)
 
     def toggle_panel(self, widget, state):
         widget.setEnabled(state)
@@ -391,7 +403,11 @@ class MainWindow(QtWidgets.QWidget):
             old_path = self.__INPUT_VIDEO
             self.__INPUT_VIDEO = file_path
             try:
-                self.await_file_opened()
+                if not self.await_file_opened():
+                    self.__INPUT_VIDEO = old_path
+                    if not self.__AWAITING_VIDEO:
+                        self.update_timer.start()
+                    return
                 self.reset_app()
             except Exception as err:
                 QMessageBox.warning(self, 'Error', f'An exception occurred in await_file_opened():\n{err}')
@@ -402,24 +418,31 @@ class MainWindow(QtWidgets.QWidget):
 
     def await_file_opened(self):
         if self.__INPUT_VIDEO is not None:
-            # Read raw data from csv file
+            # Open the video first, the current one stays loaded when it cannot be opened
+            try:
+                capture = frame_source.open_video(self.__INPUT_VIDEO)
+            except Exception as err:
+                QMessageBox.warning(self, 'Error', f'Could not open the video:\n{err}')
+                return False
+
+            # Read raw data from the track store (memory-mapped) or csv file
             raw_file = storage_helper.find_raw_data(self.__INPUT_VIDEO)
-            self.STORED_RAW_DATA = storage_helper.read_from_csv(raw_file) if raw_file is not None else None
+            with self.measure_memory('load'):
+                self.STORED_RAW_DATA = storage_helper.read_tracks(raw_file) if raw_file is not None else None
 
             if self.VIDEO_CAPTURE is not None:
                 self.VIDEO_CAPTURE.release()
             
             # Initialize the video capture
-            self.VIDEO_CAPTURE = cv2.VideoCapture(self.__INPUT_VIDEO)
-            self.VIDEO_TOTAL_FRAMES = int(self.VIDEO_CAPTURE.get(cv2.CAP_PROP_FRAME_COUNT))
-            self.PLAYBACK_DELAY_MS = int(1000 / self.VIDEO_CAPTURE.get(cv2.CAP_PROP_FPS))
+            self.VIDEO_CAPTURE = capture
+            self.VIDEO_TOTAL_FRAMES = self.VIDEO_CAPTURE.frame_count
+            self.PLAYBACK_DELAY_MS = int(1000 / self.VIDEO_CAPTURE.fps)
 
             if self.STORED_RAW_DATA is not None:
                 self.init_for_video()
-                return
             else:
                 self.init_for_model()
-                return
+        return True
 
     def init_for_video(self):
         # Enable elements after a video has loaded
@@ -700,11 +723,25 @@ class MainWindow(QtWidgets.QWidget):
 
     def process_data(self):
         self.populate_links()
-        self.PROCESSED_DATA = data_postprocess.process_data(self.STORED_RAW_DATA, self.LINKS)
-        self.apply_constraints()
-        self.DATA_GAPS = data_postprocess.find_gaps_in_data(self.TRIMMED_DATA)
-        self.TRIMMED_DATA = data_postprocess.fill_gaps_in_data(self.TRIMMED_DATA, self.DATA_GAPS)
+        with self.measure_memory('process'):
+            self.PROCESSED_DATA = data_postprocess.process_data(self.STORED_RAW_DATA, self.LINKS)
+            self.apply_constraints()
+            self.DATA_GAPS = data_postprocess.find_gaps_in_data(self.TRIMMED_DATA)
+            self.TRIMMED_DATA = data_postprocess.fill_gaps_in_data(self.TRIMMED_DATA, self.DATA_GAPS)
         self.populate_gaps_list()
+        self.save_memory_report()
+
+    def measure_memory(self, stage):
+        return self.MEMORY.measure(stage) if self.MEMORY is not None else nullcontext()
+
+    def save_memory_report(self):
+        if self.MEMORY is None or self.__INPUT_VIDEO is None:
+            return
+        self.MEMORY.track('STORED_RAW_DATA', self.STORED_RAW_DATA)
+        self.MEMORY.track('PROCESSED_DATA', self.PROCESSED_DATA)
+        self.MEMORY.track('TRIMMED_DATA', self.TRIMMED_DATA)
+        output_path = storage_helper.get_prepared_path(self.__INPUT_VIDEO)
+        self.MEMORY.save(f'{output_path}_editor_memory_report.json', video=self.__INPUT_VIDEO)
 
     def populate_links(self):
         self.list_links_reset()
@@ -794,7 +831,8 @@ class MainWindow(QtWidgets.QWidget):
         # Prepare output basename
         output_path = storage_helper.get_prepared_path(self.__INPUT_VIDEO)
         try:
-            storage_helper.write_to_csv(self.TRIMMED_DATA, f'{output_path}_result.csv')
+            storage_helper.write_tracks_csv(self.TRIMMED_DATA, f'{output_path}_result.csv')
+            storage_helper.write_track_store(self.TRIMMED_DATA, storage_helper.get_track_store_path(self.__INPUT_VIDEO, 'result'))
             QMessageBox.information(self, 'Success', f'Exported file to:\n{output_path}_result.csv')
             try:
                 p = extract_data.extract_findings(f'{output_path}_result.csv', self.get_export_ids())
@@ -808,7 +846,9 @@ class MainWindow(QtWidgets.QWidget):
         output_path = storage_helper.get_prepared_path(self.__INPUT_VIDEO)
         try:
             requested_data = data_postprocess.filter_by_ids(self.TRIMMED_DATA, self.get_export_ids())
-            video_postprocess.annotate_video(requested_data, self.__INPUT_VIDEO, f'{output_path}_result.mp4', None, False)
+            with self.measure_memory('annotate'):
+                video_postprocess.annotate_video(requested_data, self.__INPUT_VIDEO, f'{output_path}_result.mp4', None, False, memory=self.MEMORY)
+            self.save_memory_report()
             QMessageBox.information(self, 'Success', f'Exported file to:\n{output_path}_result.mp4')
         except Exception as e:
             QMessageBox.warning(self, 'Error', f'Failed to export MP4 file!\n{str(e)}')
@@ -830,14 +870,23 @@ class MainWindow(QtWidgets.QWidget):
             QMessageBox.warning(self, 'Error', 'Please provide valid inputs,\nneither `start frame` nor `end frame` can be negative values.')
             return
 
+        # The model writes the track stores again, release the memory-mapped raw tracks file
+        if isinstance(self.STORED_RAW_DATA, TrackStore):
+            self.STORED_RAW_DATA.detach()
+
+        # Store the constraints as the region of interest, so the model only analyzes that region
+        if self.STORED_RAW_DATA is not None:
+            self.read_constraints()
+            storage_helper.write_roi(self.CONSTRAINTS, self.__INPUT_VIDEO)
+
         # Remove emphasis from 'Model Launch Components' frame
         self.model_frame.setStyleSheet('')
 
         # Disable the model_frame to prevent running more than once at a time
         self.toggle_panel(self.model_frame, False)
 
-        # Ensure that the model executable is present
-        if not file_helper.check_existance(self.__MODEL_EXE):
+        # Ensure that the model executable is present, unless a tracking worker is running
+        if not tracking_worker.is_available() and not file_helper.check_existance(self.__MODEL_EXE):
             QMessageBox.warning(self, 'Error', f'The vision model executable is missing at `{self.__MODEL_EXE}`.')
             return
 
@@ -846,20 +895,32 @@ class MainWindow(QtWidgets.QWidget):
 
     def run_model(self, input_path, start_frame, end_frame):
         start_time = time.time()
-        model_process = subprocess.Popen(
-            [self.__MODEL_EXE, input_path, str(start_frame), str(end_frame)],
-            creationflags=subprocess.CREATE_NEW_CONSOLE
-        )
-        model_process.wait()
+        if tracking_worker.is_available():
+            # Prefer the running tracking worker, which already has the model loaded
+            try:
+                success = tracking_worker.submit_job(input_path, start_frame, end_frame, progress_callback=self.model_progress.emit)
+            except (OSError, EOFError):
+                success = False
+        else:
+            model_process = subprocess.Popen(
+                [self.__MODEL_EXE, input_path, str(start_frame), str(end_frame)],
+                creationflags=subprocess.CREATE_NEW_CONSOLE
+            )
+            model_process.wait()
+            success = (model_process.returncode == 0)
         elapsed_time = time.time() - start_time
 
         # Notify the user about the completion via the signal
         formatted_time = time.strftime('%M:%S', time.gmtime(elapsed_time))
 
         # Emit the signal to notify the main thread
-        self.model_finished.emit((model_process.returncode == 0), formatted_time)
+        self.model_finished.emit(success, formatted_time)
+
+    def on_model_progress(self, done, total):
+        self.model_run_button.setText(f'Running Model [{int(100 * done / max(total, 1))}%]')
         
     def on_model_finished(self, success, elapsed_time_str):
+        self.model_run_button.setText('Run Model')
         if success:
             QMessageBox.information(self, 'Success', f'Analysis Complete!\nElapsed Time: {elapsed_time_str}')
         else:
@@ -1028,6 +1089,6 @@ if __name__ == "__main__":
         }
     """)
 
-    window = MainWindow()
+    window = MainWindow(profile_memory='--memory' in sys.argv[1:])
     window.showMaximized()
     sys.exit(app.exec_())
@@ -0,0 +1,119 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from motion_tracker import iou_matrix
+
+
+def split_frame_range(start_frame: int, end_frame: int, segments: int, overlap: int) -> list:
+    """
+    Split a frame range into consecutive segments, each overlapping the previous one.
+
+    Args:
+        start_frame (int): The first frame of the range.
+        end_frame (int): The frame the range ends at (exclusive).
+        segments (int): The number of segments.
+        overlap (int): The number of frames shared by neighbouring segments.
+
+    Returns:
+        list: The (start, end) frame range of every segment, fewer segments are returned for short ranges.
+    """
+    length = end_frame - start_frame
+    segments = max(1, min(segments, length // max(2 * overlap, 1)))
+    bounds = [start_frame + round(i * length / segments) for i in range(segments + 1)]
+    return [(max(bounds[i] - overlap, start_frame) if i > 0 else bounds[i], bounds[i + 1]) for i in range(segments)]
+
+
+def tracks_to_ltwh(tracks: list) -> np.ndarray:
+    """
+    Convert the boxes of tracks to (left, top, width, height).
+
+    Args:
+        tracks (list): A list of track tuples.
+
+    Returns:
+        np.ndarray: An (N, 4) array of ltwh boxes.
+    """
+    boxes = np.array([track[2:6] for track in tracks], dtype=float).reshape(-1, 4)
+    boxes[:, 2:] -= boxes[:, :2]
+    return boxes
+
+
+def match_segment_ids(previous: dict, following: dict, frames: range, min_iou: float = 0.5, min_votes: int = 3) -> dict:
+    """
+    Match the track IDs of two segments by their boxes in the frames both segments tracked.
+
+    In every shared frame the boxes are paired by IoU, each pair votes for its two IDs being the same fly,
+    and the IDs are then assigned to maximize the total votes.
+
+    Args:
+        previous (dict): The data of the earlier segment, frame number -> list of tracks.
+        following (dict): The data of the later segment.
+        frames (range): The shared frames.
+        min_iou (float, optional): Minimum IoU of boxes to be paired within a frame. Defaults to 0.5.
+        min_votes (int, optional): Minimum number of paired frames for an ID match. Defaults to 3.
+
+    Returns:
+        dict: Maps the matched IDs of the later segment to IDs of the earlier one.
+    """
+    votes = {}
+    for frame in frames:
+        tracks_a = [t for t in previous.get(frame, []) if t[0] != 0]
+        tracks_b = [t for t in following.get(frame, []) if t[0] != 0]
+        if not tracks_a or not tracks_b:
+            continue
+        iou = iou_matrix(tracks_to_ltwh(tracks_a), tracks_to_ltwh(tracks_b))
+        for row, col in zip(*linear_sum_assignment(-iou)):
+            if iou[row, col] >= min_iou:
+                pair = (tracks_a[row][0], tracks_b[col][0])
+                votes[pair] = votes.get(pair, 0) + 1
+
+    if not votes:
+        return {}
+    ids_a = sorted({a for a, _ in votes})
+    ids_b = sorted({b for _, b in votes})
+    counts = np.zeros((len(ids_a), len(ids_b)))
+    for (a, b), count in votes.items():
+        counts[ids_a.index(a), ids_b.index(b)] = count
+
+    mapping = {}
+    for row, col in zip(*linear_sum_assignment(-counts)):
+        if counts[row, col] >= min_votes:
+            mapping[ids_b[col]] = ids_a[row]
+    return mapping
+
+
+def stitch_segments(segments: list) -> dict:
+    """
+    Join the data of overlapping segments into a single ID-consistent data dictionary.
+
+    The IDs of every segment are matched against the already stitched data in the overlap, unmatched IDs get new
+    unused IDs. The overlap frames are taken from the earlier segment up to its middle and from the later one after
+    it, by then the fresh tracker of the later segment has confirmed its tracks.
+
+    Args:
+        segments (list): The (start, end, data) of every segment, in order, where data maps frame number -> list of tracks.
+
+    Returns:
+        dict: The stitched data, frame number -> list of tracks.
+    """
+    if not segments:
+        return {}
+
+    _, previous_end, stitched = segments[0]
+    stitched = {frame: list(tracks) for frame, tracks in stitched.items()}
+    next_id = max([t[0] for tracks in stitched.values() for t in tracks], default=0) + 1
+
+    for start, end, data in segments[1:]:
+        mapping = match_segment_ids(stitched, data, range(start, previous_end))
+
+        # give the unmatched tracks new IDs, keeping the unused ID 0 as is
+        for track_id in sorted({t[0] for tracks in data.values() for t in tracks}):
+            if track_id != 0 and track_id not in mapping:
+                mapping[track_id] = next_id
+                next_id += 1
+
+        cut = (start + previous_end) // 2
+        for frame in range(cut, end):
+            stitched[frame] = [(mapping.get(t[0], t[0]), *t[1:]) for t in data.get(frame, [])]
+        previous_end = end
+
+    return stitched
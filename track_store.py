@@ -0,0 +1,163 @@
+from collections.abc import Mapping
+from operator import itemgetter
+import numpy as np
+import json
+import gc
+
+
+class TrackStore(Mapping):
+    """
+    A columnar binary store of tracks data, readable like the tracks data dictionary.
+
+    The tracks of all frames are kept in a single structured array of (frame, id, conf, x1, y1, x2, y2) rows,
+    ordered by frame, with a missing confidence (predicted track) stored as NaN. A frame index holds the frame
+    numbers and the offsets of their rows, so frames without tracks are kept too.
+
+    The rows are saved as a `.npy` file and loaded memory-mapped, so opening a store takes the same time for any
+    length and only the frames accessed are read from disk. The frame index is saved next to it as an `.npz` file.
+
+    Indexing the store by frame number returns the list of (id, conf, x1, y1, x2, y2) tracks, as in the tracks data
+    dictionary, while `rows`, `frames` and `offsets` give the arrays for vectorized processing.
+
+    Args:
+        rows (np.ndarray): The structured array of `TrackStore.DTYPE` rows, ordered by frame.
+        frames (np.ndarray): The frame numbers, in ascending order.
+        offsets (np.ndarray): The row offsets of the frames, with a final entry of the rows count.
+        metadata (dict, optional): JSON serializable information about the tracks. Defaults to None.
+    """
+
+    DTYPE = np.dtype([
+        ('frame', '<i4'), ('id', '<i4'), ('conf', '<f8'),
+        ('x1', '<f8'), ('y1', '<f8'), ('x2', '<f8'), ('y2', '<f8'),
+    ])
+
+    def __init__(self, rows: np.ndarray, frames: np.ndarray, offsets: np.ndarray, metadata: dict = None) -> None:
+        self.rows = rows
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.metadata = {} if metadata is None else metadata
+        # frames numbered without holes are looked up directly instead of searched
+        self.__first = int(self.frames[0]) if len(self.frames) else 0
+        self.__contiguous = len(self.frames) == 0 or int(self.frames[-1]) - self.__first + 1 == len(self.frames)
+
+    @staticmethod
+    def from_dict(data: dict, metadata: dict = None) -> 'TrackStore':
+        """
+        Create a store from tracks data.
+
+        Args:
+            data (dict): A dictionary where keys are frame numbers and values are lists of track data.
+            metadata (dict, optional): JSON serializable information about the tracks. Defaults to None.
+
+        Returns:
+            TrackStore: The store.
+        """
+        frames = np.array(sorted(data.keys()), dtype=np.int64)
+        counts = np.array([len(data[frame]) for frame in frames.tolist()], dtype=np.int64)
+        offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        rows = np.empty(int(offsets[-1]), dtype=TrackStore.DTYPE)
+        rows['frame'] = np.repeat(frames, counts)
+        # a column at a time, a missing confidence (None) is read as NaN
+        tracks = [track for frame in frames.tolist() for track in data[frame]]
+        for index, name in enumerate(TrackStore.DTYPE.names[1:]):
+            rows[name] = np.fromiter(map(itemgetter(index), tracks), dtype=TrackStore.DTYPE[name], count=len(tracks))
+        return TrackStore(rows, frames, offsets, metadata)
+
+    def to_dict(self) -> dict:
+        """
+        Convert the store to tracks data.
+
+        Returns:
+            dict: A dictionary where keys are frame numbers and values are lists of track data.
+        """
+        # the millions of new tuples would trigger the garbage collector over and over, while none can form a cycle
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            tracks = self.__to_tracks(self.rows)
+            bounds = self.offsets.tolist()
+            return {frame: tracks[bounds[index]:bounds[index + 1]] for index, frame in enumerate(self.frames.tolist())}
+        finally:
+            if enabled:
+                gc.enable()
+
+    @staticmethod
+    def __to_tracks(rows: np.ndarray) -> list:
+        # NaN marks the missing confidences, the columns are zipped to tuples without a Python loop per row
+        confs = rows['conf'].tolist()
+        for index in np.flatnonzero(np.isnan(rows['conf'])).tolist():
+            confs[index] = None
+        return list(zip(
+            rows['id'].tolist(), confs, rows['x1'].tolist(), rows['y1'].tolist(), rows['x2'].tolist(), rows['y2'].tolist()
+        ))
+
+    def __getitem__(self, frame: int) -> list:
+        if self.__contiguous:
+            index = int(frame) - self.__first
+            if not 0 <= index < len(self.frames):
+                raise KeyError(frame)
+        else:
+            index = int(np.searchsorted(self.frames, frame))
+            if index == len(self.frames) or self.frames[index] != frame:
+                raise KeyError(frame)
+        return self.__to_tracks(self.rows[self.offsets[index]:self.offsets[index + 1]])
+
+    def __iter__(self):
+        return iter(self.frames.tolist())
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def detach(self) -> None:
+        """
+        Read memory-mapped rows into memory, releasing the file so it can be written again (on Windows mapped files are locked).
+        """
+        if isinstance(self.rows, np.memmap):
+            self.rows = np.array(self.rows)
+
+    @staticmethod
+    def get_index_path(path: str) -> str:
+        """
+        Get the path of the frame index saved next to the rows file.
+
+        Args:
+            path (str): The path to the `.npy` rows file.
+
+        Returns:
+            str: The path to the `.npz` frame index file.
+        """
+        return f'{path[:-len(".npy")] if path.endswith(".npy") else path}_index.npz'
+
+    def save(self, output_path: str) -> None:
+        """
+        Save the store as a `.npy` rows file and an `.npz` frame index file next to it.
+
+        Args:
+            output_path (str): The path to the `.npy` rows file.
+        """
+        with open(output_path, 'wb') as file:
+            np.save(file, np.ascontiguousarray(self.rows, dtype=TrackStore.DTYPE))
+        with open(TrackStore.get_index_path(output_path), 'wb') as file:
+            np.savez(file, frames=self.frames, offsets=self.offsets, header=np.array(json.dumps({'metadata': self.metadata})))
+
+    @staticmethod
+    def load(input_path: str, mmap: bool = True) -> 'TrackStore':
+        """
+        Load a store saved with `save`.
+
+        Args:
+            input_path (str): The path to the `.npy` rows file.
+            mmap (bool, optional): Memory-map the rows instead of reading them into memory. Defaults to True.
+
+        Returns:
+            TrackStore: The loaded store.
+        """
+        rows = np.load(input_path, mmap_mode='r' if mmap else None)
+        if rows.dtype != TrackStore.DTYPE:
+            raise Exception(f'The track store at "{input_path}" has an unexpected format {rows.dtype}.')
+        with np.load(TrackStore.get_index_path(input_path)) as file:
+            header = json.loads(str(file['header']))
+            frames, offsets = file['frames'], file['offsets']
+        return TrackStore(rows, frames, offsets, header['metadata'])
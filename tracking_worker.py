@@ -0,0 +1,252 @@
+from multiprocessing.connection import Listener, Client, AuthenticationError
+from args_helper import split_options, break_down_args, parse_bool, parse_roi, parse_analysis_options, parse_tracker_options, parse_runtime_options
+import file_helper
+import threading, queue, secrets
+import sys, os, time
+
+
+# the worker only listens on the local machine
+DEFAULT_ADDRESS = ('localhost', 47651)
+
+# minimal interval between progress reports sent to a client [sec]
+PROGRESS_INTERVAL = 0.5
+
+
+def get_authkey_path(address: tuple = DEFAULT_ADDRESS) -> str:
+    """
+    Get the path of the file holding the authentication key of the worker at an address.
+
+    The key is generated at random by the worker when it starts, and the file is readable only by the user,
+    so only the user's processes can submit jobs (the messages are pickled, a connected client runs code in the worker).
+
+    Args:
+        address (tuple, optional): The (host, port) of the worker. Defaults to `DEFAULT_ADDRESS`.
+
+    Returns:
+        str: The path to the key file.
+    """
+    return file_helper.join_paths(os.path.expanduser('~'), f'.flytracker_worker_{address[1]}.key')
+
+
+def write_authkey(authkey: bytes, address: tuple = DEFAULT_ADDRESS) -> None:
+    """
+    Save the authentication key of the worker to a file only the user can read.
+
+    Args:
+        authkey (bytes): The key.
+        address (tuple, optional): The (host, port) of the worker. Defaults to `DEFAULT_ADDRESS`.
+    """
+    path = get_authkey_path(address)
+    # an existing file may have been created with other permissions, it is replaced instead of rewritten
+    if os.path.exists(path):
+        os.remove(path)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'wb') as file:
+        file.write(authkey)
+
+
+def read_authkey(address: tuple = DEFAULT_ADDRESS) -> bytes:
+    """
+    Read the authentication key of the worker at an address.
+
+    Args:
+        address (tuple, optional): The (host, port) of the worker. Defaults to `DEFAULT_ADDRESS`.
+
+    Returns:
+        bytes: The key, or None when no worker has written one.
+    """
+    path = get_authkey_path(address)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as file:
+        return file.read() or None
+
+
+def is_available(address: tuple = DEFAULT_ADDRESS) -> bool:
+    """
+    Check whether a tracking worker is listening at the given address.
+
+    Args:
+        address (tuple, optional): The (host, port) of the worker. Defaults to `DEFAULT_ADDRESS`.
+
+    Returns:
+        bool: True if a worker answered.
+    """
+    authkey = read_authkey(address)
+    if authkey is None:
+        return False
+    try:
+        with Client(address, authkey=authkey) as conn:
+            conn.send({'type': 'ping'})
+            return conn.recv().get('type') == 'pong'
+    except (OSError, EOFError, AuthenticationError):
+        return False
+
+
+def submit_job(video_path: str, start_frame: int = None, end_frame: int = None, options: dict = None,
+               progress_callback = None, address: tuple = DEFAULT_ADDRESS) -> bool:
+    """
+    Submit an analysis job to the tracking worker and wait for it to finish.
+
+    Args:
+        video_path (str): The path to the video file.
+        start_frame (int, optional): The first frame to analyze. Defaults to None (start of the video).
+        end_frame (int, optional): The frame to stop the analysis at. Defaults to None (end of the video).
+        options (dict, optional): Analysis options, named as the `flytracker_app` command line options. Defaults to None.
+        progress_callback (callable, optional): Called with (done, total) frames as the worker reports progress.
+        address (tuple, optional): The (host, port) of the worker. Defaults to `DEFAULT_ADDRESS`.
+
+    Returns:
+        bool: True if the analysis completed successfully.
+    """
+    authkey = read_authkey(address)
+    if authkey is None:
+        raise Exception(f'No tracking worker key found at "{get_authkey_path(address)}", is the worker running?')
+    with Client(address, authkey=authkey) as conn:
+        conn.send({'type': 'job', 'video': video_path, 'start': start_frame, 'end': end_frame, 'options': options or {}})
+        while True:
+            message = conn.recv()
+            if message['type'] == 'queued':
+                print(f'job queued at position {message["position"]}')
+            elif message['type'] == 'progress':
+                if progress_callback is not None:
+                    progress_callback(message['done'], message['total'])
+            elif message['type'] == 'finished':
+                if not message['success']:
+                    print(f'analysis of "{video_path}" failed: {message["error"]}')
+                return message['success']
+
+
+def run_job(ft, job: dict, conn) -> None:
+    """
+    Run a single analysis job on the worker's tracker, reporting progress to the client.
+
+    Args:
+        ft (FlyTracker): The loaded tracker.
+        job (dict): The job message.
+        conn (Connection): The connection of the client that submitted the job.
+    """
+    import flytracker_app
+
+    def send(message):
+        # the client may have disconnected, the job still runs to completion
+        try:
+            conn.send(message)
+        except (OSError, EOFError):
+            pass
+
+    last_report = 0
+    def report_progress(done, total):
+        nonlocal last_report
+        if time.time() - last_report >= PROGRESS_INTERVAL or done == total:
+            last_report = time.time()
+            send({'type': 'progress', 'done': done, 'total': total})
+
+    video_path = file_helper.normalize_path(job['video'])
+    try:
+        if not file_helper.check_existance(video_path):
+            raise Exception(f'could not locate the video at "{video_path}".')
+        print(f'working on "{video_path}"...')
+
+        options = job.get('options', {})
+        roi = parse_roi(options['roi']) if 'roi' in options else None
+        preprocess_method = flytracker_app.get_preprocess_pipeline(options.get('preprocess'))
+        flytracker_app.process_video(ft, video_path, job.get('start'), job.get('end'), preprocess_method, roi,
+                                     progress_callback=report_progress, **parse_analysis_options(options))
+        send({'type': 'finished', 'success': True})
+    except Exception as err:
+        ft.reset_tracking()
+        print(f'analysis of "{video_path}" failed: {err}')
+        send({'type': 'finished', 'success': False, 'error': str(err)})
+    finally:
+        conn.close()
+
+
+def serve(address: tuple = DEFAULT_ADDRESS, tracker_options: dict = None) -> None:
+    """
+    Run the tracking worker, loading the model once and processing submitted jobs in order.
+
+    Args:
+        address (tuple, optional): The (host, port) to listen at. Defaults to `DEFAULT_ADDRESS`.
+        tracker_options (dict, optional): Tracker and runtime options, named as the `flytracker_app` command line options.
+    """
+    # heavy imports are only needed by the worker itself, not by its clients
+    from FlyTracker import FlyTracker
+    import flytracker_app
+    import runtime_config
+
+    tracker_options = tracker_options or {}
+    runtime_config.configure_threads(**parse_runtime_options(tracker_options))
+
+    print('loading model...')
+    ft = FlyTracker(flytracker_app.WEIGHTS_PATH, **parse_tracker_options(tracker_options))
+
+    # a fresh key for every run, written only once the address is bound so a running worker's key is never replaced
+    jobs = queue.Queue()
+    authkey = secrets.token_bytes(32)
+    listener = Listener(address, authkey=authkey)
+    write_authkey(authkey, address)
+
+    def receive(conn):
+        try:
+            message = conn.recv()
+        except (OSError, EOFError):
+            conn.close()
+            return
+        if message.get('type') == 'ping':
+            conn.send({'type': 'pong'})
+            conn.close()
+        elif message.get('type') == 'job':
+            # acknowledge before queueing, so the job's progress messages can't interleave with it
+            conn.send({'type': 'queued', 'position': jobs.qsize() + 1})
+            jobs.put((message, conn))
+        else:
+            conn.close()
+
+    def accept():
+        while True:
+            try:
+                conn = listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=receive, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    print(f'tracking worker listening at {address[0]}:{address[1]}')
+
+    try:
+        while True:
+            job, conn = jobs.get()
+            run_job(ft, job, conn)
+    finally:
+        listener.close()
+        if read_authkey(address) == authkey:
+            os.remove(get_authkey_path(address))
+
+
+def main():
+    # usage: tracking_worker.py [--port=N] [tracker options]                       - run the worker
+    #        tracking_worker.py --submit <video> [start [end]] ... [analysis options] - submit jobs to a running worker
+    args, options = split_options(sys.argv[1:])
+    address = (DEFAULT_ADDRESS[0], int(options.pop('port', DEFAULT_ADDRESS[1])))
+
+    if not parse_bool(options.pop('submit', False)):
+        # the model weights are located relative to the worker
+        os.chdir(os.path.dirname(os.path.abspath(sys.argv[0])))
+        serve(address, options)
+        return
+
+    if not is_available(address):
+        raise Exception(f'No tracking worker is listening at {address[0]}:{address[1]}.')
+
+    success = True
+    for video_path, start_frame, end_frame in break_down_args(args):
+        success &= submit_job(file_helper.normalize_path(video_path), start_frame, end_frame, options,
+                              lambda done, total: print(f'\r{done}/{total} frames', end=''), address)
+        print()
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+import frame_source
 
 def id_to_color(id):
     """
@@ -151,7 +152,7 @@ def draw_constraints_onto_frame(frame, constraints):
         thickness=  1
     )
 
-def annotate_video(data, video_path, output_path, constraints = None, draw_constraints = False):
+def annotate_video(data, video_path, output_path, constraints = None, draw_constraints = False, decoder = 'opencv', memory = None):
     """
     Annotates a video with paths and constraints.
 
@@ -163,9 +164,12 @@ def annotate_video(data, video_path, output_path, constraints = None, draw_const
                                   Keys are 'x_min', 'x_max', 'y_min', 'y_max'.
     draw_constraints (bool, optional): Whether to draw constraints on the video frames.
                                        Defaults to False.
+    decoder (str, optional): The decoder backend used to read the video, see `frame_source.open_video`.
+                             Defaults to 'opencv'.
+    memory (MemoryTracker, optional): Records the size of the constructed paths. Defaults to None.
     """
-    # setup opencv video reader
-    stream = cv2.VideoCapture(video_path)
+    # setup video reader
+    stream = frame_source.open_video(video_path, decoder)
     success, frame = stream.read()
     height, width, _ = frame.shape
 
@@ -173,7 +177,7 @@ def annotate_video(data, video_path, output_path, constraints = None, draw_const
     writer = cv2.VideoWriter(
         output_path,
         cv2.VideoWriter_fourcc(*'mp4v'),
-        int(stream.get(cv2.CAP_PROP_FPS)),
+        int(stream.fps),
         (width, height)
     )
 
@@ -208,3 +212,6 @@ def annotate_video(data, video_path, output_path, constraints = None, draw_const
     
     stream.release()
     writer.release()
+
+    if memory is not None:
+        memory.track('annotate_video paths', paths)
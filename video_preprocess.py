@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+import threading
 
 
 def create_lut_8uc1(x: list, y: list) -> np.ndarray:
@@ -112,3 +113,90 @@ def merge_from_rgb(r: np.ndarray, g: np.ndarray, b: np.ndarray) -> np.ndarray:
     """
     return cv2.merge([b, g, r])
 
+
+class PreprocessPipeline:
+    """
+    A precompiled frame preprocessing pipeline, applying color curves and an optional grayscale conversion.
+
+    The curves are compiled once into a single 3-channel LUT, applied to all channels in one `cv2.LUT` call.
+    The intermediate images are written into buffers preallocated per thread, so the pipeline can be shared
+    by several preprocessing threads. The pipeline is described by its configuration, see `to_config`.
+
+    Parameters:
+    - r_curve (tuple or None): The (x, y) control points of the red channel curve. If None, the channel is unchanged.
+    - g_curve (tuple or None): The (x, y) control points of the green channel curve. If None, the channel is unchanged.
+    - b_curve (tuple or None): The (x, y) control points of the blue channel curve. If None, the channel is unchanged.
+    - grayscale (bool): Convert the result to grayscale, keeping the 3-channel format. Defaults to False.
+    """
+
+    def __init__(self, r_curve = None, g_curve = None, b_curve = None, grayscale: bool = False) -> None:
+        self.r_curve = r_curve
+        self.g_curve = g_curve
+        self.b_curve = b_curve
+        self.grayscale = grayscale
+        self.__compile()
+
+    def __compile(self) -> None:
+        # fuse the channel LUTs into a single 3-channel LUT, in BGR order
+        linear_lut = np.arange(256, dtype='uint8')
+        luts = [create_lut_8uc1(*curve) if curve is not None else linear_lut for curve in (self.b_curve, self.g_curve, self.r_curve)]
+        self.__lut = np.dstack(luts).reshape(1, 256, 3)
+        self.__buffers = threading.local()
+
+    def __buffer(self, name: str, shape: tuple) -> np.ndarray:
+        # reuse the buffer of the calling thread, unless the frame size changed
+        buffer = getattr(self.__buffers, name, None)
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype='uint8')
+            setattr(self.__buffers, name, buffer)
+        return buffer
+
+    def __call__(self, image: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Preprocess a frame.
+
+        Parameters:
+        - image (numpy.ndarray): Input BGR image.
+        - out (numpy.ndarray or None): Output buffer of the image shape. If None, a new image is returned.
+
+        Returns:
+        - numpy.ndarray: The preprocessed image.
+        """
+        if out is None:
+            out = np.empty_like(image)
+        if not self.grayscale:
+            return cv2.LUT(image, self.__lut, dst=out)
+
+        adjusted = cv2.LUT(image, self.__lut, dst=self.__buffer('adjusted', image.shape))
+        gray = cv2.cvtColor(adjusted, cv2.COLOR_BGR2GRAY, dst=self.__buffer('gray', image.shape[:2]))
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR, dst=out)
+
+    def to_config(self) -> dict:
+        """
+        Describe the pipeline as a JSON serializable configuration.
+
+        Returns:
+        - dict: The configuration, accepted by `from_config`.
+        """
+        curve = lambda c: None if c is None else [list(c[0]), list(c[1])]
+        return {'r_curve': curve(self.r_curve), 'g_curve': curve(self.g_curve), 'b_curve': curve(self.b_curve), 'grayscale': self.grayscale}
+
+    @staticmethod
+    def from_config(config: dict) -> 'PreprocessPipeline':
+        """
+        Create a pipeline from its configuration.
+
+        Parameters:
+        - config (dict): The configuration, as returned by `to_config`.
+
+        Returns:
+        - PreprocessPipeline: The pipeline.
+        """
+        return PreprocessPipeline(config.get('r_curve'), config.get('g_curve'), config.get('b_curve'), config.get('grayscale', False))
+
+    def __getstate__(self) -> dict:
+        # the compiled LUT and the buffers are rebuilt from the configuration, e.g. in worker processes
+        return self.to_config()
+
+    def __setstate__(self, config: dict) -> None:
+        self.__init__(config['r_curve'], config['g_curve'], config['b_curve'], config['grayscale'])